@@ -0,0 +1,76 @@
+"""
+Compare the vectorized sepia/hue engine with the legacy per-pixel QColor loop.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.color --sizes 64 128 256
+"""
+import argparse
+import time
+
+import numpy as np
+from PyQt5.QtGui import QImage, QColor, qRgb
+
+from models import color
+
+
+def legacy_sepia(image: QImage) -> None:
+    for row_pixel in range(image.width()):
+        for col_pixel in range(image.height()):
+            current_val = QColor(image.pixel(row_pixel, col_pixel))
+            red, green, blue = current_val.red(), current_val.green(), current_val.blue()
+
+            new_red = min(int(0.393 * red + 0.769 * green + 0.189 * blue), 255)
+            new_green = min(int(0.349 * red + 0.686 * green + 0.168 * blue), 255)
+            new_blue = min(int(0.272 * red + 0.534 * green + 0.131 * blue), 255)
+
+            image.setPixel(row_pixel, col_pixel, qRgb(new_red, new_green, new_blue))
+
+
+def legacy_hue(image: QImage, hue: int) -> None:
+    for row_pixel in range(image.width()):
+        for col_pixel in range(image.height()):
+            current_val = QColor(image.pixel(row_pixel, col_pixel))
+            current_val.setHsv((current_val.hue() + hue) % 360, current_val.saturation(),
+                               current_val.value(), current_val.alpha())
+            image.setPixelColor(row_pixel, col_pixel, current_val)
+
+
+def synthetic_array(side: int) -> np.ndarray:
+    image_array = np.random.default_rng(side).integers(0, 256, (side, side, 4), dtype=np.uint8)
+    image_array[..., 3] = 255
+    return image_array
+
+
+def measure(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 128, 256, 512],
+                        help='side lengths of the square synthetic images')
+    parser.add_argument('--hue', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'op':>6} {'legacy, s':>12} {'vectorized, s':>14} {'speedup':>9}")
+    for side in args.sizes:
+        image_array = synthetic_array(side)
+        qimage = QImage(image_array.data, side, side, image_array.strides[0], QImage.Format_RGB32)
+
+        for name, legacy, vectorized in (
+                ('sepia', lambda: legacy_sepia(qimage.copy()), lambda: color.sepia(image_array)),
+                ('hue', lambda: legacy_hue(qimage.copy(), args.hue),
+                 lambda: color.shift_hue(image_array, args.hue)),
+        ):
+            # One untimed call first, so the timings leave out importing OpenCV and building lookup tables
+            legacy()
+            vectorized()
+            legacy_time = measure(legacy)
+            vectorized_time = measure(vectorized)
+            print(f"{f'{side}x{side}':>10} {name:>6} {legacy_time:>12.4f} {vectorized_time:>14.6f} "
+                  f"{legacy_time / vectorized_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
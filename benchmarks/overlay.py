@@ -0,0 +1,72 @@
+"""
+Measure how quickly particle outlines are traced into overlay tiles.
+
+    python -m benchmarks.overlay --particles 100000 --megapixels 40
+
+Times pooling the particle mask down the pyramid, replacing the particles,
+finding what changed when a tenth of them move, and tracing every tile of
+each pyramid level, which bounds the cost of a pan or zoom step.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from models.lazy import cv2
+from models.overlay import Overlay, mask_levels
+from models.pyramid import Pyramid
+
+
+def synthetic_particles(count: int, width: int, height: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """A mask of round particles and their (left, top, width, height, area) rows."""
+    rng = np.random.default_rng(seed)
+    radii = rng.integers(1, 20, count)
+    centers = rng.integers(20, (width - 20, height - 20), (count, 2))
+    mask = np.zeros((height, width), np.uint8)
+    for (x, y), radius in zip(centers.tolist(), radii.tolist()):
+        cv2.circle(mask, (x, y), radius, 1, -1)
+    sizes = radii * 2 + 1
+    rows = np.column_stack((centers - radii[:, None], sizes, sizes, np.round(np.pi * radii ** 2)))
+    return mask, rows.astype(np.int64)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--particles', type=int, default=100000)
+    parser.add_argument('--megapixels', type=float, default=40)
+    parser.add_argument('--tile-size', type=int, default=256)
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    # Broadcast zeros: the overlay only reads the shape of the image levels
+    pyramid = Pyramid(np.broadcast_to(np.zeros(4, np.uint8), (height, width, 4)), args.tile_size)
+    overlay = Overlay(pyramid)
+    mask, rows = synthetic_particles(args.particles, width, height)
+
+    start = time.perf_counter()
+    masks = mask_levels(mask, pyramid.depth)
+    print(f"pool mask to {len(masks)} levels: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    overlay.set_particles(masks, rows)
+    print(f"set {len(rows)} particles: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Only the rows move: the diff does not look at the mask
+    moved = rows.copy()
+    moved[::10, :2] += 1
+    start = time.perf_counter()
+    changed = overlay.set_particles(masks, moved)
+    print(f"diff, {len(changed)} changed: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'level':>6} {'tiles':>7} {'drawn':>7} {'ms/tile':>8}")
+    for index in range(pyramid.depth):
+        rows, cols = pyramid.tile_range(index, 0, 0, *pyramid.level(index).shape[1::-1])
+        start = time.perf_counter()
+        drawn = sum(overlay.tile(index, row, col) is not None for row in rows for col in cols)
+        elapsed = time.perf_counter() - start
+        print(f"{index:6} {len(rows) * len(cols):7} {drawn:7} {elapsed * 1000 / (len(rows) * len(cols)):8.2f}")
+
+
+if __name__ == '__main__':
+    main()
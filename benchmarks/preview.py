@@ -0,0 +1,64 @@
+"""
+Measure per-tick latency of slider previews on a large synthetic frame.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.preview --megapixels 40
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from models.pipeline import AdjustmentPipeline
+from views.image import MainImage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=40)
+    parser.add_argument('--viewport', type=int, nargs=2, default=[1920, 1080], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--ticks', type=int, default=60)
+    parser.add_argument('--budget', type=float, default=16, help='per-tick budget in milliseconds')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    width = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    source = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+    source[..., 3] = 255
+    pipeline = AdjustmentPipeline(source)
+
+    start = time.perf_counter()
+    preview = pipeline.proxy(*args.viewport)
+    proxy_time = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for tick in range(args.ticks):
+        pipeline.set('levels', brightness=tick % 100, contrast=tick % 50)
+
+        start = time.perf_counter()
+        QPixmap.fromImage(MainImage.from_array(preview.render(pipeline.params)))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    QPixmap.fromImage(MainImage.from_array(pipeline.render()))
+    full_time = (time.perf_counter() - start) * 1000
+
+    latencies.sort()
+    print(f"source {width}x{height} ({width * height / 1e6:.1f} MP), "
+          f"proxy {preview.source.shape[1]}x{preview.source.shape[0]} built in {proxy_time:.1f} ms")
+    print(f"preview tick: mean {statistics.mean(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, max {latencies[-1]:.2f} ms "
+          f"(budget {args.budget:.0f} ms)")
+    print(f"full-resolution render on release: {full_time:.1f} ms")
+
+    app.quit()
+    sys.exit(0 if latencies[int(len(latencies) * 0.95) - 1] <= args.budget else 1)
+
+
+if __name__ == '__main__':
+    main()
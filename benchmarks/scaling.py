@@ -0,0 +1,88 @@
+"""
+Measure how the pointwise pipeline stages scale with strip threads.
+
+    python -m benchmarks.scaling --megapixels 40 --threads 1 2 4 8 16 32
+
+Each stage runs on the same synthetic frame once per thread count. Every
+parallel result is checked against a single call over the whole frame.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+from models import color
+from models.lazy import cv2
+from models.parallel import StripScheduler
+from models.pipeline import grayscale, levels, sepia
+
+KERNELS = {
+    'brightness': (levels, {'brightness': 40, 'contrast': 0}),
+    'contrast': (levels, {'brightness': 0, 'contrast': 40}),
+    'grayscale': (grayscale, {'enabled': True}),
+    'sepia': (sepia, {'enabled': True}),
+    'hue': (color.shift_hue, {'hue': 30, 'saturation': 0}),
+}
+
+
+def synthetic_frame(megapixels: float, dtype: str) -> np.ndarray:
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+    frame[..., 3] = 255
+    if dtype == 'uint16':
+        return frame.astype(np.uint16) * 257
+    if dtype == 'float32':
+        return frame.astype(np.float32) / 255
+    return frame
+
+
+def measure(scheduler: StripScheduler, kernel, frame: np.ndarray, params: dict,
+            repeat: int) -> tuple[float, np.ndarray]:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = scheduler.map(kernel, frame, **params)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=40)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, 16, 32, os.cpu_count() or 1}))
+    parser.add_argument('--dtype', choices=('uint8', 'uint16', 'float32'), default='uint8')
+    parser.add_argument('--kernels', nargs='+', choices=list(KERNELS), default=list(KERNELS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--opencv-threads', type=int, default=None,
+                        help="OpenCV's own thread count (default: left as is)")
+    args = parser.parse_args()
+
+    if args.opencv_threads is not None:
+        cv2.setNumThreads(args.opencv_threads)
+    frame = synthetic_frame(args.megapixels, args.dtype)
+    megapixels = frame.shape[0] * frame.shape[1] / 1e6
+    print(f"{megapixels:.1f} MP {args.dtype}, {os.cpu_count()} cores, OpenCV threads {cv2.getNumThreads()}")
+    print(f"{'kernel':>10} {'threads':>8} {'ms':>9} {'MP/s':>8} {'speedup':>8} {'efficiency':>11}")
+
+    for name in args.kernels:
+        kernel, params = KERNELS[name]
+        expected = kernel(frame, **params)
+        serial = None
+        for threads in args.threads:
+            scheduler = StripScheduler(threads)
+            seconds, result = measure(scheduler, kernel, frame, params, args.repeat)
+            scheduler.shutdown()
+            if not np.array_equal(result, expected):
+                raise AssertionError(f"{name} with {threads} threads differs from the single call")
+
+            serial = serial or seconds
+            print(f"{name:>10} {threads:8} {seconds * 1000:9.1f} {megapixels / seconds:8.1f} "
+                  f"{serial / seconds:7.2f}x {serial / seconds / threads:10.0%}")
+
+
+if __name__ == '__main__':
+    main()
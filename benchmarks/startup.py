@@ -0,0 +1,78 @@
+"""
+Measure cold-start time of the editor, from process launch to first paint.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.startup --runs 5 --budget 1500
+
+Every run starts a fresh interpreter, so imports are paid in full each time.
+Exits with status 1 when the median time to first paint exceeds the budget.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def child() -> None:
+    """Start the editor as main.py does and report when its first widget paints."""
+    from PyQt5.QtCore import QEvent, QObject, Qt, QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    app.setAttribute(Qt.AA_DontShowIconsInMenus, True)
+    times = {'qt': time.monotonic()}
+
+    from measurer.gui import MeasurerGUI
+    times['import'] = time.monotonic()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint and 'paint' not in times:
+                times['paint'] = time.monotonic()
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    first_paint = FirstPaint()
+    app.installEventFilter(first_paint)
+    window = MeasurerGUI()
+    times['window'] = time.monotonic()
+
+    app.exec_()
+    times['cv2'] = 'cv2' in sys.modules
+    print(json.dumps(times))
+    window.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='median milliseconds to first paint')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    phases = {'qt': [], 'import': [], 'window': [], 'paint': []}
+    for _ in range(args.runs):
+        launched = time.monotonic()
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--child'],
+                                check=True, capture_output=True, text=True).stdout
+        times = json.loads(output.strip().splitlines()[-1])
+        for phase in phases:
+            phases[phase].append((times[phase] - launched) * 1000)
+
+    print(f"{args.runs} cold starts, milliseconds since launch (median / max):")
+    for phase, values in phases.items():
+        print(f"  {phase:8} {statistics.median(values):8.1f} {max(values):8.1f}")
+    print(f"  OpenCV imported before first paint: {'yes' if times['cv2'] else 'no'}")
+
+    if args.budget is not None and statistics.median(phases['paint']) > args.budget:
+        print(f"first paint exceeds the {args.budget:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Time every editing operation of the image view on synthetic frames.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.suite --megapixels 1 10 50
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.suite --compare benchmarks/results/previous.json
+
+Each operation runs through Image as the editor does: the edit is applied,
+the background render finishes and a 1920x1080 viewport is repainted.
+Results (median seconds, MP/s and peak resident memory above the starting
+point) are written as JSON, with the machine and commit they came from.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QRect
+from PyQt5.QtWidgets import QApplication, QMainWindow
+
+from models import loader
+from models.lazy import cv2
+from views.image import Image, display_image
+
+VIEWPORT = QRect(0, 0, 1920, 1080)
+
+
+class PeakMemory:
+    """Highest resident set size seen while the block runs, sampled every millisecond from /proc."""
+
+    def __init__(self):
+        self.peak = self.start = self.__rss()
+        self.__running = False
+
+    @staticmethod
+    def __rss() -> int:
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def __sample(self) -> None:
+        while self.__running:
+            self.peak = max(self.peak, self.__rss())
+            time.sleep(0.001)
+
+    def __enter__(self) -> "PeakMemory":
+        self.peak = self.start = self.__rss()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.__running = False
+        self.__thread.join()
+        self.peak = max(self.peak, self.__rss())
+
+    @property
+    def megabytes(self) -> float:
+        return (self.peak - self.start) / 2 ** 20
+
+
+def settle(app: QApplication, label: Image) -> None:
+    """
+    Wait until every background job of the view has finished and been
+    delivered, including the jobs their callbacks submit, such as pyramid,
+    proxy and history builds.
+    """
+    while not label.worker.is_idle():
+        label.worker.wait()
+        app.processEvents()
+
+
+def repaint(label: Image) -> None:
+    label.grab(VIEWPORT)
+
+
+def select_center(label: Image) -> None:
+    width, height = label.image_size.width(), label.image_size.height()
+    label.selection = QRect(width // 4, height // 4, width // 2, height // 2)
+
+
+OPERATIONS = {
+    'load': lambda label, path: label.set_original(loader.open_array(path)),
+    'as_array': lambda label, path: display_image(label.pipeline.render()).as_array,
+    'brightness': lambda label, path: label.change_brightness(40),
+    'contrast': lambda label, path: label.change_contrast(40),
+    'grayscale': lambda label, path: label.convertToGray(),
+    'sepia': lambda label, path: label.convertToSepia(),
+    'hue': lambda label, path: label.changeHue(30),
+    'rotate': lambda label, path: label.rotate_image(90),
+    'flip': lambda label, path: label.flip_image((-1, 1)),
+    'crop': lambda label, path: (select_center(label), label.cropImage()),
+    'resize': lambda label, path: label.resize_source((label.image_size.width() // 2,
+                                                       label.image_size.height() // 2)),
+    'zoom': lambda label, path: label.set_zoom(label.zoom * 0.5),
+}
+
+
+def synthetic_frame(megapixels: float) -> np.ndarray:
+    """Smooth gradients with noise in a 3:2 frame; compressible like a photograph, unlike pure noise."""
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    rows = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    cols = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[..., 0] = rows
+    frame[..., 1] = cols
+    frame[..., 2] = (rows + cols) / 2
+    return cv2.add(frame, np.random.default_rng(0).integers(0, 16, frame.shape, dtype=np.uint8))
+
+
+def measure(app: QApplication, label: Image, name: str, path: str, source: np.ndarray, repeat: int) -> dict:
+    seconds, memory = [], []
+    for _ in range(repeat):
+        label.set_original(source)
+        settle(app, label)
+        repaint(label)
+
+        with PeakMemory() as peak:
+            start = time.perf_counter()
+            OPERATIONS[name](label, path)
+            settle(app, label)
+            repaint(label)
+            seconds.append(time.perf_counter() - start)
+        memory.append(peak.megabytes)
+
+    megapixels = source.shape[0] * source.shape[1] / 1e6
+    median = statistics.median(seconds)
+    return {'operation': name, 'megapixels': round(megapixels, 2), 'seconds': median,
+            'mp_per_s': megapixels / median, 'peak_mb': max(memory)}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as baseline_file:
+        baseline = {(row['operation'], row['megapixels']): row for row in json.load(baseline_file)['results']}
+
+    print(f"\nagainst {baseline_path} (ratio of MP/s, below 1 is slower):")
+    for row in results:
+        before = baseline.get((row['operation'], row['megapixels']))
+        if before is not None:
+            print(f"  {row['operation']:10} {row['megapixels']:6.1f} MP  {row['mp_per_s'] / before['mp_per_s']:6.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--operations', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/<date>-<commit>.json)')
+    parser.add_argument('--compare', metavar='RESULTS', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = QMainWindow()
+    label = Image(window)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for megapixels in args.megapixels:
+            path = os.path.join(directory, f'{megapixels:g}mp.npy')
+            np.save(path, synthetic_frame(megapixels))
+            source = np.load(path)
+
+            for name in args.operations:
+                row = measure(app, label, name, path, source, args.repeat)
+                results.append(row)
+                print(f"{name:10} {row['megapixels']:6.1f} MP  {row['seconds'] * 1000:9.1f} ms  "
+                      f"{row['mp_per_s']:8.1f} MP/s  {row['peak_mb']:8.1f} MB")
+
+    report = {'environment': environment(), 'results': results}
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                         f"{report['environment']['date'][:10]}-{report['environment']['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
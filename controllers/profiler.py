@@ -0,0 +1,154 @@
+import cProfile
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import NamedTuple
+
+
+class Span(NamedTuple):
+    name: str
+    start: float
+    seconds: float
+    # Peak bytes traced above the start of the span; 0 unless allocation tracking is on
+    allocated: int
+    # (width, height) of the image the operation worked on, when known
+    frame: tuple
+    thread: str
+
+
+class Profiler:
+    """
+    Timing spans of editor operations, kept in a ring buffer.
+
+    Instrumented functions check one flag and call straight through while
+    recording is off. While on, each call records its wall time, the frame
+    it worked on and, with allocation tracking, the peak memory traced by
+    tracemalloc during the call. A cProfile run can be captured alongside.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.enabled = False
+        self.spans = deque(maxlen=capacity)
+        # Spans recorded so far, including those already dropped from the buffer
+        self.count = 0
+        self.__local = threading.local()
+        self.__cprofile = None
+
+    def enable(self, allocations: bool = False) -> None:
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def set_capacity(self, capacity: int) -> None:
+        self.spans = deque(self.spans, maxlen=capacity)
+
+    def instrument(self, function, name: str = None, frame=None):
+        """
+        Wrap a function so that each call is recorded as a span. `frame` is
+        called with the same arguments and returns the (width, height) worked on.
+        """
+        name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            with self.span(name, frame(*args, **kwargs) if frame is not None else ()):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def span(self, name: str, frame: tuple = ()) -> "_SpanContext":
+        """Context manager recording one span; records nothing while disabled."""
+        return _SpanContext(self, name, frame)
+
+    def record(self, span: Span) -> None:
+        self.spans.append(span)
+        self.count += 1
+
+    def depth(self, change: int) -> int:
+        """Nesting depth of spans on the calling thread, after adding `change`."""
+        depth = getattr(self.__local, 'depth', 0) + change
+        self.__local.depth = depth
+        return depth
+
+    @property
+    def profiling(self) -> bool:
+        return self.__cprofile is not None
+
+    def start_profile(self) -> None:
+        """Start a cProfile run of the GUI thread."""
+        self.__cprofile = cProfile.Profile()
+        self.__cprofile.enable()
+
+    def stop_profile(self, path: str = None) -> None:
+        """Stop the cProfile run and write its statistics, readable with pstats or snakeviz, if given a path."""
+        profile, self.__cprofile = self.__cprofile, None
+        profile.disable()
+        if path:
+            profile.dump_stats(path)
+
+    def write_trace(self, path: str) -> None:
+        """Write the buffered spans in the Trace Event format read by chrome://tracing and Perfetto."""
+        events = [{
+            'name': span.name, 'ph': 'X', 'pid': 0, 'tid': span.thread,
+            'ts': span.start * 1e6, 'dur': span.seconds * 1e6,
+            'args': {'allocated': span.allocated, 'frame': list(span.frame)},
+        } for span in list(self.spans)]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events}, trace_file)
+
+
+class _SpanContext:
+    __slots__ = ('profiler', 'name', 'frame', 'start', 'traced')
+
+    def __init__(self, profiler: Profiler, name: str, frame: tuple):
+        self.profiler = profiler
+        self.name = name
+        self.frame = frame
+
+    def __enter__(self):
+        if not self.profiler.enabled:
+            return self
+        self.traced = None
+        if tracemalloc.is_tracing():
+            # Nested spans share the peak of the outermost one on their thread
+            if self.profiler.depth(0) == 0:
+                tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.profiler.depth(1)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.profiler.enabled or not hasattr(self, 'start'):
+            return
+        seconds = time.perf_counter() - self.start
+        self.profiler.depth(-1)
+        allocated = 0
+        if self.traced is not None and tracemalloc.is_tracing():
+            allocated = max(tracemalloc.get_traced_memory()[1] - self.traced, 0)
+        self.profiler.record(Span(self.name, self.start, seconds, allocated, tuple(self.frame),
+                                  threading.current_thread().name))
+
+
+profiler = Profiler()
+
+
+def instrumented(function=None, *, name: str = None, frame=None):
+    """Decorator form of profiler.instrument for the process-wide profiler."""
+    if function is None:
+        return functools.partial(instrumented, name=name, frame=frame)
+    return profiler.instrument(function, name, frame)
@@ -0,0 +1,126 @@
+import sys
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from controllers.profiler import profiler
+
+
+class _JobSignals(QObject):
+    finished = pyqtSignal(object, int, object)
+    failed = pyqtSignal(object, int, object)
+
+
+class _Job(QRunnable):
+    def __init__(self, signals: _JobSignals, key, generation: int, function, args: tuple, callback=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = signals
+        self.key = key
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.callback = callback
+
+    def run(self) -> None:
+        try:
+            with profiler.span(f"worker:{self.key}", self.__frame()):
+                result = self.function(*self.args)
+        except Exception as error:
+            self.signals.failed.emit(self.key, self.generation, error)
+        else:
+            self.signals.finished.emit(self.key, self.generation, result)
+
+    def __frame(self) -> tuple:
+        if not profiler.enabled:
+            return ()
+        shape = next((arg.shape for arg in self.args if hasattr(arg, 'shape')), ())
+        return tuple(reversed(shape[:2]))
+
+
+class ImageWorker(QObject):
+    """
+    Runs image operations on a thread pool, off the GUI thread.
+
+    Jobs are keyed by operation. At most one job per key runs at a time; a
+    newer submission for a busy key replaces the one waiting behind it, and
+    only the result of the newest submission is passed to its callback, on
+    the thread that owns the worker. Callbacks and arguments are held by
+    their job alone, so nothing a job refers to outlives it.
+    """
+
+    def __init__(self, parent: QObject = None, max_threads: int = None):
+        super().__init__(parent)
+
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+
+        # Only keys with a running or waiting job are tracked
+        self.__generations = {}
+        self.__running = {}
+        self.__pending = {}
+
+        self.__signals = _JobSignals()
+        self.__signals.finished.connect(self.__finish)
+        self.__signals.failed.connect(self.__fail)
+
+    def submit(self, key, function, *args, callback=None) -> None:
+        """Run function(*args) in the pool, superseding earlier jobs with the same key."""
+        generation = self.__generations.get(key, 0) + 1
+        self.__generations[key] = generation
+
+        job = _Job(self.__signals, key, generation, function, args, callback)
+        if key in self.__running:
+            self.__pending[key] = job
+        else:
+            self.__start(job)
+
+    def cancel(self, key) -> None:
+        """Drop the waiting job for key and discard the result of the running one."""
+        self.__pending.pop(key, None)
+        if key in self.__running:
+            self.__generations[key] += 1
+        else:
+            self.__generations.pop(key, None)
+
+    def cancel_all(self, name) -> None:
+        """Cancel every job keyed by a tuple that starts with name, such as ('prefetch', path)."""
+        for key in list(self.__generations):
+            if isinstance(key, tuple) and key and key[0] == name:
+                self.cancel(key)
+
+    def is_busy(self, key) -> bool:
+        return key in self.__running
+
+    def is_idle(self) -> bool:
+        """Whether no job is running, waiting, or has a result the event loop has yet to deliver."""
+        return not self.__running
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Block until the pool is idle; results are delivered by the event loop afterwards."""
+        return self.pool.waitForDone(msecs)
+
+    def __start(self, job: _Job) -> None:
+        self.__running[job.key] = job
+        self.pool.start(job)
+
+    def __next(self, key, generation: int) -> tuple[bool, _Job]:
+        """Start the job waiting behind the finished one; whether the finished one is still the newest, and it."""
+        job = self.__running.pop(key)
+        current = generation == self.__generations.get(key)
+        pending = self.__pending.pop(key, None)
+        if pending is not None:
+            self.__start(pending)
+        else:
+            self.__generations.pop(key, None)
+        return current, job
+
+    def __finish(self, key, generation: int, result) -> None:
+        current, job = self.__next(key, generation)
+        if current and job.callback is not None:
+            job.callback(result)
+
+    def __fail(self, key, generation: int, error: Exception) -> None:
+        current, _ = self.__next(key, generation)
+        if current:
+            sys.excepthook(type(error), error, error.__traceback__)
@@ -0,0 +1,214 @@
+"""
+Apply one editing pipeline to many images without a display.
+
+    python -m measurer.batch pipeline.json "frames/*.tif" --output processed/
+
+The pipeline description is a JSON object with a list of steps, e.g.
+
+    {"steps": [{"op": "crop", "rect": [0, 0, 1024, 768]},
+               {"op": "resize", "scale": 0.5},
+               {"op": "grayscale"},
+               {"op": "contrast", "value": 20},
+               {"op": "brightness", "value": -10},
+               {"op": "rotate", "degrees": 90}],
+     "format": ".png",
+     "compression": {"png_level": 6, "jpeg_quality": 90, "tiff_compression": "deflate"}}
+
+Crops and resizes change the source and run first, in the order listed.
+The other steps set the parameters of the same adjustment stack the editor
+uses, so they are applied in its fixed order (levels, grayscale, sepia,
+hue, then rotations and flips composed in the order listed). Crop
+rectangles are x, y, width, height in source pixels; resizes take a
+"size" of width, height or a "scale" factor. Images are written at the
+deepest sample type the output format holds.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from models import export, loader, parallel, resample
+from models.geometry import Dihedral
+from models.lazy import cv2
+from models.pipeline import AdjustmentPipeline
+from models.session import list_images, natural_key
+
+
+class Job:
+    """Pipeline parameters and source operations parsed from a description; picklable for worker processes."""
+
+    def __init__(self, description: dict):
+        pipeline = AdjustmentPipeline(np.zeros((0, 0, 4), np.uint8))
+        self.source_steps = []
+        self.extension = description.get('format')
+        self.options = export.ExportOptions(**description.get('compression', {}))
+
+        for step in description.get('steps', []):
+            op = step['op']
+            if op == 'crop':
+                self.source_steps.append(('crop', tuple(step['rect'])))
+            elif op == 'resize':
+                size = step.get('size')
+                if size is None and step.get('scale') is None:
+                    raise ValueError("A resize step needs a size or a scale")
+                self.source_steps.append(('resize', tuple(size) if size else None, step.get('scale')))
+            elif op in ('brightness', 'contrast'):
+                pipeline.set('levels', **{op: step['value']})
+            elif op in ('grayscale', 'sepia'):
+                pipeline.set(op, enabled=step.get('enabled', True))
+            elif op == 'hue':
+                pipeline.set('hue', hue=step.get('degrees', 0) % 360, saturation=step.get('saturation', 0))
+            elif op == 'rotate':
+                self.__orient(pipeline, pipeline.get('geometry')['orientation'].rotated(step['degrees']))
+            elif op == 'flip':
+                self.__orient(pipeline, pipeline.get('geometry')['orientation'].flipped(step['axis']))
+            else:
+                raise ValueError(f"Unknown pipeline step {op!r}")
+
+        self.params = pipeline.params
+
+    @staticmethod
+    def __orient(pipeline: AdjustmentPipeline, orientation: Dihedral) -> None:
+        pipeline.set('geometry', orientation=orientation)
+
+    def apply(self, source):
+        for step in self.source_steps:
+            if step[0] == 'crop':
+                source = resample.crop(source, step[1])
+            else:
+                source = resample.resize(source, *step[1:])
+
+        pipeline = AdjustmentPipeline(source)
+        pipeline.params = self.params
+        return pipeline.render()
+
+    def output_path(self, path: str, output: str) -> str:
+        stem, extension = os.path.splitext(os.path.basename(path))
+        extension = self.extension or (extension if extension not in ('.npy', '.raw') else '.tif')
+        return os.path.join(output, stem + extension)
+
+
+def init_worker() -> None:
+    """Run each worker process on one thread: the pool already has one process per core."""
+    parallel.scheduler.set_threads(1)
+    cv2.setNumThreads(1)
+
+
+def process(job: Job, path: str, output: str) -> tuple[str, int]:
+    """Read, edit and write one image; returns the source path and its pixel count."""
+    source = loader.open_array(path)
+    result = job.apply(source)
+
+    export.write_image(job.output_path(path, output), result, job.options)
+    return path, source.shape[0] * source.shape[1]
+
+
+def expand(patterns: list[str]) -> list[str]:
+    """
+    Image files named by directories and glob patterns, each in natural
+    order as the editor steps through them; files named twice are listed
+    once.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(list_images(pattern))
+        else:
+            paths.extend(sorted(glob.glob(pattern), key=lambda path: (os.path.dirname(path), natural_key(path))))
+    return list(dict.fromkeys(paths))
+
+
+def check_outputs(job: Job, paths: list[str], output: str) -> None:
+    """
+    Raise ValueError if two inputs would be written to the same file, such
+    as a.png beside a.tif or frames of the same name in two folders, or if
+    an output would overwrite its own input.
+    """
+    sources = {}
+    for path in paths:
+        target = os.path.normcase(os.path.abspath(job.output_path(path, output)))
+        if target == os.path.normcase(os.path.abspath(path)):
+            raise ValueError(f"{path} would be overwritten by its own output")
+        if target in sources:
+            raise ValueError(f"{sources[target]} and {path} would both be written to {target}")
+        sources[target] = path
+
+
+def run(job: Job, paths: list[str], output: str, jobs: int = None, report=sys.stderr) -> list[tuple[str, str]]:
+    """
+    Process paths on a pool of worker processes, one per core by default.
+    At most two images per worker are in flight, so reads and writes stream
+    instead of queueing the whole list. Returns (path, error) for failures.
+    Nothing is processed if two inputs would collide in `output`.
+    """
+    check_outputs(job, paths, output)
+    os.makedirs(output, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+
+    failures = []
+    done = pixels = 0
+    start = time.perf_counter()
+    remaining = iter(paths)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        in_flight = {}
+
+        def fill():
+            while len(in_flight) < 2 * jobs:
+                path = next(remaining, None)
+                if path is None:
+                    return
+                in_flight[pool.submit(process, job, path, output)] = path
+
+        fill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = in_flight.pop(future)
+                try:
+                    pixels += future.result()[1]
+                except Exception as error:
+                    failures.append((path, str(error)))
+                done += 1
+
+            elapsed = time.perf_counter() - start
+            report.write(f"\r[{done}/{len(paths)}] {done / elapsed:.1f} frames/s, "
+                         f"{pixels / 1e6 / elapsed:.1f} MP/s")
+            report.flush()
+            fill()
+
+    report.write("\n")
+    for path, error in failures:
+        report.write(f"failed: {path}: {error}\n")
+    return failures
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pipeline', help='JSON pipeline description')
+    parser.add_argument('inputs', nargs='+', help='image files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='directory for processed images')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    with open(args.pipeline) as description:
+        job = Job(json.load(description))
+
+    paths = expand(args.inputs)
+    if not paths:
+        parser.error('no input images found')
+
+    try:
+        check_outputs(job, paths, args.output)
+    except ValueError as error:
+        parser.error(str(error))
+    return 1 if run(job, paths, args.output, args.jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,26 @@
-import json
+import math
 import os
 
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QIcon, QImage, QPalette, QWheelEvent
+from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QImage, QPalette, QWheelEvent
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QLabel, QAction,
                              QSlider, QToolButton, QToolBar, QDockWidget, QMessageBox,
-                             QGridLayout, QScrollBar)
-
-from views.image import Image
+                             QGridLayout, QScrollBar, QFileDialog)
+
+from controllers.profiler import instrumented, profiler
+from measurer.settings import settings
+from models import export
+from models.calibration import PIXELS
+from models.geometry import map_points
+from views.histogram import HistogramPanel
+from views.icons import icon
+from views.image import Image, image_frame
+from views.profiler import ProfilerDock
 from views.scroller import Scroller
 
 
-def load_settings():
-    with open('settings.json') as settings_file:
-        return json.load(settings_file)
-
-
-settings = load_settings()
+def window_frame(window: "MeasurerGUI", *args, **kwargs) -> tuple[int, int]:
+    return image_frame(window.image_label)
 
 
 class MeasurerGUI(QMainWindow):
@@ -32,12 +36,17 @@ class MeasurerGUI(QMainWindow):
 
     def __init_actions(self):
         self.__init_open_act()
+        self.__init_open_folder_act()
+        self.__init_next_image_act()
+        self.__init_previous_image_act()
         self.__init_save_act()
         self.__init_print_act()
         self.__init_exit_act()
         self.__init_crop_act()
         self.__init_resize_act()
         self.__init_revert_act()
+        self.__init_undo_act()
+        self.__init_redo_act()
         self.__init_zoom_in_act()
         self.__init_zoom_out_act()
         self.__init_normal_size_act()
@@ -45,6 +54,9 @@ class MeasurerGUI(QMainWindow):
         self.__init_rotate90_ccw_act()
         self.__init_flip_horizontal_act()
         self.__init_flip_vertical_act()
+        self.__init_measure_act()
+        self.__init_track_act()
+        self.__init_calibrate_act()
 
     def initializeUI(self):
         self.setMinimumSize(
@@ -56,44 +68,67 @@ class MeasurerGUI(QMainWindow):
         )
         self.showMaximized()
 
-        self.createEditingBar()
         self.create_menu()
         self.create_toolbar()
+        if settings['FAST_START']:
+            # The dock is not needed before an image is open, so build it once the window has painted
+            QTimer.singleShot(0, self.createEditingBar)
+            QTimer.singleShot(0, self.create_profiler_dock)
+        else:
+            self.createEditingBar()
+            self.create_profiler_dock()
         self.show()
 
     def __create_icon(self, filename: str, description: str) -> None:
         raise NotImplementedError()
 
     def __init_open_act(self) -> None:
-        self.open_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "open.png")), 'Open...', self)
+        self.open_act = QAction(icon("open.png"), 'Open...', self)
         self.open_act.setShortcut('Ctrl+O')
         self.open_act.triggered.connect(self.image_label.open_image)
 
+    def __init_open_folder_act(self) -> None:
+        self.open_folder_act = QAction("Open Folder...", self)
+        self.open_folder_act.setShortcut('Ctrl+Shift+O')
+        self.open_folder_act.triggered.connect(self.image_label.open_folder)
+
+    def __init_next_image_act(self) -> None:
+        self.next_image_act = QAction("Next Image", self)
+        self.next_image_act.setShortcut('PgDown')
+        self.next_image_act.triggered.connect(self.image_label.next_image)
+        self.next_image_act.setEnabled(False)
+
+    def __init_previous_image_act(self) -> None:
+        self.previous_image_act = QAction("Previous Image", self)
+        self.previous_image_act.setShortcut('PgUp')
+        self.previous_image_act.triggered.connect(self.image_label.previous_image)
+        self.previous_image_act.setEnabled(False)
+
     def __init_save_act(self) -> None:
-        self.save_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "save.png")), "Save...", self)
+        self.save_act = QAction(icon("save.png"), "Save...", self)
         self.save_act.setShortcut('Ctrl+S')
         self.save_act.triggered.connect(self.image_label.save_image)
         self.save_act.setEnabled(False)
 
     def __init_print_act(self) -> None:
-        self.print_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "print.png")), "Print...", self)
+        self.print_act = QAction(icon("print.png"), "Print...", self)
         self.print_act.setShortcut('Ctrl+P')
         self.print_act.setEnabled(False)
 
     def __init_exit_act(self) -> None:
         self.exit_act = QAction(
-            QIcon(os.path.join(settings['ICON_PATH'], "exit.png")), 'Quit Photo Editor', self
+            icon("exit.png"), 'Quit Photo Editor', self
         )
         self.exit_act.setShortcut('Ctrl+Q')
         self.exit_act.triggered.connect(self.close)
 
     def __init_crop_act(self) -> None:
-        self.crop_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "crop.png")), "Crop", self)
+        self.crop_act = QAction(icon("crop.png"), "Crop", self)
         self.crop_act.setShortcut('Shift+X')
         self.crop_act.triggered.connect(self.image_label.cropImage)
 
     def __init_resize_act(self) -> None:
-        self.resize_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "resize.png")), "Resize", self)
+        self.resize_act = QAction(icon("resize.png"), "Resize", self)
         self.resize_act.setShortcut('Shift+Z')
         self.resize_act.triggered.connect(self.image_label.resizeImage)
 
@@ -102,14 +137,26 @@ class MeasurerGUI(QMainWindow):
         self.revert_act.triggered.connect(self.image_label.revertToOriginal)
         self.revert_act.setEnabled(False)
 
+    def __init_undo_act(self) -> None:
+        self.undo_act = QAction("Undo", self)
+        self.undo_act.setShortcut('Ctrl+Z')
+        self.undo_act.triggered.connect(self.image_label.undo)
+        self.undo_act.setEnabled(False)
+
+    def __init_redo_act(self) -> None:
+        self.redo_act = QAction("Redo", self)
+        self.redo_act.setShortcuts(['Ctrl+Y', 'Ctrl+Shift+Z'])
+        self.redo_act.triggered.connect(self.image_label.redo)
+        self.redo_act.setEnabled(False)
+
     def __init_zoom_in_act(self):
-        self.zoom_in_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "zoom_in.png")), 'Zoom In', self)
+        self.zoom_in_act = QAction(icon("zoom_in.png"), 'Zoom In', self)
         self.zoom_in_act.setShortcut('Ctrl++')
         self.zoom_in_act.triggered.connect(lambda: self.zoom_image(1 + settings['ZOOM_FACTOR']))
         self.zoom_in_act.setEnabled(False)
 
     def __init_zoom_out_act(self):
-        self.zoom_out_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "zoom_out.png")), 'Zoom Out', self)
+        self.zoom_out_act = QAction(icon("zoom_out.png"), 'Zoom Out', self)
         self.zoom_out_act.setShortcut('Ctrl+-')
         self.zoom_out_act.triggered.connect(lambda: self.zoom_image(1 - settings['ZOOM_FACTOR']))
         self.zoom_out_act.setEnabled(False)
@@ -121,14 +168,14 @@ class MeasurerGUI(QMainWindow):
         self.normal_size_act.setEnabled(False)
 
     def __init_rotate90_cw_act(self):
-        self.rotate90_cw_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "rotate90_cw.png")), 'Rotate 90º CW',
+        self.rotate90_cw_act = QAction(icon("rotate90_cw.png"), 'Rotate 90º CW',
                                        self)
         self.rotate90_cw_act.triggered.connect(
             lambda: self.image_label.rotate_image(settings["ROTATION_DIRECTION"]["CW"])
         )
 
     def __init_rotate90_ccw_act(self):
-        self.rotate90_ccw_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "rotate90_ccw.png")),
+        self.rotate90_ccw_act = QAction(icon("rotate90_ccw.png"),
                                         'Rotate 90º CCW', self)
         self.rotate90_ccw_act.triggered.connect(
             lambda: self.image_label.rotate_image(settings["ROTATION_DIRECTION"]["CCW"])
@@ -136,20 +183,37 @@ class MeasurerGUI(QMainWindow):
 
     def __init_flip_horizontal_act(self):
         self.flip_horizontal_act = QAction(
-            QIcon(os.path.join(settings['ICON_PATH'], "flip_horizontal.png")), 'Flip Horizontal', self
+            icon("flip_horizontal.png"), 'Flip Horizontal', self
         )
         self.flip_horizontal_act.triggered.connect(
             lambda: self.image_label.flip_image(settings["REFLECTION_DIRECTION"]["HORIZONTAL"])
         )
 
     def __init_flip_vertical_act(self):
-        self.flip_vertical_act = QAction(QIcon(os.path.join(settings['ICON_PATH'], "flip_vertical.png")),
+        self.flip_vertical_act = QAction(icon("flip_vertical.png"),
                                          'Flip Vertical',
                                          self)
         self.flip_vertical_act.triggered.connect(
             lambda: self.image_label.flip_image(settings["REFLECTION_DIRECTION"]["VERTICAL"])
         )
 
+    def __init_measure_act(self):
+        self.measure_act = QAction("Measure Particles", self)
+        self.measure_act.setShortcut('Ctrl+M')
+        self.measure_act.triggered.connect(self.image_label.measure_particles)
+        self.measure_act.setEnabled(False)
+
+    def __init_track_act(self):
+        self.track_act = QAction("Track Particles", self)
+        self.track_act.setShortcut('Ctrl+Shift+M')
+        self.track_act.triggered.connect(self.image_label.track_particles)
+        self.track_act.setEnabled(False)
+
+    def __init_calibrate_act(self):
+        self.calibrate_act = QAction("Set Scale...", self)
+        self.calibrate_act.triggered.connect(self.calibrate)
+        self.calibrate_act.setEnabled(False)
+
     def create_menu(self) -> None:
         """Set up the menubar."""
 
@@ -166,15 +230,28 @@ class MeasurerGUI(QMainWindow):
 
         file_menu = menu_bar.addMenu('File')
         file_menu.addAction(self.open_act)
+        file_menu.addAction(self.open_folder_act)
+        file_menu.addSeparator()
+        file_menu.addAction(self.previous_image_act)
+        file_menu.addAction(self.next_image_act)
+        file_menu.addSeparator()
         file_menu.addAction(self.save_act)
         file_menu.addSeparator()
         file_menu.addAction(self.print_act)
 
         edit_menu = menu_bar.addMenu('Edit')
+        edit_menu.addAction(self.undo_act)
+        edit_menu.addAction(self.redo_act)
+        edit_menu.addSeparator()
         edit_menu.addAction(self.revert_act)
 
-        views_menu = menu_bar.addMenu('Views')
-        views_menu.addAction(self.tools_menu_act)
+        analyze_menu = menu_bar.addMenu('Analyze')
+        analyze_menu.addAction(self.measure_act)
+        analyze_menu.addAction(self.track_act)
+        analyze_menu.addSeparator()
+        analyze_menu.addAction(self.calibrate_act)
+
+        self.views_menu = menu_bar.addMenu('Views')
 
     def create_toolbar(self):
         """Set up the toolbar."""
@@ -207,20 +284,20 @@ class MeasurerGUI(QMainWindow):
         self.editing_bar.setMinimumWidth(90)
 
         convert_to_grayscale = QToolButton()
-        convert_to_grayscale.setIcon(QIcon(os.path.join(settings['ICON_PATH'], "grayscale.png")))
+        convert_to_grayscale.setIcon(icon("grayscale.png"))
         convert_to_grayscale.clicked.connect(self.image_label.convertToGray)
 
         convert_to_RGB = QToolButton()
-        convert_to_RGB.setIcon(QIcon(os.path.join(settings['ICON_PATH'], "rgb.png")))
+        convert_to_RGB.setIcon(icon("rgb.png"))
         convert_to_RGB.clicked.connect(self.image_label.convert2rgb)
 
         convert_to_sepia = QToolButton()
-        convert_to_sepia.setIcon(QIcon(os.path.join(settings['ICON_PATH'], "sepia.png")))
+        convert_to_sepia.setIcon(icon("sepia.png"))
         convert_to_sepia.clicked.connect(self.image_label.convertToSepia)
 
         change_hue = QToolButton()
-        change_hue.setIcon(QIcon(os.path.join(settings['ICON_PATH'], "")))
-        change_hue.clicked.connect(self.image_label.changeHue)
+        change_hue.setIcon(icon(""))
+        change_hue.clicked.connect(lambda: self.image_label.changeHue(settings['HUE_SHIFT']))
 
         brightness_label = QLabel("Brightness")
         self.brightness_slider = QSlider(Qt.Horizontal)
@@ -228,6 +305,8 @@ class MeasurerGUI(QMainWindow):
         self.brightness_slider.setTickInterval(35)
         self.brightness_slider.setTickPosition(QSlider.TicksAbove)
         self.brightness_slider.valueChanged.connect(self.image_label.change_brightness)
+        self.brightness_slider.sliderPressed.connect(self.image_label.begin_preview)
+        self.brightness_slider.sliderReleased.connect(self.image_label.end_preview)
 
         contrast_label = QLabel("Contrast")
         self.contrast_slider = QSlider(Qt.Horizontal)
@@ -235,9 +314,24 @@ class MeasurerGUI(QMainWindow):
         self.contrast_slider.setTickInterval(35)
         self.contrast_slider.setTickPosition(QSlider.TicksAbove)
         self.contrast_slider.valueChanged.connect(self.image_label.change_contrast)
+        self.contrast_slider.sliderPressed.connect(self.image_label.begin_preview)
+        self.contrast_slider.sliderReleased.connect(self.image_label.end_preview)
+
+        self.histogram_panel = HistogramPanel()
+
+        auto_levels = QToolButton()
+        auto_levels.setText("Auto")
+        auto_levels.setToolTip("Auto levels")
+        auto_levels.clicked.connect(self.image_label.auto_levels)
+
+        equalize = QToolButton()
+        equalize.setText("CLAHE")
+        equalize.setToolTip("Adaptive histogram equalization")
+        equalize.clicked.connect(self.image_label.equalize)
 
         editing_grid = QGridLayout()
 
+        editing_grid.addWidget(self.histogram_panel, 0, 0, 1, 2)
         editing_grid.addWidget(convert_to_grayscale, 1, 0)
         editing_grid.addWidget(convert_to_RGB, 1, 1)
         editing_grid.addWidget(convert_to_sepia, 2, 0)
@@ -246,7 +340,9 @@ class MeasurerGUI(QMainWindow):
         editing_grid.addWidget(self.brightness_slider, 4, 0, 1, 0)
         editing_grid.addWidget(contrast_label, 5, 0)
         editing_grid.addWidget(self.contrast_slider, 6, 0, 1, 0)
-        editing_grid.setRowStretch(7, 10)
+        editing_grid.addWidget(auto_levels, 7, 0)
+        editing_grid.addWidget(equalize, 7, 1)
+        editing_grid.setRowStretch(8, 10)
 
         container = QWidget()
         container.setLayout(editing_grid)
@@ -256,17 +352,59 @@ class MeasurerGUI(QMainWindow):
         self.addDockWidget(Qt.LeftDockWidgetArea, self.editing_bar)
 
         self.tools_menu_act = self.editing_bar.toggleViewAction()
+        self.views_menu.addAction(self.tools_menu_act)
+
+        self.image_label.history_changed.connect(self.sync_history)
+        self.image_label.measured.connect(self.show_measurements)
+        self.image_label.region_measured.connect(self.show_region)
+        self.image_label.histogram_changed.connect(self.histogram_panel.set_histograms)
+
+    def create_profiler_dock(self) -> None:
+        """Set up the profiler dock, hidden until chosen from the Views menu."""
+        profiler.set_capacity(settings['PROFILER']['CAPACITY'])
+        if settings['PROFILER']['ENABLED']:
+            profiler.enable(settings['PROFILER']['ALLOCATIONS'])
+
+        self.profiler_dock = ProfilerDock(profiler, parent=self)
+        self.profiler_dock.allocations.setChecked(settings['PROFILER']['ALLOCATIONS'])
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.profiler_dock)
+        self.profiler_dock.hide()
+        self.views_menu.addAction(self.profiler_dock.toggleViewAction())
+
+    @instrumented(frame=window_frame)
+    def sync_history(self) -> None:
+        """Match the undo/redo actions and sliders to the current edit state."""
+        history = self.image_label.history
+        self.undo_act.setEnabled(history.can_undo)
+        self.redo_act.setEnabled(history.can_redo)
+
+        levels = self.image_label.pipeline.get('levels')
+        for slider, value in ((self.brightness_slider, levels['brightness']),
+                              (self.contrast_slider, levels['contrast'])):
+            slider.blockSignals(True)
+            slider.setValue(value)
+            slider.blockSignals(False)
 
     def __init_main_label(self):
         """Create an instance of the ImageLabel class and set it
            as the main window's central widget."""
         self.image_label = Image(self)
-        self.image_label.resize(self.image_label.pixmap().size())
 
         self.scroll_area = Scroller()
         self.scroll_area.setBackgroundRole(QPalette.Dark)
         self.scroll_area.setAlignment(Qt.AlignCenter)
         self.scroll_area.setWidget(self.image_label)
+        self.image_label.frame_changed.connect(self.show_frame_position)
+        self.image_label.tracked.connect(self.show_trajectories)
+        self.image_label.exported.connect(
+            lambda paths: self.statusBar().showMessage(f"Saved {', '.join(map(os.path.basename, paths))}"))
+
+        # Permanent, so region statistics in the status bar do not hide it
+        self.pointer_label = QLabel()
+        self.statusBar().addPermanentWidget(self.pointer_label)
+        self.image_label.pointer_moved.connect(
+            lambda x, y, unit: self.pointer_label.setText(f"{x:.4g}, {y:.4g} {unit}"))
+        self.image_label.calibration_changed.connect(self.show_calibration)
 
         self.setCentralWidget(self.scroll_area)
 
@@ -278,18 +416,22 @@ class MeasurerGUI(QMainWindow):
         self.zoom_in_act.setEnabled(True)
         self.zoom_out_act.setEnabled(True)
         self.normal_size_act.setEnabled(True)
+        self.measure_act.setEnabled(True)
+        self.calibrate_act.setEnabled(True)
 
+    @instrumented(frame=window_frame)
     def zoom_image(self, zoom_value: float) -> None:
         """Zoom in and zoom out."""
 
-        self.image_label.resize(self.image_label.size() * zoom_value)
+        self.image_label.set_zoom(self.image_label.zoom * zoom_value)
 
         self.__adjust_scrollbar(self.scroll_area.horizontalScrollBar(), zoom_value)
         self.__adjust_scrollbar(self.scroll_area.verticalScrollBar(), zoom_value)
 
+    @instrumented(frame=window_frame)
     def normalize_size(self):
         """View image with its normal dimensions."""
-        self.image_label.adjustSize()
+        self.image_label.set_zoom(1.0)
 
     @staticmethod
     def __adjust_scrollbar(scroll_bar: QScrollBar, value: float) -> None:
@@ -297,6 +439,86 @@ class MeasurerGUI(QMainWindow):
         value = int(value * scroll_bar.value() + ((value - 1) * scroll_bar.pageStep() / 2))
         scroll_bar.setValue(value)
 
+    @instrumented(frame=window_frame)
+    def show_measurements(self, table) -> None:
+        """Summarize a particle measurement."""
+        if not len(table):
+            QMessageBox.information(self, "Particles", "No particles found.", QMessageBox.Ok)
+            return
+
+        # Particles are measured on the render, so its crops, resizes and orientation apply
+        transform = self.image_label.transform
+        length, unit = transform.pixel_length, transform.unit
+        QMessageBox.information(self, "Particles",
+                                f"Particles: {len(table)}\n"
+                                f"Mean area: {table['area'].mean() * transform.pixel_area:.4g} {unit}²\n"
+                                f"Mean equivalent diameter: {table['equivalent_diameter'].mean() * length:.4g} {unit}\n"
+                                f"Mean perimeter: {table['perimeter'].mean() * length:.4g} {unit}",
+                                QMessageBox.Ok)
+
+    def show_frame_position(self, index: int, count: int, path: str) -> None:
+        """Name the open frame in the title bar and enable stepping away from it."""
+        self.print_act.setEnabled(True)
+        self.update_actions()
+        self.setWindowTitle(f"{os.path.basename(path)} ({index + 1}/{count}) - {settings['MAIN_WINDOW']['TITLE']}")
+        self.previous_image_act.setEnabled(index > 0)
+        self.next_image_act.setEnabled(index < count - 1)
+        self.track_act.setEnabled(count > 1)
+
+    def show_trajectories(self, table) -> None:
+        """Summarize tracked trajectories and offer to save them."""
+        if not len(table):
+            QMessageBox.information(self, "Trajectories", "No particles found.", QMessageBox.Ok)
+            return
+
+        # Frames are tracked as stored, so only the pixel size of the files applies
+        calibration = self.image_label.calibration or PIXELS
+        length, unit = math.sqrt(calibration.pixel_width * calibration.pixel_height), calibration.unit
+        answer = QMessageBox.information(self, "Trajectories",
+                                         f"Trajectories: {len(table)}\n"
+                                         f"Mean lifetime: {table['lifetime'].mean():.1f} frames\n"
+                                         f"Mean displacement: {table['displacement'].mean() * length:.4g} {unit}\n"
+                                         f"Mean speed: {table['speed'].mean() * length:.4g} {unit}/frame",
+                                         QMessageBox.Save | QMessageBox.Close)
+        if answer != QMessageBox.Save:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trajectories", "trajectories.csv",
+                                              "CSV Files (*.csv);;NumPy Archives (*.npz)")
+        if path:
+            try:
+                export.write_table(path, table)
+            except (OSError, ValueError) as error:
+                QMessageBox.information(self, "Error", f"Unable to save trajectories: {error}", QMessageBox.Ok)
+
+    @instrumented(frame=window_frame)
+    def show_region(self, region) -> None:
+        """Report statistics of the selected region in the status bar."""
+        transform = self.image_label.transform
+        width, height = transform.axis_lengths
+        left, top = map_points(transform.image_to_physical, (region.left, region.top))
+        message = (f"{region.width * width:.4g}×{region.height * height:.4g} {transform.unit} "
+                   f"at ({left:.4g}, {top:.4g}): "
+                   f"mean {region.mean:.1f} ± {region.std:.1f}, "
+                   f"min {region.minimum:g}, max {region.maximum:g}")
+        if self.image_label.particles is not None:
+            message += f", particles {region.particles}"
+        self.statusBar().showMessage(message)
+
+    def calibrate(self) -> None:
+        """Ask for a reference line to set the scale from."""
+        self.image_label.calibrate()
+        self.statusBar().showMessage("Drag along a feature of known length to set the scale")
+
+    def show_calibration(self, calibration) -> None:
+        """Report the new pixel size in the status bar."""
+        if calibration is None:
+            self.statusBar().showMessage("Measuring in pixels")
+        elif calibration.pixel_width == calibration.pixel_height:
+            self.statusBar().showMessage(f"Scale: {calibration.pixel_width:.4g} {calibration.unit}/px")
+        else:
+            self.statusBar().showMessage(f"Scale: {calibration.pixel_width:.4g}×{calibration.pixel_height:.4g} "
+                                         f"{calibration.unit}/px")
+
     def aboutDialog(self):
         QMessageBox.about(self, "About Photo Editor",
                           "Measurer particles")
@@ -311,6 +533,7 @@ class MeasurerGUI(QMainWindow):
             else:
                 self.showMaximized()
 
+    @instrumented(frame=window_frame)
     def wheelEvent(self, event: QWheelEvent) -> None:
         wheel_direction = event.angleDelta().y()
         if wheel_direction == settings["MOUSEWHEEL_UP"]:
@@ -0,0 +1,18 @@
+import json
+import os
+from functools import lru_cache
+
+# settings.json sits next to the measurer package, so the editor starts from any working directory
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.json')
+
+
+@lru_cache(maxsize=None)
+def load_settings(path: str = SETTINGS_PATH) -> dict:
+    """Parse a settings file once per process; paths in it are relative to the file."""
+    with open(path) as settings_file:
+        loaded = json.load(settings_file)
+    loaded['ICON_PATH'] = os.path.join(os.path.dirname(path), loaded['ICON_PATH'])
+    return loaded
+
+
+settings = load_settings()
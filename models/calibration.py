@@ -0,0 +1,160 @@
+"""
+Physical scale of images, and the chain of affine transforms from the
+screen to it.
+
+A pointer position passes through the zoom, the orientation, any crops and
+resizes back to pixels of the file, then the pixel size of the file. Each
+step is a 3 x 3 matrix; ViewTransform multiplies them only when one of them
+changes, so mapping an event costs one matrix product.
+"""
+import math
+import os
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+from models import loader
+from models.geometry import Dihedral, scaling
+
+# Micrometres per unit of the TIFF ResolutionUnit tag: 2 is inches, 3 centimetres; 1 means no unit
+TIFF_UNITS = {2: 25400.0, 3: 10000.0}
+IMAGE_DESCRIPTION, X_RESOLUTION, Y_RESOLUTION, RESOLUTION_UNIT = 270, 282, 283, 296
+# Units ImageJ names in the image description when ResolutionUnit is 1
+IMAGEJ_UNITS = {'micron': 'µm', 'um': 'µm', 'µm': 'µm', '\\u00B5m': 'µm', 'nm': 'nm', 'mm': 'mm', 'cm': 'cm'}
+
+
+class Calibration(NamedTuple):
+    """Width and height of one pixel of an image file in `unit`."""
+    pixel_width: float
+    pixel_height: float
+    unit: str = 'µm'
+
+    @classmethod
+    def from_line(cls, pixels: float, length: float, unit: str = 'µm') -> "Calibration":
+        """Square pixels, from a line `pixels` long that is known to measure `length`."""
+        if pixels <= 0 or length <= 0:
+            raise ValueError("The reference line and its length must be longer than zero")
+        return cls(length / pixels, length / pixels, unit)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return scaling(self.pixel_width, self.pixel_height)
+
+
+# Pixels as their own unit, for images that are not calibrated
+PIXELS = Calibration(1.0, 1.0, 'px')
+
+
+def read_calibration(path: str):
+    """Pixel size recorded in an image file, or None; only TIFF resolution tags are read."""
+    if os.path.splitext(path)[1].lower() not in ('.tif', '.tiff'):
+        return None
+    try:
+        _, tags = loader.read_tiff_tags(path)
+    except (OSError, ValueError, ArithmeticError):
+        return None
+    return tiff_calibration(tags)
+
+
+def tiff_calibration(tags: dict):
+    """
+    Calibration from the XResolution, YResolution and ResolutionUnit tags,
+    or None when they name no unit. Files without ResolutionUnit are not
+    trusted, since many writers store a nominal 72 dpi.
+    """
+    if X_RESOLUTION not in tags or RESOLUTION_UNIT not in tags:
+        return None
+    unit, size = 'µm', TIFF_UNITS.get(tags[RESOLUTION_UNIT][0])
+    if size is None:
+        unit, size = imagej_unit(tags.get(IMAGE_DESCRIPTION, ())), 1.0
+        if unit is None:
+            return None
+
+    # Resolutions are pixels per unit, as rationals
+    rationals = (tags[X_RESOLUTION][0], tags.get(Y_RESOLUTION, tags[X_RESOLUTION])[0])
+    resolutions = [numerator / denominator if denominator else 0.0 for numerator, denominator in rationals]
+    if not all(resolutions):
+        return None
+    return Calibration(size / resolutions[0], size / resolutions[1], unit)
+
+
+def imagej_unit(description: tuple):
+    """Unit named by the "unit=" line ImageJ writes into the image description, or None."""
+    text = b''.join(description).decode('latin-1')
+    match = re.search(r'^unit=(.+)$', text, re.MULTILINE)
+    return IMAGEJ_UNITS.get(match.group(1).strip()) if match else None
+
+
+def parse_length(text: str, unit: str = 'µm') -> tuple[float, str]:
+    """A length such as "10 µm" or "2.5mm" as (value, unit); the unit defaults to `unit`."""
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*(\S*)\s*', text)
+    if match is None:
+        raise ValueError(f"{text!r} is not a length")
+    return float(match.group(1)), match.group(2) or unit
+
+
+def scale_bar_length(units_per_pixel: float, pixels: float) -> float:
+    """Longest round length (1, 2 or 5 times a power of ten) that fits in `pixels`."""
+    longest = units_per_pixel * pixels
+    if longest <= 0:
+        return 0.0
+    power = 10 ** math.floor(math.log10(longest))
+    return max(step * power for step in (1, 2, 5) if step * power <= longest)
+
+
+class ViewTransform:
+    """
+    Widget coordinates to pixels of the file and to physical units.
+
+    `to_pixels` composes the zoom, the orientation of the render and the
+    placement of a cropped or resized source within the file it came from;
+    `to_physical` adds the calibration. `image_to_physical` leaves out the
+    zoom, for measurements made on the render itself. All three are rebuilt
+    only when an input changes.
+    """
+
+    def __init__(self):
+        self.__key = None
+        self.calibration = PIXELS
+        self.to_pixels = np.eye(3)
+        self.to_physical = np.eye(3)
+        self.image_to_physical = np.eye(3)
+
+    def update(self, zoom: float, orientation: Dihedral, shape: tuple, placement: np.ndarray,
+               calibration: Calibration = None) -> "ViewTransform":
+        """Recompose the matrices if any transform changed; `shape` is that of the source before orientation."""
+        calibration = calibration or PIXELS
+        key = (zoom, orientation, tuple(shape[:2]), placement.tobytes(), calibration)
+        if key != self.__key:
+            self.__key = key
+            self.calibration = calibration
+            image_to_pixels = placement @ np.linalg.inv(orientation.matrix(shape))
+            self.to_pixels = image_to_pixels @ scaling(1 / zoom, 1 / zoom)
+            self.to_physical = calibration.matrix @ self.to_pixels
+            self.image_to_physical = calibration.matrix @ image_to_pixels
+        return self
+
+    @property
+    def unit(self) -> str:
+        return self.calibration.unit
+
+    @property
+    def pixel_area(self) -> float:
+        """Physical area of one pixel of the render."""
+        return abs(np.linalg.det(self.image_to_physical[:2, :2]))
+
+    @property
+    def pixel_length(self) -> float:
+        """Physical length of one pixel of the render; the geometric mean for pixels that are not square."""
+        return math.sqrt(self.pixel_area)
+
+    @property
+    def axis_lengths(self) -> tuple[float, float]:
+        """Physical length of one pixel of the render along its x and y axes."""
+        return float(np.hypot(*self.image_to_physical[:2, 0])), float(np.hypot(*self.image_to_physical[:2, 1]))
+
+    @property
+    def widget_pixel_length(self) -> float:
+        """Physical length of one widget pixel along the horizontal."""
+        return float(np.hypot(*self.to_physical[:2, 0]))
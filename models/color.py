@@ -0,0 +1,85 @@
+import numpy as np
+
+from models.lazy import cv2
+
+# Rows produce B, G, R, A from B, G, R, A input (QImage.Format_RGB32 memory order)
+SEPIA_KERNEL = np.array([
+    [0.131, 0.534, 0.272, 0.0],
+    [0.168, 0.686, 0.349, 0.0],
+    [0.189, 0.769, 0.393, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+], dtype=np.float32)
+
+
+def sepia(image_array: np.ndarray) -> np.ndarray:
+    """Apply the sepia matrix to a BGRA array in a single pass."""
+    return cv2.transform(image_array, SEPIA_KERNEL)
+
+
+def shift_hue(image_array: np.ndarray, hue: int, saturation: int = 0) -> np.ndarray:
+    """
+    Rotate the hue by `hue` degrees and add `saturation` (-255..255)
+    to the saturation of every pixel of a BGRA array.
+    """
+    if not hue % 360 and not saturation:
+        return image_array
+    if image_array.dtype != np.uint8:
+        # Float HSV has H in degrees and S in 0..1, so no precision is lost to a lookup table
+        hsv = cv2.cvtColor(to_unit_float(image_array), cv2.COLOR_BGR2HSV)
+        hsv[..., 0] = (hsv[..., 0] + hue) % 360
+        hsv[..., 1] = np.clip(hsv[..., 1] + saturation / 255, 0, 1)
+        return from_unit_float(cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR), image_array)
+
+    hsv = cv2.cvtColor(image_array, cv2.COLOR_BGR2HSV_FULL)
+
+    # HSV_FULL maps 360 degrees onto 0..255, so a shift modulo 256 wraps the hue
+    hue_lut = ((np.arange(256) + round(hue * 256 / 360)) % 256).astype(np.uint8)
+    saturation_lut = np.clip(np.arange(256) + saturation, 0, 255).astype(np.uint8)
+    identity_lut = np.arange(256, dtype=np.uint8)
+
+    lut = np.dstack((hue_lut, saturation_lut, identity_lut))
+    hsv = cv2.LUT(hsv, lut)
+
+    result = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR_FULL)
+    return np.dstack((result, image_array[..., 3]))
+
+
+def equalize(image_array: np.ndarray, clip_limit: float, tile_grid: int = 8) -> np.ndarray:
+    """
+    Contrast-limited adaptive histogram equalization (CLAHE) of the
+    lightness of a BGRA array, leaving its colours and alpha untouched.
+    """
+    if not clip_limit:
+        return image_array
+
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_grid, tile_grid))
+    if image_array.dtype == np.uint8:
+        lab = cv2.cvtColor(image_array, cv2.COLOR_BGR2LAB)
+        lab[..., 0] = clahe.apply(np.ascontiguousarray(lab[..., 0]))
+        result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+        return np.dstack((result, image_array[..., 3]))
+
+    # Float Lab has L in 0..100; CLAHE equalizes it as 16-bit to keep the depth
+    lab = cv2.cvtColor(to_unit_float(image_array), cv2.COLOR_BGR2LAB)
+    lightness = np.round(lab[..., 0] * (65535 / 100)).astype(np.uint16)
+    lab[..., 0] = clahe.apply(lightness) * (100 / 65535)
+    return from_unit_float(cv2.cvtColor(lab, cv2.COLOR_LAB2BGR), image_array)
+
+
+def to_unit_float(image_array: np.ndarray) -> np.ndarray:
+    """BGR channels of a 16-bit or float BGRA array as float32 in 0..1."""
+    bgr = image_array[..., :3]
+    if image_array.dtype == np.uint16:
+        return bgr.astype(np.float32) * (1 / 65535)
+    return np.ascontiguousarray(bgr, dtype=np.float32)
+
+
+def from_unit_float(bgr: np.ndarray, like: np.ndarray) -> np.ndarray:
+    """BGRA array at the depth of `like`, with its alpha, from float BGR in 0..1."""
+    result = np.empty_like(like)
+    if like.dtype == np.uint16:
+        result[..., :3] = np.clip(bgr * 65535 + 0.5, 0, 65535)
+    else:
+        result[..., :3] = np.clip(bgr, 0, 1)
+    result[..., 3] = like[..., 3]
+    return result
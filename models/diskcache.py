@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CHUNK_SIZE = 2 ** 20
+
+
+def default_directory() -> str:
+    """Per-user cache folder, following the XDG convention."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'measurer')
+
+
+class DiskCache:
+    """
+    Arrays stored on disk under keys derived from file contents and
+    operation parameters, so a result is found again whatever the file is
+    called and is never served for a changed file.
+
+    Entries are .npy files and are returned memory-mapped, so a hit costs
+    one open() and pages are read only as they are touched. The least
+    recently used entries are deleted once the total size exceeds
+    `capacity` bytes; recency survives restarts as file modification times.
+    Safe to use from several worker threads.
+    """
+
+    def __init__(self, directory: str, capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.nbytes = 0
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+        self.__digests = {}
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.npy'):
+                status = entry.stat()
+                entries.append((status.st_mtime_ns, entry.name, status.st_size))
+        for _, name, size in sorted(entries):
+            self.__entries[name] = size
+            self.nbytes += size
+
+    def digest(self, path: str) -> str:
+        """Hash of a file's contents, remembered while its size and modification time stay the same."""
+        status = os.stat(path)
+        signature = (os.path.abspath(path), status.st_size, status.st_mtime_ns)
+        with self.__lock:
+            if signature in self.__digests:
+                return self.__digests[signature]
+
+        content = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                content.update(chunk)
+        with self.__lock:
+            self.__digests[signature] = content.hexdigest()
+        return content.hexdigest()
+
+    @staticmethod
+    def key(digest: str, operation: str, **params) -> str:
+        """Key of the result of an operation on the file with this digest."""
+        description = json.dumps([digest, operation, params], sort_keys=True, default=repr)
+        return hashlib.blake2b(description.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str):
+        """The stored array, memory-mapped read-only, or None."""
+        name = key + '.npy'
+        try:
+            image_array = np.load(os.path.join(self.directory, name), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        with self.__lock:
+            if name in self.__entries:
+                self.__entries.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.directory, name))
+        except OSError:
+            pass
+        return image_array
+
+    def put(self, key: str, image_array: np.ndarray) -> None:
+        """Store an array, evicting least recently used entries to stay within capacity."""
+        name = key + '.npy'
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.{threading.get_ident()}.part"
+        with open(partial, 'wb') as output:
+            np.save(output, np.ascontiguousarray(image_array))
+        os.replace(partial, path)
+
+        size = os.path.getsize(path)
+        with self.__lock:
+            self.nbytes += size - self.__entries.pop(name, 0)
+            self.__entries[name] = size
+            evicted = []
+            while self.nbytes > self.capacity and len(self.__entries) > 1:
+                oldest, oldest_size = self.__entries.popitem(last=False)
+                self.nbytes -= oldest_size
+                evicted.append(oldest)
+
+        for oldest in evicted:
+            try:
+                # Arrays already mapped from the file stay readable after it is unlinked
+                os.remove(os.path.join(self.directory, oldest))
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self.__lock:
+            names, self.__entries = list(self.__entries), OrderedDict()
+            self.nbytes = 0
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key + '.npy' in self.__entries
@@ -0,0 +1,115 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from models.lazy import cv2
+
+# Mirror axes as (x, y) scale factors, as in settings' REFLECTION_DIRECTION
+HORIZONTAL = (-1, 1)
+VERTICAL = (1, -1)
+BOTH = (-1, -1)
+
+# Names rather than values, so defining the table does not import OpenCV
+ROTATIONS = {
+    1: 'ROTATE_90_CLOCKWISE',
+    2: 'ROTATE_180',
+    3: 'ROTATE_90_COUNTERCLOCKWISE',
+}
+
+
+class Dihedral(NamedTuple):
+    """
+    One of the eight lossless orientations of an image: an optional mirror
+    across the vertical axis followed by `turns` clockwise quarter turns.
+
+    Any sequence of 90 degree rotations and flips composes into a single
+    element, so a stack of edits costs at most one pixel permutation, and
+    view() performs it as a strided view that touches no pixels at all.
+    """
+    turns: int = 0
+    mirrored: bool = False
+
+    def rotated(self, degrees: int) -> "Dihedral":
+        """This orientation followed by a clockwise rotation by a multiple of 90 degrees."""
+        if degrees % 90:
+            raise ValueError(f"Only quarter turns are lossless, not {degrees} degrees")
+        return Dihedral((self.turns + degrees // 90) % 4, self.mirrored)
+
+    def flipped(self, axis: tuple[int, int]) -> "Dihedral":
+        """This orientation followed by a flip; axis is (-1, 1) for left-right, (1, -1) for up-down."""
+        axis = tuple(axis)
+        if axis == BOTH:
+            return self.rotated(180)
+        if axis == HORIZONTAL:
+            # A mirror after k turns is the mirror before -k turns
+            return Dihedral(-self.turns % 4, not self.mirrored)
+        if axis == VERTICAL:
+            return Dihedral((2 - self.turns) % 4, not self.mirrored)
+        raise ValueError(f"Unknown flip axis {axis}")
+
+    def inverse(self) -> "Dihedral":
+        # Every mirrored element is its own inverse
+        return self if self.mirrored else Dihedral(-self.turns % 4, False)
+
+    @property
+    def swaps_axes(self) -> bool:
+        return self.turns % 2 == 1
+
+    def shape(self, shape: tuple) -> tuple:
+        """Shape of an array of this shape once oriented."""
+        shape = tuple(shape)
+        return (shape[1], shape[0]) + shape[2:] if self.swaps_axes else shape
+
+    def view(self, image_array: np.ndarray) -> np.ndarray:
+        """The oriented array as a view with permuted strides; no pixels are read or copied."""
+        if self.mirrored:
+            image_array = image_array[:, ::-1]
+        return np.rot90(image_array, -self.turns) if self.turns else image_array
+
+    def apply(self, image_array: np.ndarray) -> np.ndarray:
+        """The oriented array as a new contiguous array, in at most two OpenCV passes."""
+        image_array = np.ascontiguousarray(image_array)
+        if self.mirrored:
+            image_array = cv2.flip(image_array, 1)
+        return cv2.rotate(image_array, getattr(cv2, ROTATIONS[self.turns])) if self.turns else image_array
+
+    def map_rect(self, rect: tuple, shape: tuple) -> tuple:
+        """Where an (x, y, width, height) rectangle of an array of this shape lands once oriented."""
+        x, y, width, height = rect
+        rows, cols = shape[:2]
+        if self.mirrored:
+            x = cols - x - width
+        for _ in range(self.turns):
+            x, y, width, height = rows - y - height, x, height, width
+            rows, cols = cols, rows
+        return x, y, width, height
+
+    def unmap_rect(self, rect: tuple, shape: tuple) -> tuple:
+        """Rectangle of a source of this shape that a rectangle of the oriented array shows."""
+        return self.inverse().map_rect(rect, self.shape(shape))
+
+    def matrix(self, shape: tuple) -> np.ndarray:
+        """Affine matrix taking (x, y) of a source of this shape to where it lands once oriented."""
+        rows, cols = shape[:2]
+        matrix = np.eye(3)
+        if self.mirrored:
+            matrix = np.array([[-1.0, 0, cols], [0, 1, 0], [0, 0, 1]])
+        for _ in range(self.turns):
+            # (x, y) -> (rows - y, x), as for the corners in map_rect
+            matrix = np.array([[0.0, -1, rows], [1, 0, 0], [0, 0, 1]]) @ matrix
+            rows, cols = cols, rows
+        return matrix
+
+
+def translation(x: float, y: float) -> np.ndarray:
+    return np.array([[1.0, 0, x], [0, 1, y], [0, 0, 1]])
+
+
+def scaling(x: float, y: float) -> np.ndarray:
+    return np.array([[x, 0, 0], [0, y, 0], [0, 0, 1.0]])
+
+
+def map_points(matrix: np.ndarray, points) -> np.ndarray:
+    """Apply an affine matrix to (x, y) points, given as an (n, 2) array or a single pair."""
+    points = np.asarray(points, np.float64)
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
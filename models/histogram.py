@@ -0,0 +1,111 @@
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from models.loader import is_working, to_bgra, to_working
+
+BINS = 256
+
+
+def sample_step(shape: tuple, max_pixels: int) -> int:
+    """Stride in both directions that leaves at most max_pixels of an image of this shape."""
+    pixels = shape[0] * shape[1]
+    return max(int(np.ceil((pixels / max_pixels) ** 0.5)), 1) if max_pixels else 1
+
+
+def channel_histograms(image_array: np.ndarray, step: int = 1, tone_map=None) -> np.ndarray:
+    """
+    256-bin histograms of the blue, green and red channels of every step-th
+    pixel in both directions, as a (3, 256) array from one bincount pass.
+    Deep data is binned as `tone_map` displays it, so the bins span the
+    tone window rather than the full 16-bit or float range.
+    """
+    sample = image_array[::step, ::step]
+    if tone_map is not None and sample.dtype != np.uint8:
+        sample = tone_map(sample if is_working(sample) else to_working(sample))
+    elif sample.dtype != np.uint8 or sample.ndim != 3 or sample.shape[2] not in (3, 4):
+        sample = to_bgra(sample)
+
+    # Offset each channel into its own block of bins so one bincount covers all three
+    offsets = np.arange(3, dtype=np.intp) * BINS
+    keys = sample[..., :3] + offsets
+    return np.bincount(keys.ravel(), minlength=3 * BINS).reshape(3, BINS)
+
+
+def percentiles(histogram: np.ndarray, low: float, high: float) -> tuple[int, int]:
+    """Bins below which `low` and `high` fractions of the counts of a histogram fall."""
+    cumulative = np.cumsum(histogram)
+    total = cumulative[-1]
+    return (int(np.searchsorted(cumulative, low * total, side='right')),
+            int(np.searchsorted(cumulative, high * total, side='left')))
+
+
+def auto_levels(histograms: np.ndarray, clip: float = 0.005,
+                window: tuple[float, float] = (0.0, 1.0)) -> tuple[int, int]:
+    """
+    Brightness and contrast of the levels stage that stretch the values
+    between the `clip` and 1 - `clip` quantiles over the full 0-255 range.
+
+    Histograms of deep data are binned over the tone `window` (fractions of
+    full scale), and the levels stage runs before the tone map, so the
+    quantiles are mapped back to data units and stretched over the window
+    rather than over full scale.
+    """
+    low, high = percentiles(histograms.sum(axis=0), clip, 1 - clip)
+    if high <= low:
+        return 0, 0
+    window_low, window_high = window
+    gain = 255 / (high - low)
+    # Data value of the low quantile, as a fraction of full scale, and the offset that moves it to window_low
+    value = window_low + low / 255 * (window_high - window_low)
+    offset = window_low - gain * value
+    return round(offset * 255), round((gain - 1) * 100)
+
+
+class HistogramCache:
+    """
+    Histograms of recent image versions, refined from a sparse sample
+    towards every pixel.
+
+    A version is a source array together with the parameters it was
+    rendered with. Entries hold the source weakly, so a cached histogram is
+    never returned for a different array that reused a freed id.
+    """
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def version(source: np.ndarray, params: dict) -> tuple:
+        return id(source), tuple((name, tuple(sorted(stage.items()))) for name, stage in params.items())
+
+    def get(self, source: np.ndarray, params: dict):
+        """(histograms, step) of a version, or None if it has not been sampled."""
+        key = self.version(source, params)
+        entry = self.entries.get(key)
+        if entry is None or entry[0]() is not source:
+            return None
+        self.entries.move_to_end(key)
+        return entry[1], entry[2]
+
+    def put(self, source: np.ndarray, params: dict, histograms: np.ndarray, step: int) -> None:
+        """Store histograms sampled at step, unless a finer sample is already cached."""
+        cached = self.get(source, params)
+        if cached is not None and cached[1] <= step:
+            return
+        self.entries[self.version(source, params)] = (weakref.ref(source), histograms, step)
+        self.entries.move_to_end(self.version(source, params))
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def sample(self, source: np.ndarray, params: dict, image_array: np.ndarray, step: int,
+               tone_map=None) -> np.ndarray:
+        """Histograms of a version at step or finer, computing and caching them if needed."""
+        cached = self.get(source, params)
+        if cached is not None and cached[1] <= step:
+            return cached[0]
+        histograms = channel_histograms(image_array, step, tone_map)
+        self.put(source, params, histograms, step)
+        return histograms
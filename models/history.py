@@ -0,0 +1,282 @@
+import zlib
+from collections import deque
+
+import numpy as np
+
+
+class Snapshot:
+    """
+    Pixels of an array kept as cheaply as possible for a later restore.
+
+    Arrays that are memory-mapped or share memory with `reference` are kept
+    by reference, since holding them costs no extra RAM; a view stops being
+    free once the live source no longer shares its memory, and release()
+    then queues it for compression like any other. Arrays shaped like
+    the reference are stored as compressed XOR deltas of the tiles that
+    differ; anything else as compressed tiles.
+
+    Taking a snapshot costs nothing: the pixels are held as they are until
+    encode() compresses them, which the caller runs off the GUI thread. A
+    snapshot can be restored before, during or after that.
+    """
+
+    def __init__(self, image_array: np.ndarray, reference: np.ndarray, tile_size: int = 256):
+        self.shape = image_array.shape
+        self.dtype = image_array.dtype
+        self.tile_size = tile_size
+        self.array = image_array
+        self.tiles = {}
+        self.delta = False
+        # Set only while the pixels still wait to be compressed
+        self.reference = None
+        # Set only while the pixels are kept by reference because they share memory with this array
+        self.shared = None
+
+        if isinstance(image_array, np.memmap):
+            pass
+        elif np.may_share_memory(image_array, reference):
+            self.shared = reference
+        else:
+            self.reference = reference
+
+    @property
+    def pending(self) -> bool:
+        return self.reference is not None
+
+    @property
+    def nbytes(self) -> int:
+        # Pending pixels are counted once compressed, so a fresh step never evicts the steps before it
+        return sum(map(len, self.tiles.values()))
+
+    def release(self, source: np.ndarray) -> None:
+        """Queue pixels kept by reference for compression if they no longer share memory with `source`."""
+        if self.shared is not None and not np.may_share_memory(self.array, source):
+            self.reference, self.shared = self.shared, None
+
+    def encode(self) -> None:
+        """Compress the pixels; safe on a worker thread while the GUI thread restores the snapshot."""
+        image_array, reference = self.array, self.reference
+        if reference is None:
+            return
+
+        delta = (image_array.shape == reference.shape and image_array.dtype == reference.dtype
+                 and np.issubdtype(image_array.dtype, np.integer))
+        tiles = {}
+        for key, tile in self.__tiles(image_array):
+            if delta:
+                difference = tile ^ self.__tile(reference, key)
+                if difference.any():
+                    tiles[key] = zlib.compress(difference.tobytes(), 1)
+            else:
+                tiles[key] = zlib.compress(np.ascontiguousarray(tile).tobytes(), 1)
+
+        # The tiles are in place before the pixels are dropped, so restore() always finds one or the other
+        self.tiles, self.delta = tiles, delta
+        self.array = self.reference = None
+
+    def restore(self, reference: np.ndarray) -> np.ndarray:
+        """Rebuild the array; `reference` must be the array the snapshot was taken against."""
+        image_array = self.array
+        if image_array is not None:
+            return image_array
+
+        image_array = np.array(reference) if self.delta else np.empty(self.shape, self.dtype)
+        for key, tile in self.__tiles(image_array):
+            data = self.tiles.get(key)
+            if data is None:
+                continue
+            values = np.frombuffer(zlib.decompress(data), self.dtype).reshape(tile.shape)
+            if self.delta:
+                tile ^= values
+            else:
+                tile[...] = values
+        return image_array
+
+    def __tile(self, image_array: np.ndarray, key: tuple[int, int]) -> np.ndarray:
+        top, left = key
+        return image_array[top:top + self.tile_size, left:left + self.tile_size]
+
+    def __tiles(self, image_array: np.ndarray):
+        for top in range(0, self.shape[0], self.tile_size):
+            for left in range(0, self.shape[1], self.tile_size):
+                yield (top, left), self.__tile(image_array, (top, left))
+
+
+class Command:
+    """An undoable edit of an AdjustmentPipeline."""
+    label = ''
+    nbytes = 0
+    snapshots = ()
+
+    def undo(self, pipeline) -> None:
+        raise NotImplementedError()
+
+    def redo(self, pipeline) -> None:
+        raise NotImplementedError()
+
+
+class ParamCommand(Command):
+    """Change of stage parameters; undone by restoring the previous parameters."""
+
+    def __init__(self, label: str, before: dict, after: dict):
+        self.label = label
+        self.before = before
+        self.after = after
+
+    def undo(self, pipeline) -> None:
+        pipeline.params = self.before
+
+    def redo(self, pipeline) -> None:
+        pipeline.params = self.after
+
+
+class SourceCommand(Command):
+    """
+    Replacement of the pipeline source; keeps a snapshot of whichever source
+    is not current, and its placement.
+    """
+
+    def __init__(self, label: str, before: np.ndarray, after: np.ndarray, placement: np.ndarray = None):
+        self.label = label
+        self.other = Snapshot(before, after)
+        self.placement = placement
+
+    @property
+    def nbytes(self) -> int:
+        return self.other.nbytes
+
+    @property
+    def snapshots(self) -> tuple[Snapshot, ...]:
+        return self.other,
+
+    def undo(self, pipeline) -> None:
+        current, placement = pipeline.source, pipeline.placement
+        restored = self.other.restore(current)
+        self.other = Snapshot(current, restored)
+        pipeline.set_source(restored, self.placement)
+        self.placement = placement
+
+    redo = undo
+
+
+class CompoundCommand(Command):
+    """Several commands undone and redone as one step."""
+
+    def __init__(self, label: str, *commands: Command):
+        self.label = label
+        self.commands = commands
+
+    @property
+    def nbytes(self) -> int:
+        return sum(command.nbytes for command in self.commands)
+
+    @property
+    def snapshots(self) -> tuple[Snapshot, ...]:
+        return tuple(snapshot for command in self.commands for snapshot in command.snapshots)
+
+    def undo(self, pipeline) -> None:
+        for command in reversed(self.commands):
+            command.undo(pipeline)
+
+    def redo(self, pipeline) -> None:
+        for command in self.commands:
+            command.redo(pipeline)
+
+
+class History:
+    """
+    Undo/redo stacks of commands within a memory budget.
+
+    Parameter changes cost next to nothing; source snapshots are counted
+    against `budget` bytes once encoded, and the oldest steps are forgotten
+    first when the stacks grow past it.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        # Merge key of the last step pushed
+        self.__merge = None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(command.nbytes for command in (*self.undo_stack, *self.redo_stack))
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def push(self, command: Command, merge=None) -> None:
+        """
+        Record an edit that was just applied. A parameter change pushed with
+        the same merge key and label as the step before it, such as the
+        next value of one slider drag, extends that step instead of adding
+        one.
+        """
+        self.redo_stack.clear()
+
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if merge is not None and merge == self.__merge and isinstance(command, ParamCommand) \
+                and isinstance(last, ParamCommand) and last.label == command.label:
+            last.after = command.after
+            return
+
+        self.__merge = merge
+        self.undo_stack.append(command)
+        self.trim()
+
+    def pending(self, source: np.ndarray = None) -> list[Snapshot]:
+        """
+        Snapshots of the steps that still wait to be encoded. Given the live
+        `source`, views that no longer share its memory are among them, as
+        they alone now hold the array they view.
+        """
+        snapshots = [snapshot for command in (*self.undo_stack, *self.redo_stack) for snapshot in command.snapshots]
+        if source is not None:
+            for snapshot in snapshots:
+                snapshot.release(source)
+        return [snapshot for snapshot in snapshots if snapshot.pending]
+
+    def undo(self, pipeline) -> bool:
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        command.undo(pipeline)
+        self.redo_stack.append(command)
+        self.__merge = None
+        self.trim()
+        return True
+
+    def redo(self, pipeline) -> bool:
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        command.redo(pipeline)
+        self.undo_stack.append(command)
+        self.__merge = None
+        self.trim()
+        return True
+
+    def clear(self) -> None:
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.__merge = None
+
+    def trim(self) -> None:
+        """Forget the oldest steps until the encoded snapshots fit the budget."""
+        nbytes = self.nbytes
+        while nbytes > self.budget and (self.undo_stack or self.redo_stack):
+            # Oldest undo steps go first, then the redo steps furthest from the present
+            stack = self.undo_stack if self.undo_stack else self.redo_stack
+            nbytes -= stack.popleft().nbytes
+
+
+def encode(snapshots: list[Snapshot]) -> None:
+    """Compress pending snapshots; run on the worker, off the GUI thread."""
+    for snapshot in snapshots:
+        snapshot.encode()
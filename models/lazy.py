@@ -0,0 +1,26 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Heavy extension modules such as OpenCV then load with the first pixel
+    operation instead of at startup. After the import the module's names
+    are copied onto the stand-in, so later lookups cost no more than on
+    the module itself.
+    """
+
+    def __init__(self, name: str):
+        self.__name = name
+
+    def __getattr__(self, attribute: str):
+        module = importlib.import_module(self.__name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return f"LazyModule({self.__name!r})"
+
+
+cv2 = LazyModule('cv2')
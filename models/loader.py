@@ -0,0 +1,200 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from models.lazy import cv2
+
+TIFF_TYPES = {1: 'B', 2: 's', 3: 'H', 4: 'I', 5: 'II', 6: 'b', 8: 'h', 9: 'i', 10: 'ii', 11: 'f', 12: 'd'}
+TIFF_SAMPLE_FORMATS = {1: 'u', 2: 'i', 3: 'f'}
+
+IMAGE_WIDTH, IMAGE_LENGTH, BITS_PER_SAMPLE, COMPRESSION = 256, 257, 258, 259
+PHOTOMETRIC, STRIP_OFFSETS, SAMPLES_PER_PIXEL, STRIP_BYTE_COUNTS = 262, 273, 277, 279
+PLANAR_CONFIGURATION, TILE_WIDTH, SAMPLE_FORMAT = 284, 322, 339
+
+
+def open_array(path: str) -> np.ndarray:
+    """
+    Open an image as an array without reading more than necessary.
+
+    NPY files, uncompressed strip TIFFs and RAW files with a JSON sidecar
+    (`frame.raw.json` holding shape, dtype and optional offset) are memory
+    mapped, so pixels are paged in only when a region is touched. Anything
+    else is decoded by OpenCV. Colour data is returned in BGR(A) order, and
+    float data outside 0..1 is rescaled into it.
+    """
+    return normalise_float(read_array(path))
+
+
+def read_array(path: str) -> np.ndarray:
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r')
+    if extension == '.raw':
+        with open(path + '.json') as sidecar:
+            layout = json.load(sidecar)
+        return np.memmap(path, dtype=layout['dtype'], mode='r',
+                         offset=layout.get('offset', 0), shape=tuple(layout['shape']))
+    if extension in ('.tif', '.tiff'):
+        mapped = tiff_memmap(path)
+        if mapped is not None:
+            return mapped
+
+    image_array = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image_array is None:
+        raise ValueError(f"Cannot read image {path}")
+    return image_array
+
+
+def read_tiff_tags(path: str) -> tuple[str, dict]:
+    """Byte order and tags of the first IFD of a classic TIFF file."""
+    with open(path, 'rb') as tiff:
+        header = tiff.read(8)
+        if header[:4] not in (b'II*\0', b'MM\0*'):
+            raise ValueError(f"{path} is not a classic TIFF file")
+        order = '<' if header[:2] == b'II' else '>'
+
+        tiff.seek(struct.unpack(order + 'I', header[4:])[0])
+        count = struct.unpack(order + 'H', tiff.read(2))[0]
+        entries = [struct.unpack(order + 'HHI4s', tiff.read(12)) for _ in range(count)]
+
+        tags = {}
+        for tag, value_type, value_count, value in entries:
+            if value_type not in TIFF_TYPES:
+                continue
+            item = TIFF_TYPES[value_type]
+            size = struct.calcsize(order + item) * value_count
+            if size > 4:
+                tiff.seek(struct.unpack(order + 'I', value)[0])
+                value = tiff.read(size)
+            values = struct.unpack(order + item * value_count, value[:size])
+            if value_type in (5, 10):
+                values = tuple(zip(values[::2], values[1::2]))
+            tags[tag] = values
+
+    return order, tags
+
+
+def tiff_memmap(path: str):
+    """Memory map an uncompressed, chunky, contiguous-strip TIFF, or return None if it is not one."""
+    try:
+        order, tags = read_tiff_tags(path)
+    except (ValueError, struct.error):
+        return None
+
+    if tags.get(COMPRESSION, (1,))[0] != 1 or TILE_WIDTH in tags or tags.get(PLANAR_CONFIGURATION, (1,))[0] != 1:
+        return None
+
+    bits = set(tags.get(BITS_PER_SAMPLE, (1,)))
+    offsets, counts = tags.get(STRIP_OFFSETS), tags.get(STRIP_BYTE_COUNTS)
+    if len(bits) != 1 or bits.pop() not in (8, 16, 32, 64) or not offsets or not counts:
+        return None
+    if any(offset + count != following for offset, count, following in zip(offsets, counts, offsets[1:])):
+        return None
+
+    width, height = tags[IMAGE_WIDTH][0], tags[IMAGE_LENGTH][0]
+    samples = tags.get(SAMPLES_PER_PIXEL, (1,))[0]
+    kind = TIFF_SAMPLE_FORMATS.get(tags.get(SAMPLE_FORMAT, (1,))[0])
+    if kind is None:
+        return None
+
+    dtype = np.dtype(f"{order}{kind}{tags[BITS_PER_SAMPLE][0] // 8}")
+    shape = (height, width, samples) if samples > 1 else (height, width)
+    mapped = np.memmap(path, dtype=dtype, mode='r', offset=offsets[0], shape=shape)
+
+    # RGB on disk, BGR everywhere else; reversing is a strided view, not a copy. Alpha is dropped.
+    if samples in (3, 4) and tags.get(PHOTOMETRIC, (2,))[0] == 2:
+        mapped = mapped[..., 2::-1]
+    return mapped
+
+
+def to_bgra(image_array: np.ndarray) -> np.ndarray:
+    """Convert gray, BGR or BGRA data of any depth to 8-bit BGRA for display and editing."""
+    if image_array.dtype == np.uint16:
+        image_array = (image_array >> 8).astype(np.uint8)
+    elif image_array.dtype != np.uint8:
+        scaled = np.clip(image_array * 255.0 if np.issubdtype(image_array.dtype, np.floating) else image_array, 0, 255)
+        image_array = scaled.astype(np.uint8)
+
+    channels = image_array.shape[2] if image_array.ndim == 3 else 1
+    if channels == 4:
+        return np.ascontiguousarray(image_array)
+    if channels == 3:
+        return cv2.cvtColor(np.ascontiguousarray(image_array), cv2.COLOR_BGR2BGRA)
+    return cv2.cvtColor(np.ascontiguousarray(image_array.reshape(image_array.shape[:2])), cv2.COLOR_GRAY2BGRA)
+
+
+def normalise_float(image_array: np.ndarray) -> np.ndarray:
+    """
+    Float data rescaled into 0..1, the range the working depth assumes.
+    Data already inside it is returned as is, memory maps included;
+    otherwise the colour values are stretched from their own range,
+    widened to include 0..1, and alpha is kept.
+    """
+    if image_array.dtype.kind != 'f' or not image_array.size:
+        return image_array
+
+    four_channels = image_array.ndim == 3 and image_array.shape[2] == 4
+    colour = image_array[..., :3] if four_channels else image_array
+    low, high = float(np.nanmin(colour)), float(np.nanmax(colour))
+    if not np.isfinite(low) or not np.isfinite(high):
+        finite = colour[np.isfinite(colour)]
+        low, high = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 1.0)
+    low, high = min(low, 0.0), max(high, 1.0)
+    if (low, high) == (0.0, 1.0):
+        return image_array
+
+    scaled = image_array.astype(np.float32)
+    target = scaled[..., :3] if four_channels else scaled
+    target -= low
+    target *= 1 / (high - low)
+    return scaled
+
+
+def is_bgra(image_array: np.ndarray) -> bool:
+    return image_array.dtype == np.uint8 and image_array.ndim == 3 and image_array.shape[2] == 4
+
+
+# Depths the adjustment pipeline works in, with the value that means full intensity
+WORKING_DEPTHS = {np.dtype(np.uint8): 255, np.dtype(np.uint16): 65535, np.dtype(np.float32): 1.0}
+
+
+def full_scale(dtype: np.dtype):
+    return WORKING_DEPTHS[np.dtype(dtype)]
+
+
+def to_working(image_array: np.ndarray) -> np.ndarray:
+    """
+    Convert gray, BGR or BGRA data to BGRA at a depth that keeps its range:
+    8-bit stays 8-bit, other unsigned integers up to 16 bits become 16-bit,
+    other integers become float32 scaled to 0..1, and float data becomes
+    float32 as it is, so it should already be in 0..1 (see normalise_float).
+    """
+    dtype = image_array.dtype
+    if dtype == np.uint8:
+        return to_bgra(image_array)
+
+    if dtype.kind == 'u' and dtype.itemsize == 2:
+        image_array = image_array.astype(np.uint16)
+    elif dtype.kind == 'f':
+        image_array = image_array.astype(np.float32)
+    else:
+        scale = np.iinfo(dtype).max if dtype.kind in 'ui' else 1
+        image_array = (image_array / scale).astype(np.float32)
+
+    alpha = full_scale(image_array.dtype)
+    channels = image_array.shape[2] if image_array.ndim == 3 else 1
+    if channels == 4:
+        return np.ascontiguousarray(image_array)
+
+    bgra = np.empty(image_array.shape[:2] + (4,), image_array.dtype)
+    bgra[..., :3] = image_array if channels == 3 else image_array.reshape(image_array.shape[:2] + (1,))
+    bgra[..., 3] = alpha
+    return bgra
+
+
+def is_working(image_array: np.ndarray) -> bool:
+    """Whether an array is BGRA at one of the working depths."""
+    return image_array.dtype in WORKING_DEPTHS and image_array.ndim == 3 and image_array.shape[2] == 4
@@ -0,0 +1,124 @@
+import numpy as np
+
+from models.lazy import cv2
+from models.pyramid import Pyramid
+
+
+class Overlay:
+    """
+    Outlines of measured particles rasterized into transparent tiles that
+    line up with the tiles of an image pyramid.
+
+    Each tile traces the contours of the particle mask at its level with
+    one OpenCV call and draws them with another, however many particles it
+    holds. The tile reads a one pixel margin from its neighbours, so a
+    particle cut by a seam is not closed along it. Coarser levels use a
+    max-pooled mask, so small particles shrink to dots instead of
+    vanishing. Tiles come out as premultiplied BGRA, and tiles without
+    particles as None.
+    """
+
+    def __init__(self, pyramid: Pyramid, color: tuple = (0, 255, 0), alpha: int = 255):
+        self.pyramid = pyramid
+        self.tile_size = pyramid.tile_size
+        self.scale = pyramid.scale
+        self.depth = pyramid.depth
+        self.color = tuple(int(value * alpha / 255) for value in color) + (alpha,)
+        self.rows = np.zeros((0, 5), np.int64)
+        self.masks = []
+
+    def level(self, index: int) -> np.ndarray:
+        return self.pyramid.level(index)
+
+    def level_for(self, zoom: float) -> int:
+        return self.pyramid.level_for(zoom)
+
+    def ready(self, index: int) -> int:
+        return self.pyramid.ready(index)
+
+    def tile_range(self, index: int, left: float, top: float, right: float, bottom: float) -> tuple[range, range]:
+        return self.pyramid.tile_range(index, left, top, right, bottom)
+
+    def set_particles(self, masks: list, rows: np.ndarray) -> list[tuple[int, int, int, int]]:
+        """
+        Replace the particles: `masks` from mask_levels(), and one
+        (left, top, width, height, area) row per particle, in level 0
+        pixels. Returns the boxes of the particles that were added or
+        removed, which are the only regions whose tiles need to be drawn
+        again.
+        """
+        rows = np.asarray(rows, np.int64).reshape(-1, 5)
+        changed = np.concatenate((self.rows[~contains(rows, self.rows)], rows[~contains(self.rows, rows)]))
+        self.rows = rows
+        self.masks = list(masks)
+        return [tuple(box) for box in changed[:, :4].tolist()]
+
+    def tile(self, index: int, row: int, col: int):
+        """Premultiplied BGRA tile of outlines, or None if no particle touches it."""
+        if index >= len(self.masks):
+            return None
+
+        height, width = self.pyramid.tile(index, row, col).shape[:2]
+        top, left = row * self.tile_size, col * self.tile_size
+        window_top, window_left = max(top - 1, 0), max(left - 1, 0)
+        window = self.masks[index][window_top:top + height + 1, window_left:left + width + 1]
+        if not window.any():
+            return None
+
+        # Contours through the margin land outside the tile and are clipped away when drawn
+        contours, _ = cv2.findContours(np.ascontiguousarray(window), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE,
+                                       offset=(window_left - left, window_top - top))
+        tile = np.zeros((height, width, 4), np.uint8)
+        cv2.drawContours(tile, contours, -1, self.color, 1, cv2.LINE_8)
+        return tile
+
+
+def mask_levels(mask: np.ndarray, depth: int) -> list[np.ndarray]:
+    """
+    A 0/1 particle mask at every level of a pyramid of this depth, each
+    level the maximum of 2 x 2 pixels of the one before.
+    """
+    levels = [np.ascontiguousarray(mask, np.uint8)]
+    while len(levels) < depth:
+        previous = levels[-1]
+        height, width = -(-previous.shape[0] // 2), -(-previous.shape[1] // 2)
+        padded = np.zeros((height * 2, width * 2), np.uint8)
+        padded[:previous.shape[0], :previous.shape[1]] = previous
+        levels.append(np.maximum(np.maximum(padded[::2, ::2], padded[1::2, ::2]),
+                                 np.maximum(padded[::2, 1::2], padded[1::2, 1::2])))
+    return levels
+
+
+def contains(rows: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Whether each candidate (left, top, width, height, area) row appears
+    among rows. Particles are told apart by their box; the area catches a
+    particle that changed shape within the same box.
+    """
+    if not len(rows) or not len(candidates):
+        return np.zeros(len(candidates), bool)
+    keys, candidate_keys = box_keys(rows, candidates)
+    order = np.argsort(keys, kind='stable')
+    position = np.minimum(np.searchsorted(keys[order], candidate_keys), len(keys) - 1)
+    match = order[position]
+    return (keys[match] == candidate_keys) & (rows[match, 4] == candidates[:, 4])
+
+
+def box_keys(rows: np.ndarray, candidates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Sortable keys of the boxes of two sets of rows."""
+    boxes, candidate_boxes = rows[:, :4], candidates[:, :4]
+    if max(boxes.max(), candidate_boxes.max()) < 2 ** 16 and min(boxes.min(), candidate_boxes.min()) >= 0:
+        # Four 16-bit fields packed into one integer compare far faster than rows as raw bytes
+        return pack(boxes), pack(candidate_boxes)
+    row = np.dtype((np.void, boxes.dtype.itemsize * 4))
+    return (np.ascontiguousarray(boxes).view(row).ravel(),
+            np.ascontiguousarray(candidate_boxes.astype(boxes.dtype)).view(row).ravel())
+
+
+def pack(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, 0] << 48) | (boxes[:, 1] << 32) | (boxes[:, 2] << 16) | boxes[:, 3]
+
+
+def particle_rows(table) -> np.ndarray:
+    """(left, top, width, height, area) of every particle of a ParticleTable."""
+    return np.stack([table[name] for name in ('left', 'top', 'width', 'height', 'area')], axis=1).astype(np.int64)
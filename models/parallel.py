@@ -0,0 +1,77 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Rows per strip are chosen so one strip of input and output fits in a per-core L2 cache
+STRIP_BYTES = 512 * 1024
+# Frames smaller than this run in one call; splitting them costs more than it saves
+MIN_PIXELS = 512 * 512
+
+
+def strips(shape: tuple, row_bytes: int, count: int, strip_bytes: int = STRIP_BYTES) -> list[slice]:
+    """Row ranges splitting an array into cache-sized strips, at least `count` of them when there are enough rows."""
+    rows = shape[0]
+    height = max(min(strip_bytes // max(row_bytes, 1), -(-rows // count)), 1)
+    return [slice(top, min(top + height, rows)) for top in range(0, rows, height)]
+
+
+class StripScheduler:
+    """
+    Runs per-pixel kernels over horizontal strips of an array on a thread
+    pool. OpenCV and NumPy release the GIL, so strips run on every core.
+
+    A kernel must compute each output pixel from the same input pixel
+    only, as the levels, colour and hue stages do; then the strips
+    reassemble exactly what one call over the whole frame returns. Each
+    strip is written into one preallocated output array. map() may be
+    called from several threads at once; they share one pool.
+    """
+
+    def __init__(self, threads: int = None, strip_bytes: int = STRIP_BYTES, min_pixels: int = MIN_PIXELS):
+        self.threads = threads or os.cpu_count() or 1
+        self.strip_bytes = strip_bytes
+        self.min_pixels = min_pixels
+        self.__pool = None
+        self.__lock = threading.Lock()
+
+    def set_threads(self, threads: int = None) -> None:
+        threads = threads or os.cpu_count() or 1
+        if threads != self.threads:
+            self.shutdown()
+            self.threads = threads
+
+    def shutdown(self) -> None:
+        with self.__lock:
+            pool, self.__pool = self.__pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def map(self, kernel, image_array: np.ndarray, **params) -> np.ndarray:
+        """kernel(image_array, **params), computed strip by strip in parallel."""
+        if self.threads == 1 or image_array.shape[0] * image_array.shape[1] < self.min_pixels:
+            return kernel(image_array, **params)
+
+        # A one-pixel call gives the output type and channels without guessing them per kernel
+        probe = kernel(image_array[:1, :1], **params)
+        output = np.empty(image_array.shape[:2] + probe.shape[2:], probe.dtype)
+        row_bytes = image_array.shape[1] * (image_array.itemsize * int(np.prod(image_array.shape[2:]))
+                                            + output.itemsize * int(np.prod(output.shape[2:])))
+
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = ThreadPoolExecutor(self.threads, thread_name_prefix='strip')
+            pool = self.__pool
+        futures = [pool.submit(self.__run, kernel, image_array, output, rows, params)
+                   for rows in strips(image_array.shape, row_bytes, self.threads, self.strip_bytes)]
+        for future in futures:
+            future.result()
+        return output
+
+    @staticmethod
+    def __run(kernel, image_array: np.ndarray, output: np.ndarray, rows: slice, params: dict) -> None:
+        output[rows] = kernel(image_array[rows], **params)
+
+
+scheduler = StripScheduler()
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+
+from models.lazy import cv2
+
+
+class ParticleTable:
+    """
+    Per-particle measurements stored column by column.
+
+    Each column is a NumPy array with one entry per particle, so statistics
+    and filters over thousands of particles stay vectorized.
+    """
+    COLUMNS = ('label', 'area', 'perimeter', 'equivalent_diameter',
+               'centroid_x', 'centroid_y', 'left', 'top', 'width', 'height')
+
+    def __init__(self, **columns: np.ndarray):
+        self.columns = {name: columns[name] for name in self.COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns['label'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def select(self, mask: np.ndarray) -> "ParticleTable":
+        """Rows where mask is true."""
+        return ParticleTable(**{name: column[mask] for name, column in self.columns.items()})
+
+    def to_records(self) -> np.ndarray:
+        """The table as one structured array, which can be saved and memory-mapped as a single .npy."""
+        records = np.empty(len(self), [(name, self.columns[name].dtype) for name in self.COLUMNS])
+        for name in self.COLUMNS:
+            records[name] = self.columns[name]
+        return records
+
+    @classmethod
+    def from_records(cls, records: np.ndarray) -> "ParticleTable":
+        return cls(**{name: records[name] for name in cls.COLUMNS})
+
+
+def to_gray(image_array: np.ndarray) -> np.ndarray:
+    """Single-channel view or conversion of a gray, BGR or BGRA array, keeping its depth."""
+    if image_array.ndim == 2:
+        return image_array
+    if image_array.shape[2] == 1:
+        return image_array[..., 0]
+    code = cv2.COLOR_BGRA2GRAY if image_array.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(np.ascontiguousarray(image_array), code)
+
+
+def otsu_threshold(gray: np.ndarray) -> float:
+    """Otsu's threshold of an image of any depth, computed on a 256-bin histogram."""
+    if gray.dtype == np.uint8:
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[0]
+
+    low, high = float(gray.min()), float(gray.max())
+    if low == high:
+        return low
+    histogram, edges = np.histogram(gray, bins=256, range=(low, high))
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * centers)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    return float(centers[np.nanargmax(between[:-1])])
+
+
+def perimeters(labels: np.ndarray, count: int) -> np.ndarray:
+    """
+    Perimeter of every label: the number of pixel edges on its boundary,
+    scaled by pi/4 so that edges at random orientations are not overestimated.
+    """
+    edges = np.zeros(count, dtype=np.int64)
+
+    for first, second in ((labels[:, :-1], labels[:, 1:]), (labels[:-1, :], labels[1:, :])):
+        boundary = first != second
+        edges += np.bincount(first[boundary], minlength=count)
+        edges += np.bincount(second[boundary], minlength=count)
+
+    for border in (labels[0, :], labels[-1, :], labels[:, 0], labels[:, -1]):
+        edges += np.bincount(border, minlength=count)
+
+    return edges * (math.pi / 4)
+
+
+def measure_particles(image_array: np.ndarray, threshold: float = None, dark: bool = False,
+                      min_area: int = 1, connectivity: int = 8) -> ParticleTable:
+    """
+    Threshold an image (Otsu's method by default), label connected particles
+    and measure them. Bright particles on a dark background are assumed
+    unless `dark` is set.
+    """
+    return segment_particles(image_array, threshold, dark, min_area, connectivity, with_mask=False)[0]
+
+
+def segment_particles(image_array: np.ndarray, threshold: float = None, dark: bool = False, min_area: int = 1,
+                      connectivity: int = 8, with_mask: bool = True) -> tuple[ParticleTable, np.ndarray]:
+    """Measure particles as measure_particles does, along with a 0/1 mask of the pixels of those kept."""
+    gray = to_gray(image_array)
+    if threshold is None:
+        threshold = otsu_threshold(gray)
+
+    mask = (gray <= threshold) if dark else (gray > threshold)
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        mask.view(np.uint8), connectivity=connectivity, ltype=cv2.CV_32S
+    )
+
+    area = stats[:, cv2.CC_STAT_AREA]
+    perimeter = perimeters(labels, count)
+
+    keep = area >= min_area
+    keep[0] = False  # background
+
+    table = ParticleTable(
+        label=np.flatnonzero(keep).astype(np.int32),
+        area=area[keep],
+        perimeter=perimeter[keep],
+        equivalent_diameter=np.sqrt(4 * area[keep] / math.pi),
+        centroid_x=centroids[keep, 0],
+        centroid_y=centroids[keep, 1],
+        left=stats[keep, cv2.CC_STAT_LEFT],
+        top=stats[keep, cv2.CC_STAT_TOP],
+        width=stats[keep, cv2.CC_STAT_WIDTH],
+        height=stats[keep, cv2.CC_STAT_HEIGHT],
+    )
+    return table, (keep.view(np.uint8)[labels] if with_mask else None)
@@ -0,0 +1,180 @@
+import numpy as np
+
+from models import color
+from models.geometry import Dihedral
+from models.lazy import cv2
+from models.loader import full_scale, is_working, to_working
+from models.parallel import StripScheduler, scheduler as default_scheduler
+
+GRAYSCALE_KERNEL = np.array([
+    [0.114, 0.587, 0.299, 0.0],
+    [0.114, 0.587, 0.299, 0.0],
+    [0.114, 0.587, 0.299, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+], dtype=np.float32)
+
+
+def levels(image_array: np.ndarray, brightness: int, contrast: int) -> np.ndarray:
+    """
+    Apply brightness and contrast, leaving alpha untouched. Brightness is in
+    8-bit steps at every depth. 8-bit data goes through one lookup table
+    pass, deeper data through one saturating affine transform.
+    """
+    gain = 1 + contrast / 100
+    if image_array.dtype == np.uint8:
+        lut = np.clip(np.arange(256) * gain + brightness, 0, 255).round().astype(np.uint8)
+        return cv2.LUT(image_array, np.dstack((lut, lut, lut, np.arange(256, dtype=np.uint8))))
+
+    offset = brightness / 255 * full_scale(image_array.dtype)
+    matrix = np.array([
+        [gain, 0, 0, 0, offset],
+        [0, gain, 0, 0, offset],
+        [0, 0, gain, 0, offset],
+        [0, 0, 0, 1, 0],
+    ], dtype=np.float32)
+    return saturate(cv2.transform(image_array, matrix))
+
+
+def saturate(image_array: np.ndarray) -> np.ndarray:
+    """Clip float data to 0..1 in place; OpenCV already saturates integer results."""
+    if image_array.dtype == np.float32:
+        np.clip(image_array, 0, 1, out=image_array)
+    return image_array
+
+
+def grayscale(image_array: np.ndarray, enabled: bool) -> np.ndarray:
+    return cv2.transform(image_array, GRAYSCALE_KERNEL)
+
+
+def sepia(image_array: np.ndarray, enabled: bool) -> np.ndarray:
+    return saturate(color.sepia(image_array))
+
+
+def geometry(image_array: np.ndarray, orientation: Dihedral) -> np.ndarray:
+    """Rotations and flips composed into one orientation, applied as a view."""
+    return orientation.view(image_array)
+
+
+class Stage:
+    """
+    One step of the adjustment stack: a function and its neutral parameters.
+    Pointwise stages compute every pixel from that pixel alone, so they can
+    run strip by strip in parallel.
+    """
+
+    def __init__(self, name: str, function, pointwise: bool = False, **defaults):
+        self.name = name
+        self.function = function
+        self.pointwise = pointwise
+        self.defaults = defaults
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class AdjustmentPipeline:
+    """
+    Ordered, non-destructive stack of adjustments over a source array.
+
+    Parameters live apart from pixels: every render starts from the source,
+    so changing one stage never drops another stage's effect. Each stage
+    caches its output keyed by its parameters, and a render recomputes only
+    from the first stage whose parameters changed. Stages at their defaults
+    pass their input through without copying, so a memory-mapped source
+    is decoded to BGRA only once a stage actually needs its pixels. 16-bit
+    and float data keep their depth; tone mapping to 8 bits is left to the
+    display. Pointwise stages are split into strips across `scheduler`'s
+    threads.
+    """
+
+    def __init__(self, source: np.ndarray, scheduler: StripScheduler = None):
+        self.stages = [
+            Stage('levels', levels, pointwise=True, brightness=0, contrast=0),
+            Stage('clahe', color.equalize, clip_limit=0.0, tile_grid=8),
+            Stage('grayscale', grayscale, pointwise=True, enabled=False),
+            Stage('sepia', sepia, pointwise=True, enabled=False),
+            Stage('hue', color.shift_hue, pointwise=True, hue=0, saturation=0),
+            Stage('geometry', geometry, orientation=Dihedral()),
+        ]
+        self.scheduler = scheduler or default_scheduler
+        self.params = {stage.name: stage.defaults for stage in self.stages}
+        self.set_source(source)
+
+    @property
+    def source(self) -> np.ndarray:
+        return self.__state[0]
+
+    def set_source(self, source: np.ndarray, placement: np.ndarray = None) -> None:
+        """
+        Replace the source array, dropping every cached stage and proxy.
+        `placement` is the affine matrix taking (x, y) of the source to
+        pixels of the image it was cropped or resized from.
+        """
+        # One assignment so a render running on another thread sees either state, never a mix
+        self.__state = (source, {}, {})
+        self.placement = np.eye(3) if placement is None else placement
+
+    def proxy(self, width: int, height: int, build: bool = True):
+        """
+        Pipeline over the source downscaled to fit width x height.
+        The proxy is built once per source and size; render it with this
+        pipeline's params to preview them cheaply. Without `build`, returns
+        None rather than building a proxy that is not cached yet.
+        """
+        source, _, proxies = self.__state
+        scale = min(1.0, width / max(source.shape[1], 1), height / max(source.shape[0], 1))
+        size = (max(round(source.shape[1] * scale), 1), max(round(source.shape[0] * scale), 1))
+
+        if size not in proxies:
+            if not build:
+                return None
+            if size != (source.shape[1], source.shape[0]):
+                source = cv2.resize(np.ascontiguousarray(source), size, interpolation=cv2.INTER_AREA)
+            proxies[size] = AdjustmentPipeline(source, self.scheduler)
+        return proxies[size]
+
+    def get(self, name: str) -> dict:
+        return self.params[name]
+
+    def set(self, name: str, **params) -> None:
+        """Update the parameters of one stage."""
+        self.params = {**self.params, name: {**self.params[name], **params}}
+
+    def reset(self) -> None:
+        """Return every stage to its neutral parameters."""
+        self.params = {stage.name: stage.defaults for stage in self.stages}
+
+    def render(self, params: dict = None) -> np.ndarray:
+        """Run the stack, reusing cached stage outputs that are still valid."""
+        if params is None:
+            params = self.params
+        image_array, cache, _ = self.__state
+
+        valid = True
+        for stage in self.stages:
+            stage_params = params[stage.name]
+            key = tuple(sorted(stage_params.items()))
+
+            cached = cache.get(stage.name)
+            if valid and cached is not None and cached[0] == key:
+                image_array = cached[1]
+                continue
+
+            valid = False
+            if stage_params != stage.defaults:
+                if not is_working(image_array):
+                    image_array = self.__decoded(image_array, cache)
+                if stage.pointwise:
+                    image_array = self.scheduler.map(stage.function, image_array, **stage_params)
+                else:
+                    image_array = stage.function(image_array, **stage_params)
+            cache[stage.name] = (key, image_array)
+
+        return image_array
+
+    @staticmethod
+    def __decoded(image_array: np.ndarray, cache: dict) -> np.ndarray:
+        # Only the untouched source can reach a stage in another layout
+        if 'decoded' not in cache:
+            cache['decoded'] = to_working(image_array)
+        return cache['decoded']
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+from models.lazy import cv2
+
+
+class Pyramid:
+    """
+    Multi-resolution pyramid over an image array, cut into square tiles.
+
+    Level 0 is the array itself; every next level halves both sides and is
+    built when first requested, or all at once by build() on a worker
+    thread while the display paints from ready() levels. `scale` is the size of level 0 relative
+    to the full-resolution image, below 1 when the array is a preview proxy.
+    Memory-mapped bases are decimated with strided views instead, so a level
+    reads from disk only the pixels of the tiles that are painted.
+    """
+
+    def __init__(self, base: np.ndarray, tile_size: int = 256, scale: float = 1.0):
+        self.tile_size = tile_size
+        self.scale = scale
+        self.levels = [base]
+        self.decimate = isinstance(base, np.memmap)
+
+        longest = max(base.shape[:2])
+        self.depth = max(math.ceil(math.log2(longest / tile_size)), 0) + 1 if longest else 1
+
+    def level(self, index: int) -> np.ndarray:
+        while len(self.levels) <= index:
+            previous = self.levels[-1]
+            if self.decimate:
+                self.levels.append(previous[::2, ::2])
+                continue
+            size = (max(previous.shape[1] // 2, 1), max(previous.shape[0] // 2, 1))
+            self.levels.append(cv2.resize(previous, size, interpolation=cv2.INTER_AREA))
+        return self.levels[index]
+
+    def build(self) -> "Pyramid":
+        """Build every level; run off the GUI thread, which only paints levels that are ready."""
+        self.level(self.depth - 1)
+        return self
+
+    def ready(self, index: int) -> int:
+        """The level to paint in place of `index`: the coarsest built level no coarser than it."""
+        # Decimated levels are views, so they cost nothing to build on demand
+        return index if self.decimate else min(index, len(self.levels) - 1)
+
+    def level_for(self, zoom: float) -> int:
+        """Coarsest level that still has at least one pixel per screen pixel at this zoom."""
+        zoom = zoom / self.scale
+        if zoom >= 1:
+            return 0
+        return min(int(math.floor(math.log2(1 / zoom))), self.depth - 1)
+
+    def tile_range(self, index: int, left: float, top: float, right: float, bottom: float) -> tuple[range, range]:
+        """Rows and columns of the tiles of a level that intersect a rectangle in level pixels."""
+        height, width = self.level(index).shape[:2]
+        size = self.tile_size
+
+        rows = range(max(int(top // size), 0), min(math.ceil(bottom / size), math.ceil(height / size)))
+        cols = range(max(int(left // size), 0), min(math.ceil(right / size), math.ceil(width / size)))
+        return rows, cols
+
+    def tile(self, index: int, row: int, col: int) -> np.ndarray:
+        """View of one tile; edge tiles are smaller than tile_size."""
+        size = self.tile_size
+        return self.level(index)[row * size:(row + 1) * size, col * size:(col + 1) * size]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from models.lazy import cv2
+
+
+def crop(image_array: np.ndarray, rect: tuple[int, int, int, int]) -> np.ndarray:
+    """View of the (x, y, width, height) part of an array, clipped to its bounds; no pixels are copied."""
+    x, y, width, height = rect
+    return image_array[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)]
+
+
+def target_size(shape: tuple, size: tuple[int, int] = None, scale: float = None) -> tuple[int, int]:
+    """(width, height) to resize an array of this shape to, given a size or a scale factor."""
+    if size is not None:
+        return max(int(size[0]), 1), max(int(size[1]), 1)
+    return max(round(shape[1] * scale), 1), max(round(shape[0] * scale), 1)
+
+
+def interpolation_for(shape: tuple, size: tuple[int, int]) -> int:
+    """Area averaging to shrink, which avoids aliasing; bicubic when either side grows."""
+    if size[0] <= shape[1] and size[1] <= shape[0]:
+        return cv2.INTER_AREA
+    return cv2.INTER_CUBIC
+
+
+def resize(image_array: np.ndarray, size: tuple[int, int] = None, scale: float = None) -> np.ndarray:
+    """Resize to (width, height) or by a scale factor, with the interpolation suited to the direction."""
+    size = target_size(image_array.shape, size, scale)
+    if size == (image_array.shape[1], image_array.shape[0]):
+        return image_array
+    return cv2.resize(np.ascontiguousarray(image_array), size,
+                      interpolation=interpolation_for(image_array.shape, size))
@@ -0,0 +1,142 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from models.lazy import cv2
+from models.particles import ParticleTable, to_gray
+
+
+class RegionSummary(NamedTuple):
+    left: int
+    top: int
+    width: int
+    height: int
+    mean: float
+    std: float
+    minimum: float
+    maximum: float
+    histogram: np.ndarray
+    particles: int
+
+
+class RegionStatistics:
+    """
+    Statistics of any rectangle of an image, built once per image version.
+
+    Sum and squared-sum tables give mean and standard deviation in O(1).
+    A 256-bin integral histogram over blocks of `block` pixels covers the
+    blocks fully inside a rectangle in O(bins); only the thin strips along
+    its edges are binned directly. Minimum and maximum are read off the
+    histogram, so they are exact for 8-bit data and bin-accurate otherwise.
+    Images larger than `max_pixels` are analysed on a downscaled copy, and
+    rectangles are always given in full-resolution pixels.
+    """
+    BINS = 256
+
+    def __init__(self, image_array: np.ndarray, block: int = 16, max_pixels: int = 8_000_000):
+        gray = to_gray(image_array)
+        height, width = gray.shape
+        self.size = (width, height)
+
+        self.scale = min(1.0, (max_pixels / max(width * height, 1)) ** 0.5)
+        if self.scale < 1:
+            gray = cv2.resize(np.ascontiguousarray(gray), (max(int(width * self.scale), 1),
+                                                          max(int(height * self.scale), 1)),
+                              interpolation=cv2.INTER_AREA)
+        gray = np.ascontiguousarray(gray)
+
+        self.sum, self.sqsum = cv2.integral2(gray.astype(np.float64) if gray.dtype != np.uint8 else gray,
+                                             sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        if gray.dtype == np.uint8:
+            self.low, self.bin_width = 0.0, 1.0
+            self.binned = gray
+        else:
+            self.low = float(gray.min())
+            self.bin_width = max((float(gray.max()) - self.low) / self.BINS, np.finfo(np.float32).eps)
+            self.binned = np.minimum((gray - self.low) / self.bin_width, self.BINS - 1).astype(np.uint8)
+
+        self.block = block
+        self.block_histograms = self.__integral_histogram(self.binned, block)
+        self.particle_counts = None
+
+    def __integral_histogram(self, binned: np.ndarray, block: int) -> np.ndarray:
+        rows, cols = binned.shape[0] // block, binned.shape[1] // block
+        blocks = binned[:rows * block, :cols * block].reshape(rows, block, cols, block)
+
+        block_index = (np.arange(rows)[:, None, None, None] * cols + np.arange(cols)[None, None, :, None])
+        keys = (block_index * self.BINS + blocks).ravel()
+        counts = np.bincount(keys, minlength=rows * cols * self.BINS).reshape(rows, cols, self.BINS)
+
+        integral = np.zeros((rows + 1, cols + 1, self.BINS), np.int32)
+        np.cumsum(np.cumsum(counts, axis=0), axis=1, out=integral[1:, 1:])
+        return integral
+
+    def set_particles(self, table: ParticleTable) -> None:
+        """Count particles by centroid through a summed-area table of centroid positions."""
+        height, width = self.sum.shape[0] - 1, self.sum.shape[1] - 1
+        x = np.clip((table['centroid_x'] * self.scale).astype(np.int64), 0, width - 1)
+        y = np.clip((table['centroid_y'] * self.scale).astype(np.int64), 0, height - 1)
+        counts = np.bincount(y * width + x, minlength=width * height).reshape(height, width)
+
+        self.particle_counts = np.zeros((height + 1, width + 1), np.int32)
+        np.cumsum(np.cumsum(counts, axis=0), axis=1, out=self.particle_counts[1:, 1:])
+
+    def summary(self, left: int, top: int, width: int, height: int) -> RegionSummary:
+        """Statistics of a rectangle in full-resolution pixels, clipped to the image."""
+        x0, y0, x1, y1 = self.__clip(left, top, left + width, top + height)
+        count = (x1 - x0) * (y1 - y0)
+        if not count:
+            return RegionSummary(left, top, 0, 0, 0.0, 0.0, 0.0, 0.0, np.zeros(self.BINS, np.int64), 0)
+
+        total = self.__area_sum(self.sum, x0, y0, x1, y1)
+        squares = self.__area_sum(self.sqsum, x0, y0, x1, y1)
+        mean = total / count
+        std = max(squares / count - mean * mean, 0.0) ** 0.5
+
+        histogram = self.__histogram(x0, y0, x1, y1)
+        occupied = np.flatnonzero(histogram)
+
+        particles = 0
+        if self.particle_counts is not None:
+            particles = int(self.__area_sum(self.particle_counts, x0, y0, x1, y1))
+
+        inverse = 1 / self.scale
+        return RegionSummary(round(x0 * inverse), round(y0 * inverse),
+                             round((x1 - x0) * inverse), round((y1 - y0) * inverse),
+                             mean, std,
+                             self.low + occupied[0] * self.bin_width,
+                             self.low + occupied[-1] * self.bin_width,
+                             histogram, particles)
+
+    def __clip(self, x0: float, y0: float, x1: float, y1: float) -> tuple[int, int, int, int]:
+        height, width = self.binned.shape
+        x0, x1 = sorted((x0 * self.scale, x1 * self.scale))
+        y0, y1 = sorted((y0 * self.scale, y1 * self.scale))
+        return (int(min(max(x0, 0), width)), int(min(max(y0, 0), height)),
+                int(min(max(x1, 0), width)), int(min(max(y1, 0), height)))
+
+    @staticmethod
+    def __area_sum(table: np.ndarray, x0: int, y0: int, x1: int, y1: int):
+        return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+    def __histogram(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        block = self.block
+        bx0, by0 = -(-x0 // block), -(-y0 // block)
+        bx1 = min(x1 // block, self.block_histograms.shape[1] - 1)
+        by1 = min(y1 // block, self.block_histograms.shape[0] - 1)
+
+        if bx0 >= bx1 or by0 >= by1:
+            return self.__bincount(self.binned[y0:y1, x0:x1])
+
+        histogram = self.__area_sum(self.block_histograms, bx0, by0, bx1, by1).astype(np.int64)
+
+        # Edge strips around the block-aligned interior [bx0*block, bx1*block) x [by0*block, by1*block)
+        ix0, iy0, ix1, iy1 = bx0 * block, by0 * block, bx1 * block, by1 * block
+        for strip in (self.binned[y0:iy0, x0:x1], self.binned[iy1:y1, x0:x1],
+                      self.binned[iy0:iy1, x0:ix0], self.binned[iy0:iy1, ix1:x1]):
+            histogram += self.__bincount(strip)
+        return histogram
+
+    def __bincount(self, binned: np.ndarray) -> np.ndarray:
+        return np.bincount(binned.ravel(), minlength=self.BINS)
@@ -0,0 +1,168 @@
+import os
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from models import loader
+from models.calibration import Calibration, read_calibration
+from models.diskcache import DiskCache
+from models.pyramid import Pyramid
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.npy', '.raw')
+
+
+def natural_key(path: str) -> list:
+    """Sort key under which frame_2 comes before frame_10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', os.path.basename(path))]
+
+
+def list_images(folder: str) -> list[str]:
+    """Image files of a folder in natural order."""
+    return sorted((os.path.join(folder, name) for name in os.listdir(folder)
+                   if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS), key=natural_key)
+
+
+class Frame(NamedTuple):
+    path: str
+    source: np.ndarray
+    # Display pyramid over the source, which is also the render of an unedited frame
+    pyramid: Pyramid
+    # Pixel size recorded in the file, if any
+    calibration: Calibration = None
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes held by the frame; memory-mapped levels stay on disk and cost nothing."""
+        return sum(level.nbytes for level in self.pyramid.levels if not isinstance(level, np.memmap))
+
+
+def decode_frame(path: str, tile_size: int = 256, cache: DiskCache = None) -> Frame:
+    """
+    Open an image and build every level of its display pyramid, ready to
+    paint at any zoom. With a disk cache, compressed files are decoded and
+    downsampled once; later opens map the stored levels instead.
+    """
+    # Memory-mapped files are as quick to open as a cache entry, so only decoded ones are stored
+    digest = cache.digest(path) if cache is not None and not maps_directly(path) else None
+    if digest is not None:
+        levels = cached_levels(cache, digest, tile_size)
+        if levels:
+            pyramid = Pyramid(levels[0], tile_size)
+            pyramid.levels = levels
+            return Frame(path, levels[0], pyramid, read_calibration(path))
+
+    source = loader.open_array(path)
+    pyramid = Pyramid(source, tile_size)
+    pyramid.level(pyramid.depth - 1)
+
+    if digest is not None:
+        for index, level in enumerate(pyramid.levels):
+            cache.put(cache.key(digest, 'pyramid', level=index, tile_size=tile_size), level)
+    return Frame(path, source, pyramid, read_calibration(path))
+
+
+def maps_directly(path: str) -> bool:
+    """Whether the loader memory-maps this file rather than decoding it."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.tif', '.tiff'):
+        return loader.tiff_memmap(path) is not None
+    return extension in ('.npy', '.raw')
+
+
+def cached_levels(cache: DiskCache, digest: str, tile_size: int) -> list:
+    """Every level of a stored pyramid, memory-mapped, or an empty list if any is missing."""
+    base = cache.get(cache.key(digest, 'pyramid', level=0, tile_size=tile_size))
+    if base is None:
+        return []
+    levels = [base]
+    for index in range(1, Pyramid(base, tile_size).depth):
+        level = cache.get(cache.key(digest, 'pyramid', level=index, tile_size=tile_size))
+        if level is None:
+            return []
+        levels.append(level)
+    return levels
+
+
+class FrameCache:
+    """
+    Decoded frames by path, least recently used first out.
+
+    The budget is in resident bytes rather than frames, so a folder of
+    memory-mapped stacks can keep many more frames than one of large PNGs.
+    A frame larger than the whole budget is not kept.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.nbytes = 0
+        self.__frames = OrderedDict()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.__frames
+
+    def __len__(self) -> int:
+        return len(self.__frames)
+
+    def get(self, path: str):
+        frame = self.__frames.get(path)
+        if frame is not None:
+            self.__frames.move_to_end(path)
+        return frame
+
+    def put(self, frame: Frame) -> bool:
+        """Keep a frame, evicting the least recently used ones to stay within budget."""
+        self.discard(frame.path)
+        if frame.nbytes > self.budget:
+            return False
+
+        self.__frames[frame.path] = frame
+        self.nbytes += frame.nbytes
+        while self.nbytes > self.budget:
+            _, evicted = self.__frames.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return True
+
+    def discard(self, path: str) -> None:
+        frame = self.__frames.pop(path, None)
+        if frame is not None:
+            self.nbytes -= frame.nbytes
+
+    def clear(self) -> None:
+        self.__frames.clear()
+        self.nbytes = 0
+
+
+class Session:
+    """
+    Image files stepped through one at a time, such as the frames of one
+    experiment, with a cache of decoded frames around the current one.
+    """
+
+    def __init__(self, paths: list[str], budget: int, prefetch: int = 2, index: int = 0):
+        if not paths:
+            raise ValueError("A session needs at least one image")
+        self.paths = list(paths)
+        self.index = min(max(index, 0), len(self.paths) - 1)
+        self.prefetch = prefetch
+        self.cache = FrameCache(budget)
+
+    @property
+    def path(self) -> str:
+        return self.paths[self.index]
+
+    def move(self, offset: int) -> bool:
+        """Step through the list, stopping at either end; False if the current frame did not change."""
+        index = min(max(self.index + offset, 0), len(self.paths) - 1)
+        changed, self.index = index != self.index, index
+        return changed
+
+    def neighbours(self) -> list[str]:
+        """Paths within `prefetch` steps of the current frame, nearest and next-in-order first."""
+        paths = []
+        for distance in range(1, self.prefetch + 1):
+            for index in (self.index + distance, self.index - distance):
+                if 0 <= index < len(self.paths):
+                    paths.append(self.paths[index])
+        return paths
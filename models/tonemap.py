@@ -0,0 +1,60 @@
+import numpy as np
+
+from models.loader import to_working
+
+LUT_SIZE = 65536
+
+
+class ToneMap:
+    """
+    Display mapping of 16-bit and float BGRA data to 8-bit BGRA.
+
+    Values between `low` and `high`, as fractions of full scale, are
+    stretched linearly over 0..255. The mapping is a 65536-entry lookup
+    table built once per window and reused for every tile, so tone mapping
+    a frame costs one table lookup per channel.
+    """
+
+    def __init__(self, low: float = 0.0, high: float = 1.0):
+        self.window = (low, high)
+        self.__lut = None
+
+    def set_window(self, low: float, high: float) -> None:
+        if (low, high) != self.window:
+            self.window = (low, high)
+            self.__lut = None
+
+    def fit(self, image_array: np.ndarray, max_pixels: int = 65536, clip: float = 0.001) -> None:
+        """Set the window to the range of the data, from a sparse sample, ignoring `clip` outliers at each end."""
+        step = max(int((image_array.shape[0] * image_array.shape[1] / max_pixels) ** 0.5), 1)
+        sample = to_working(image_array[::step, ::step])[..., :3]
+        if sample.dtype == np.uint8 or not sample.size:
+            self.set_window(0.0, 1.0)
+            return
+
+        scale = 65535 if sample.dtype == np.uint16 else 1
+        low, high = np.quantile(sample, (clip, 1 - clip)) / scale
+        self.set_window(float(low), float(high) if high > low else float(low) + 1 / LUT_SIZE)
+
+    @property
+    def lut(self) -> np.ndarray:
+        if self.__lut is None:
+            low, high = self.window
+            values = (np.arange(LUT_SIZE) / (LUT_SIZE - 1) - low) * (255 / (high - low))
+            self.__lut = np.clip(values + 0.5, 0, 255).astype(np.uint8)
+        return self.__lut
+
+    def __call__(self, image_array: np.ndarray) -> np.ndarray:
+        """8-bit BGRA for display from BGRA at a working depth."""
+        if image_array.dtype == np.uint8:
+            return image_array
+
+        result = np.empty(image_array.shape[:2] + (4,), np.uint8)
+        if image_array.dtype == np.uint16:
+            result[..., :3] = self.lut[image_array[..., :3]]
+            result[..., 3] = image_array[..., 3] >> 8
+        else:
+            indices = np.clip(image_array[..., :3] * (LUT_SIZE - 1) + 0.5, 0, LUT_SIZE - 1).astype(np.uint16)
+            result[..., :3] = self.lut[indices]
+            result[..., 3] = np.clip(image_array[..., 3] * 255 + 0.5, 0, 255)
+        return result
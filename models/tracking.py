@@ -0,0 +1,212 @@
+"""
+Link particles measured in consecutive frames into trajectories.
+
+Every stage is a generator, so a sequence streams through one frame at a
+time: frames() opens each image only when it is needed, detections()
+measures it, and track() labels its particles before the next frame is
+read. Only the positions of the tracked particles are kept.
+"""
+import numpy as np
+
+from models import loader
+from models.particles import ParticleTable, measure_particles
+
+
+class SpatialGrid:
+    """
+    Points hashed into square cells as wide as the search radius, so the
+    neighbours of any point lie in the 3 x 3 cells around it. Building is
+    one sort and a query batch costs O(n log n) instead of comparing every
+    pair of points.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell: float):
+        self.cell = cell
+        self.x, self.y = np.asarray(x, np.float64), np.asarray(y, np.float64)
+        keys = self.__keys(np.floor(self.x / cell), np.floor(self.y / cell))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    @staticmethod
+    def __keys(column: np.ndarray, row: np.ndarray) -> np.ndarray:
+        # Cell coordinates packed into one sortable integer; 2**31 cells a side is far beyond any image
+        return (row.astype(np.int64) << 32) + (column.astype(np.int64) + 2 ** 31)
+
+    def pairs(self, x: np.ndarray, y: np.ndarray, radius: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(query index, grid point index, distance) of every pair closer than radius, radius <= cell."""
+        x, y = np.asarray(x, np.float64), np.asarray(y, np.float64)
+        column, row = np.floor(x / self.cell), np.floor(y / self.cell)
+
+        queries, points = [], []
+        for row_step in (-1, 0, 1):
+            for column_step in (-1, 0, 1):
+                keys = self.__keys(column + column_step, row + row_step)
+                starts = np.searchsorted(self.keys, keys, 'left')
+                counts = np.searchsorted(self.keys, keys, 'right') - starts
+                query = np.repeat(np.arange(len(x)), counts)
+                # Position of each candidate within its cell's run of the sorted keys
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                queries.append(query)
+                points.append(self.order[np.repeat(starts, counts) + offsets])
+
+        query, point = np.concatenate(queries), np.concatenate(points)
+        distance = np.hypot(x[query] - self.x[point], y[query] - self.y[point])
+        close = distance <= radius
+        return query[close], point[close], distance[close]
+
+
+def link(previous_x: np.ndarray, previous_y: np.ndarray, x: np.ndarray, y: np.ndarray,
+         max_displacement: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Match particles of one frame to those of the previous one, nearest pairs
+    first, each particle at most once; returns (previous index, index) arrays.
+    """
+    if not len(previous_x) or not len(x):
+        return np.zeros(0, np.intp), np.zeros(0, np.intp)
+
+    grid = SpatialGrid(previous_x, previous_y, max_displacement)
+    current, previous, distance = grid.pairs(x, y, max_displacement)
+
+    matched_previous, matched_current = [], []
+    used_previous, used_current = set(), set()
+    for index in np.argsort(distance, kind='stable'):
+        p, c = previous[index], current[index]
+        if p not in used_previous and c not in used_current:
+            used_previous.add(p)
+            used_current.add(c)
+            matched_previous.append(p)
+            matched_current.append(c)
+    return np.array(matched_previous, np.intp), np.array(matched_current, np.intp)
+
+
+def frames(paths):
+    """Open images one at a time as (index, array)."""
+    for index, path in enumerate(paths):
+        yield index, loader.open_array(path)
+
+
+def detections(frame_stream, measure=measure_particles):
+    """Measure the particles of each frame as (index, ParticleTable); the frame itself is not kept."""
+    for index, image_array in frame_stream:
+        yield index, measure(image_array)
+
+
+class Tracker:
+    """
+    Assigns track ids to the particles of successive frames.
+
+    A particle continues the track of the nearest particle of the previous
+    frame within `max_displacement` pixels. With `memory`, a track whose
+    particle is missed for up to that many frames can still be continued.
+    """
+
+    def __init__(self, max_displacement: float, memory: int = 0):
+        if max_displacement <= 0:
+            raise ValueError("The maximum displacement must be positive")
+        self.max_displacement = max_displacement
+        self.memory = memory
+        self.next_id = 0
+        self.ids = np.zeros(0, np.int64)
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.last_seen = np.zeros(0, np.int64)
+
+    def update(self, frame: int, table: ParticleTable) -> np.ndarray:
+        """Track id of every particle of this frame."""
+        # Tracks missed for more than `memory` frames have ended
+        active = frame - self.last_seen <= self.memory + 1
+        self.ids, self.x, self.y, self.last_seen = (self.ids[active], self.x[active], self.y[active],
+                                                    self.last_seen[active])
+
+        x, y = table['centroid_x'], table['centroid_y']
+        previous, current = link(self.x, self.y, x, y, self.max_displacement)
+
+        ids = np.empty(len(table), np.int64)
+        ids[current] = self.ids[previous]
+        new = np.ones(len(table), bool)
+        new[current] = False
+        ids[new] = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+
+        # Tracks continued by this frame move to their new position; the others wait for a later frame
+        unmatched = np.ones(len(self.ids), bool)
+        unmatched[previous] = False
+        self.ids = np.concatenate((ids, self.ids[unmatched]))
+        self.x = np.concatenate((x, self.x[unmatched]))
+        self.y = np.concatenate((y, self.y[unmatched]))
+        self.last_seen = np.concatenate((np.full(len(table), frame), self.last_seen[unmatched]))
+        return ids
+
+
+def track(detection_stream, max_displacement: float, memory: int = 0):
+    """Label detections with track ids as (index, ids, ParticleTable)."""
+    tracker = Tracker(max_displacement, memory)
+    for index, table in detection_stream:
+        yield index, tracker.update(index, table), table
+
+
+class TrajectoryTable:
+    """
+    Per-trajectory summaries, stored column by column like ParticleTable.
+
+    Lifetime is in frames. Displacement is the straight distance from the
+    first to the last position, and path_length sums every step. Velocity
+    is net displacement per frame elapsed, and speed is path length per
+    frame elapsed.
+    """
+    COLUMNS = ('track', 'first_frame', 'last_frame', 'lifetime', 'displacement', 'path_length',
+               'velocity_x', 'velocity_y', 'speed', 'mean_area')
+
+    def __init__(self, **columns: np.ndarray):
+        self.columns = {name: columns[name] for name in self.COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns['track'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+def trajectories(tracked_stream) -> TrajectoryTable:
+    """Consume a tracked stream and summarize each trajectory."""
+    steps = {'track': [], 'frame': [], 'x': [], 'y': [], 'area': []}
+    for index, ids, table in tracked_stream:
+        steps['track'].append(ids)
+        steps['frame'].append(np.full(len(ids), index))
+        steps['x'].append(table['centroid_x'])
+        steps['y'].append(table['centroid_y'])
+        steps['area'].append(table['area'])
+    if not steps['track']:
+        return summarize(*(np.zeros(0) for _ in range(5)))
+    return summarize(*(np.concatenate(steps[name]) for name in ('track', 'frame', 'x', 'y', 'area')))
+
+
+def summarize(track_ids: np.ndarray, frame: np.ndarray, x: np.ndarray, y: np.ndarray,
+              area: np.ndarray) -> TrajectoryTable:
+    """Summaries of trajectories given as one row per tracked particle per frame."""
+    order = np.lexsort((frame, track_ids))
+    track_ids, frame, x, y, area = (column[order] for column in (track_ids, frame, x, y, area))
+
+    tracks, starts, counts = np.unique(track_ids, return_index=True, return_counts=True)
+    ends = starts + counts - 1
+    steps = np.hypot(np.diff(x), np.diff(y))
+    # Steps between two tracks are not steps of either
+    steps[ends[:-1]] = 0
+    path_length = np.add.reduceat(np.append(steps, 0), starts) if len(tracks) else np.zeros(0)
+
+    elapsed = frame[ends] - frame[starts]
+    dx, dy = x[ends] - x[starts], y[ends] - y[starts]
+    per_frame = np.where(elapsed > 0, 1 / np.maximum(elapsed, 1), 0)
+
+    return TrajectoryTable(
+        track=tracks.astype(np.int64),
+        first_frame=frame[starts].astype(np.int64),
+        last_frame=frame[ends].astype(np.int64),
+        lifetime=(elapsed + 1).astype(np.int64),
+        displacement=np.hypot(dx, dy),
+        path_length=path_length,
+        velocity_x=dx * per_frame,
+        velocity_y=dy * per_frame,
+        speed=path_length * per_frame,
+        mean_area=np.add.reduceat(area.astype(np.float64), starts) / counts if len(tracks) else np.zeros(0),
+    )
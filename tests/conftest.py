@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep the disk cache of the editor out of the user's own cache folder
+os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="measurer-tests-")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
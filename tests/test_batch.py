@@ -0,0 +1,99 @@
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from measurer import batch
+from models import parallel
+from models.geometry import Dihedral
+
+
+def write_frames(directory, count=3):
+    frames = []
+    for index in range(count):
+        frame = np.full((40, 60, 3), 40 * index, dtype=np.uint8)
+        cv2.imwrite(str(directory / f'frame{index}.png'), frame)
+        frames.append(frame)
+    return frames
+
+
+def test_job_maps_steps_onto_pipeline_parameters():
+    job = batch.Job({'steps': [{'op': 'crop', 'rect': [1, 2, 3, 4]},
+                               {'op': 'resize', 'scale': 0.5},
+                               {'op': 'contrast', 'value': 20},
+                               {'op': 'grayscale'},
+                               {'op': 'rotate', 'degrees': 90},
+                               {'op': 'flip', 'axis': [-1, 1]}]})
+
+    assert job.source_steps == [('crop', (1, 2, 3, 4)), ('resize', None, 0.5)]
+    assert job.params['levels'] == {'brightness': 0, 'contrast': 20}
+    assert job.params['grayscale'] == {'enabled': True}
+    assert job.params['geometry']['orientation'] == Dihedral().rotated(90).flipped((-1, 1))
+
+    with pytest.raises(ValueError):
+        batch.Job({'steps': [{'op': 'blur'}]})
+    with pytest.raises(ValueError):
+        batch.Job({'steps': [{'op': 'resize'}]})
+
+
+def test_run_processes_a_directory(tmp_path):
+    source, output = tmp_path / 'in', tmp_path / 'out'
+    source.mkdir()
+    write_frames(source)
+    pipeline = tmp_path / 'pipeline.json'
+    pipeline.write_text(json.dumps({'steps': [{'op': 'brightness', 'value': 10},
+                                              {'op': 'crop', 'rect': [0, 0, 40, 20]},
+                                              {'op': 'resize', 'size': [20, 10]},
+                                              {'op': 'rotate', 'degrees': 90}]}))
+
+    assert batch.main([str(pipeline), str(source), '-o', str(output), '-j', '2']) == 0
+
+    result = cv2.imread(str(output / 'frame2.png'), cv2.IMREAD_UNCHANGED)
+    assert result.shape[:2] == (20, 10)
+    assert (result[..., :3] == 90).all()
+
+
+def test_inputs_are_listed_in_natural_order(tmp_path):
+    for name in ('frame10.png', 'frame2.png', 'notes.txt', 'frame1.tif'):
+        (tmp_path / name).write_bytes(b'')
+
+    names = [os.path.basename(path) for path in batch.expand([str(tmp_path), str(tmp_path / 'frame*.png')])]
+
+    assert names == ['frame1.tif', 'frame2.png', 'frame10.png']
+
+
+def test_inputs_that_would_share_an_output_are_refused(tmp_path):
+    job = batch.Job({'format': '.png'})
+    output = str(tmp_path / 'out')
+
+    for paths in ([str(tmp_path / 'a.png'), str(tmp_path / 'a.tif')],
+                  [str(tmp_path / 'one' / 'frame.tif'), str(tmp_path / 'two' / 'frame.tif')]):
+        with pytest.raises(ValueError, match='both be written'):
+            batch.run(job, paths, output)
+    with pytest.raises(ValueError, match='its own output'):
+        batch.check_outputs(job, [str(tmp_path / 'a.png')], str(tmp_path))
+    assert not os.path.exists(output)
+
+
+def test_failures_are_reported(tmp_path):
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not an image')
+    report = io.StringIO()
+
+    failures = batch.run(batch.Job({}), [str(broken)], str(tmp_path / 'out'), jobs=1, report=report)
+
+    assert failures and failures[0][0] == str(broken)
+    assert 'failed' in report.getvalue()
+
+
+def worker_threads() -> tuple[int, int]:
+    return parallel.scheduler.threads, cv2.getNumThreads()
+
+
+def test_worker_processes_run_on_one_thread():
+    with ProcessPoolExecutor(max_workers=1, initializer=batch.init_worker) as pool:
+        assert pool.submit(worker_threads).result() == (1, 1)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPoint, QRect
+from PyQt5.QtWidgets import QMainWindow, QScrollArea
+
+from models.calibration import (Calibration, ViewTransform, parse_length, read_calibration, scale_bar_length,
+                                tiff_calibration)
+from models.geometry import Dihedral, map_points, scaling, translation
+from models.lazy import cv2
+from views.image import Image
+
+
+def test_pixel_size_is_read_from_tiff_resolution(tmp_path):
+    path = str(tmp_path / "calibrated.tif")
+    cv2.imwrite(path, np.zeros((4, 4), np.uint8), [cv2.IMWRITE_TIFF_RESUNIT, 3, cv2.IMWRITE_TIFF_XDPI, 5000,
+                                                   cv2.IMWRITE_TIFF_YDPI, 2500])
+    plain = str(tmp_path / "plain.tif")
+    cv2.imwrite(plain, np.zeros((4, 4), np.uint8))
+
+    assert read_calibration(path) == Calibration(2.0, 4.0, 'µm')
+    assert read_calibration(plain) is None
+    assert read_calibration(str(tmp_path / "missing.png")) is None
+    # ImageJ names its unit in the description and leaves ResolutionUnit at none
+    assert tiff_calibration({270: tuple(b'ImageJ=1.53\nunit=nm\n'[i:i + 1] for i in range(20)),
+                             282: ((4, 1),), 296: (1,)}) == Calibration(0.25, 0.25, 'nm')
+
+
+def test_view_transform_composes_zoom_orientation_and_placement():
+    shape = (30, 50)
+    orientation = Dihedral(1, True)
+    placement = translation(7, 3) @ scaling(2, 2)
+    calibration = Calibration(0.5, 0.5)
+    view = ViewTransform().update(4.0, orientation, shape, placement, calibration)
+
+    widget = np.array([(12.0, 40.0)])
+    rendered = widget / 4
+    source = map_points(np.linalg.inv(orientation.matrix(shape)), rendered)
+    assert np.allclose(map_points(view.to_pixels, widget), map_points(placement, source))
+    assert np.allclose(map_points(view.to_physical, widget), map_points(placement, source) * 0.5)
+    assert view.pixel_length == pytest.approx(1.0) and view.widget_pixel_length == pytest.approx(0.25)
+
+    matrix = view.to_physical
+    assert view.update(4.0, orientation, shape, translation(7, 3) @ scaling(2, 2), calibration).to_physical is matrix
+    assert view.update(2.0, orientation, shape, placement, calibration).to_physical is not matrix
+
+
+def test_lengths_and_scale_bars():
+    assert parse_length("10 µm") == (10.0, 'µm')
+    assert parse_length("2.5mm") == (2.5, 'mm')
+    assert parse_length("3", 'nm') == (3.0, 'nm')
+    with pytest.raises(ValueError):
+        parse_length("ten")
+    assert scale_bar_length(0.3, 150) == 20
+    assert scale_bar_length(0.03, 150) == 2
+    assert scale_bar_length(1.0, 150) == 100
+
+
+def test_calibration_follows_zoom_rotation_and_crop(qapp):
+    label = Image(QMainWindow())
+    label.set_original(np.zeros((40, 60), np.uint8))
+    label.set_zoom(2.0)
+    label.rotate_image(90)
+
+    # 40 widget pixels at zoom 2 are 20 pixels of the file, whichever way the image is turned
+    label.calibrate_line(QPoint(10, 10), QPoint(10, 50), 5, 'µm')
+    assert label.calibration == Calibration(0.25, 0.25, 'µm')
+
+    # The same point of the specimen keeps its physical position once cropped to
+    label.selection = QRect(10, 6, 30, 50)
+    before = map_points(label.transform.to_physical, (40, 32))
+    label.cropImage()
+    assert np.allclose(map_points(label.transform.to_physical, (20, 20)), before)
+    label.undo()
+    assert np.allclose(label.pipeline.placement, np.eye(3))
+
+
+def test_scale_bar_stays_in_the_visible_corner(qapp):
+    area = QScrollArea()
+    area.resize(200, 150)
+    label = Image(QMainWindow())
+    area.setWidget(label)
+    label.set_original(np.zeros((400, 600), np.uint8))
+    label.set_zoom(2.0)
+    label.set_calibration(Calibration(0.5, 0.5, 'µm'))
+    area.show()
+    area.horizontalScrollBar().setValue(300)
+    area.verticalScrollBar().setValue(200)
+    qapp.processEvents()
+
+    viewport = area.viewport()
+    pixels = viewport.grab().toImage()
+    # Closing the scroll area destroys the label, which must not happen while its jobs run
+    label.worker.wait()
+    assert pixels.pixelColor(14, viewport.height() - 14).getRgb()[:3] == (255, 255, 255)
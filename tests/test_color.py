@@ -0,0 +1,53 @@
+import numpy as np
+
+from models import color
+
+
+def make_array(height=6, width=5):
+    image_array = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+    image_array[..., 3] = 255
+    return image_array
+
+
+def test_sepia_matches_per_pixel_formula():
+    image_array = make_array()
+    blue, green, red = (image_array[..., i].astype(float) for i in range(3))
+
+    expected_red = np.minimum(0.393 * red + 0.769 * green + 0.189 * blue, 255)
+    expected_blue = np.minimum(0.272 * red + 0.534 * green + 0.131 * blue, 255)
+
+    result = color.sepia(image_array)
+
+    assert result.shape == image_array.shape
+    assert np.abs(result[..., 2] - expected_red).max() <= 1
+    assert np.abs(result[..., 0] - expected_blue).max() <= 1
+    assert (result[..., 3] == 255).all()
+
+
+def test_shift_hue_rotates_primary_colors():
+    image_array = np.zeros((1, 1, 4), dtype=np.uint8)
+    image_array[..., 2] = 255  # pure red
+    image_array[..., 3] = 255
+
+    result = color.shift_hue(image_array, 120)
+
+    assert result[0, 0, 1] > 250  # red turned green
+    assert result[0, 0, 2] < 5
+    assert result[0, 0, 3] == 255
+
+
+def test_shift_hue_zero_is_noop():
+    image_array = make_array()
+    assert color.shift_hue(image_array, 360) is image_array
+
+
+def test_equalize_spreads_lightness_and_keeps_alpha():
+    image_array = np.zeros((64, 64, 4), np.uint8)
+    image_array[..., :3] = np.linspace(100, 140, 64, dtype=np.uint8)[None, :, None]
+    image_array[..., 3] = 7
+
+    equalized = color.equalize(image_array, clip_limit=4.0)
+
+    assert np.ptp(equalized[..., :3]) > np.ptp(image_array[..., :3])
+    assert (equalized[..., 3] == 7).all()
+    assert color.equalize(image_array, clip_limit=0) is image_array
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+from PyQt5.QtWidgets import QMainWindow
+
+from models.diskcache import DiskCache
+from models.lazy import cv2
+from models.particles import ParticleTable
+from models.session import decode_frame
+from views.image import Image
+
+
+def test_entries_are_keyed_by_content_and_parameters(tmp_path):
+    first, second = tmp_path / 'a.png', tmp_path / 'b.png'
+    first.write_bytes(b'same bytes')
+    second.write_bytes(b'same bytes')
+    cache = DiskCache(str(tmp_path / 'cache'), capacity=2 ** 20)
+
+    assert cache.digest(str(first)) == cache.digest(str(second))
+    assert cache.key('digest', 'op', level=0, size=1) == cache.key('digest', 'op', size=1, level=0)
+    assert cache.key('digest', 'op', level=0) != cache.key('digest', 'op', level=1)
+
+    cache.put('entry', np.arange(12, dtype=np.uint16).reshape(3, 4))
+    hit = cache.get('entry')
+    assert isinstance(hit, np.memmap) and hit[2, 3] == 11
+    assert cache.get('missing') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    block = np.zeros(1000, np.uint8)
+    cache = DiskCache(str(tmp_path), capacity=3 * 1200)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, block)
+    cache.get('a')
+    cache.put('d', block)
+
+    assert 'b' not in cache and not os.path.exists(tmp_path / 'b.npy')
+    assert all(key in cache for key in 'acd')
+
+    reopened = DiskCache(str(tmp_path), capacity=3 * 1200)
+    assert len(reopened) == 3 and reopened.nbytes == cache.nbytes
+
+
+def test_decoded_pyramids_are_mapped_on_the_next_open(tmp_path):
+    path = str(tmp_path / 'frame.png')
+    cv2.imwrite(path, np.random.default_rng(0).integers(0, 256, (600, 700, 3), dtype=np.uint8))
+    cache = DiskCache(str(tmp_path / 'cache'), capacity=2 ** 30)
+
+    decoded = decode_frame(path, 256, cache)
+    mapped = decode_frame(path, 256, cache)
+
+    assert not isinstance(decoded.source, np.memmap)
+    assert all(isinstance(level, np.memmap) for level in mapped.pyramid.levels)
+    assert len(mapped.pyramid.levels) == len(decoded.pyramid.levels) == 3
+    assert all(np.array_equal(a, b) for a, b in zip(mapped.pyramid.levels, decoded.pyramid.levels))
+    assert mapped.nbytes == 0
+
+
+def test_measurements_are_reused_for_the_same_file_and_edits(qapp, tmp_path):
+    path = str(tmp_path / 'particles.png')
+    image_array = np.zeros((40, 40, 3), np.uint8)
+    image_array[5:10, 5:10] = 255
+    cv2.imwrite(path, image_array)
+
+    label = Image(QMainWindow())
+    tables = []
+    label.measured.connect(tables.append)
+    for _ in range(2):
+        label.set_original(decode_frame(path).source, path=path)
+        label.worker.wait()
+        qapp.processEvents()
+        label.measure_particles()
+        label.worker.wait()
+        qapp.processEvents()
+
+    assert len(tables) == 2 and list(tables[0]['area']) == list(tables[1]['area']) == [25]
+    assert isinstance(tables[1]['area'], np.memmap)
+    assert isinstance(tables[1], ParticleTable)
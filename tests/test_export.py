@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+from PyQt5.QtWidgets import QMainWindow
+
+from models import export
+from models.export import ExportOptions
+from models.lazy import cv2
+from models.particles import measure_particles
+from models.tonemap import ToneMap
+from views.image import Image
+
+
+def gradient(dtype=np.uint8, full=255) -> np.ndarray:
+    image_array = np.empty((64, 96, 4), dtype)
+    image_array[..., :3] = (np.linspace(0, full, 96, dtype=np.float32)[None, :, None]).astype(dtype)
+    image_array[..., 3] = full
+    return image_array
+
+
+def test_formats_keep_the_deepest_depth_they_hold(tmp_path):
+    deep = gradient(np.float32, 1.0)
+
+    export.write_image(str(tmp_path / 'deep.tif'), deep, ExportOptions(tiff_compression='deflate'))
+    export.write_image(str(tmp_path / 'deep.png'), deep)
+    export.write_image(str(tmp_path / 'deep.jpg'), deep, tone_map=ToneMap())
+
+    assert cv2.imread(str(tmp_path / 'deep.tif'), cv2.IMREAD_UNCHANGED).dtype == np.float32
+    png = cv2.imread(str(tmp_path / 'deep.png'), cv2.IMREAD_UNCHANGED)
+    assert png.dtype == np.uint16 and png.shape == (64, 96, 3) and png[0, -1, 0] == 65535
+    assert cv2.imread(str(tmp_path / 'deep.jpg'), cv2.IMREAD_UNCHANGED).dtype == np.uint8
+    assert sorted(os.listdir(tmp_path)) == ['deep.jpg', 'deep.png', 'deep.tif']
+
+
+def test_compression_settings_reach_the_encoder(tmp_path):
+    image_array = gradient()
+    image_array[..., 3] = 128
+
+    export.write_image(str(tmp_path / 'fast.png'), image_array, ExportOptions(png_level=0))
+    export.write_image(str(tmp_path / 'small.png'), image_array, ExportOptions(png_level=9))
+
+    assert os.path.getsize(tmp_path / 'small.png') < os.path.getsize(tmp_path / 'fast.png')
+    assert cv2.imread(str(tmp_path / 'small.png'), cv2.IMREAD_UNCHANGED).shape == (64, 96, 4)
+    with pytest.raises(ValueError):
+        export.encode_params('.tif', ExportOptions(tiff_compression='zip'))
+
+
+def test_measurements_export_as_csv_and_columns(tmp_path):
+    image_array = np.zeros((20, 30), np.uint8)
+    image_array[2:6, 3:8] = 255
+    image_array[10:12, 20:29] = 255
+    table = measure_particles(image_array)
+
+    written = export.export(str(tmp_path / 'frame.png'), gradient(), table=table,
+                            table_path=str(tmp_path / 'frame.csv'))
+    export.write_table(str(tmp_path / 'frame.npz'), table)
+
+    assert written == [str(tmp_path / 'frame.png'), str(tmp_path / 'frame.csv')]
+    rows = (tmp_path / 'frame.csv').read_text().splitlines()
+    assert rows[0].split(',') == list(table.COLUMNS)
+    assert [int(row.split(',')[1]) for row in rows[1:]] == list(table['area'])
+    with np.load(tmp_path / 'frame.npz') as columns:
+        assert (columns['centroid_x'] == table['centroid_x']).all()
+
+
+def test_image_exports_in_the_background(qapp, tmp_path):
+    label = Image(QMainWindow())
+    label.set_original(gradient())
+    written = []
+    label.exported.connect(written.extend)
+
+    label.worker.wait()
+    qapp.processEvents()
+    label.export_image(str(tmp_path / 'out.png'))
+    label.worker.wait()
+    qapp.processEvents()
+
+    assert written == [str(tmp_path / 'out.png')]
+    assert (cv2.imread(written[0])[..., 0] == gradient()[..., 0]).all()
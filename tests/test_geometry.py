@@ -0,0 +1,57 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from models.geometry import Dihedral, map_points
+
+STEPS = [('rotate', 90), ('rotate', -90), ('rotate', 180), ('flip', (-1, 1)), ('flip', (1, -1)), ('flip', (-1, -1))]
+NUMPY_STEPS = {
+    ('rotate', 90): lambda a: np.rot90(a, -1),
+    ('rotate', -90): lambda a: np.rot90(a, 1),
+    ('rotate', 180): lambda a: np.rot90(a, 2),
+    ('flip', (-1, 1)): lambda a: a[:, ::-1],
+    ('flip', (1, -1)): lambda a: a[::-1],
+    ('flip', (-1, -1)): lambda a: a[::-1, ::-1],
+}
+
+
+def compose(steps):
+    orientation = Dihedral()
+    for name, value in steps:
+        orientation = orientation.rotated(value) if name == 'rotate' else orientation.flipped(value)
+    return orientation
+
+
+def test_composed_orientation_matches_steps_applied_one_by_one():
+    source = np.arange(6 * 10 * 2, dtype=np.uint8).reshape(6, 10, 2)
+
+    for steps in itertools.product(STEPS, repeat=3):
+        expected = source
+        for step in steps:
+            expected = NUMPY_STEPS[step](expected)
+
+        orientation = compose(steps)
+        view = orientation.view(source)
+
+        assert np.array_equal(view, expected)
+        assert np.shares_memory(view, source)
+        assert np.array_equal(orientation.apply(source), expected)
+        assert np.array_equal(orientation.inverse().view(view), source)
+        assert orientation.shape(source.shape) == expected.shape
+
+
+def test_matrix_moves_points_as_map_rect_moves_rectangles():
+    for turns, mirrored in itertools.product(range(4), (False, True)):
+        orientation = Dihedral(turns, mirrored)
+        x, y, width, height = orientation.map_rect((3, 5, 7, 2), (30, 50))
+
+        corners = map_points(orientation.matrix((30, 50)), [(3, 5), (10, 7)])
+        assert tuple(corners.min(axis=0)) == (x, y)
+        assert tuple(np.ptp(corners, axis=0)) == (width, height)
+
+
+def test_only_quarter_turns_are_accepted():
+    with pytest.raises(ValueError):
+        Dihedral().rotated(45)
+    assert Dihedral().rotated(-90).rotated(450) == Dihedral()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from PyQt5.QtWidgets import QMainWindow
+
+from measurer.settings import settings
+from models.histogram import HistogramCache, auto_levels, channel_histograms, sample_step
+from models.pipeline import levels
+from views.image import Image, display_image
+
+
+def test_channel_histograms_count_every_sampled_pixel():
+    image_array = np.zeros((40, 60, 4), np.uint8)
+    image_array[..., 0] = 10
+    image_array[..., 2] = np.arange(60, dtype=np.uint8)
+
+    histograms = channel_histograms(image_array)
+    sampled = channel_histograms(image_array, step=sample_step(image_array.shape, 600))
+
+    assert histograms.shape == (3, 256)
+    assert histograms[0, 10] == histograms[1, 0] == 2400
+    assert (histograms[2, :60] == 40).all()
+    assert sampled.sum(axis=1).tolist() == [600] * 3
+
+
+def test_auto_levels_stretch_to_the_full_range():
+    image_array = np.zeros((10, 100, 4), np.uint8)
+    image_array[..., :3] = np.linspace(50, 150, 100, dtype=np.uint8)[None, :, None]
+
+    brightness, contrast = auto_levels(channel_histograms(image_array), clip=0)
+    stretched = levels(image_array, brightness, contrast)
+
+    assert stretched[..., :3].min() <= 1 and stretched[..., :3].max() >= 254
+
+
+def test_auto_levels_on_12_bit_data_stay_within_the_tone_window(qapp):
+    rng = np.random.default_rng(1)
+    frame = np.clip(rng.normal(1500, 400, (128, 128)), 0, 4095).astype(np.uint16)
+    label = Image(QMainWindow())
+    label.set_original(frame)
+
+    label.auto_levels()
+    brightness, contrast = label.pipeline.get('levels').values()
+    assert settings['CONTRAST_MIN_VALUE'] < contrast < settings['CONTRAST_MAX_VALUE']
+
+    image = display_image(label.pipeline.render(), label.tone_map)
+    display = image.as_array[..., 0]
+    # Only the clipped tails saturate, not the bulk of the frame
+    assert 0 < np.mean(display == 255) < 0.02 and 0 < np.mean(display == 0) < 0.02
+    assert 100 < np.median(display) < 160
+
+
+def test_cache_keeps_the_finest_sample_per_version():
+    source = np.random.default_rng(0).integers(0, 256, (64, 64, 4), dtype=np.uint8)
+    cache = HistogramCache()
+    params = {'levels': {'brightness': 0, 'contrast': 0}}
+
+    coarse = cache.sample(source, params, source, 8)
+    fine = cache.sample(source, params, source, 1)
+
+    assert coarse.sum() < fine.sum()
+    assert cache.sample(source, params, source, 4) is fine
+    assert cache.get(source, {'levels': {'brightness': 10, 'contrast': 0}}) is None
+    assert cache.get(source.copy(), params) is None
@@ -0,0 +1,110 @@
+import numpy as np
+
+from models.history import History, ParamCommand, SourceCommand, Snapshot, encode
+from models.pipeline import AdjustmentPipeline
+
+
+def make_source(height=300, width=280):
+    return np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+
+def test_param_steps_undo_redo_and_merge():
+    pipeline = AdjustmentPipeline(make_source())
+    history = History(budget=0)
+
+    for brightness in (10, 20, 30):
+        before = pipeline.params
+        pipeline.set('levels', brightness=brightness)
+        history.push(ParamCommand('Brightness', before, pipeline.params), merge=1)
+
+    assert len(history.undo_stack) == 1
+    assert history.undo(pipeline)
+    assert pipeline.get('levels')['brightness'] == 0
+    assert history.redo(pipeline)
+    assert pipeline.get('levels')['brightness'] == 30
+
+
+def test_separate_drags_are_separate_steps():
+    pipeline = AdjustmentPipeline(make_source())
+    history = History(budget=0)
+
+    for drag, brightness in ((1, 10), (1, 20), (2, 30), (None, 40), (None, 50)):
+        before = pipeline.params
+        pipeline.set('levels', brightness=brightness)
+        history.push(ParamCommand('Brightness', before, pipeline.params), merge=drag)
+
+    assert [step.after['levels']['brightness'] for step in history.undo_stack] == [20, 30, 40, 50]
+
+
+def test_views_are_kept_by_reference():
+    source = make_source()
+    cropped = source[10:50, 20:60]
+
+    snapshot = Snapshot(source, cropped)
+
+    assert snapshot.nbytes == 0
+    assert snapshot.restore(cropped) is source
+
+
+def test_views_are_encoded_once_the_source_moves_on():
+    source = make_source()
+    pipeline = AdjustmentPipeline(source)
+    history = History(budget=10 ** 9)
+    cropped = source[10:50, 20:60]
+    crop = SourceCommand('Crop', source, cropped)
+    pipeline.set_source(cropped)
+    history.push(crop)
+    assert history.pending(pipeline.source) == [] and crop.nbytes == 0
+
+    resized = np.ascontiguousarray(cropped[::2, ::2])
+    pipeline.set_source(resized)
+    history.push(SourceCommand('Resize', cropped, resized))
+    encode(history.pending(pipeline.source))
+
+    # The full source is held by the crop step alone, so it is compressed and counted
+    assert crop.other.array is None and crop.nbytes > 0
+    history.undo(pipeline)
+    history.undo(pipeline)
+    assert (pipeline.source == source).all()
+
+
+def test_same_shape_snapshot_stores_only_changed_tiles():
+    before = np.zeros((600, 600), np.uint8)
+    after = before.copy()
+    after[5, 5] = 7
+
+    snapshot = Snapshot(before, after)
+    assert snapshot.pending and snapshot.restore(after) is before
+
+    encode([snapshot])
+
+    assert not snapshot.pending and snapshot.array is None
+    assert len(snapshot.tiles) == 1
+    assert (snapshot.restore(after) == before).all()
+
+
+def test_source_command_round_trip_and_budget_eviction():
+    source = make_source()
+    pipeline = AdjustmentPipeline(source)
+    history = History(budget=10 ** 9)
+
+    resized = np.ascontiguousarray(source[::2, ::2])
+    command = SourceCommand('Resize', source, resized)
+    pipeline.set_source(resized)
+    history.push(command)
+    encode(history.pending())
+
+    assert command.nbytes > 0
+    history.undo(pipeline)
+    assert (pipeline.source == source).all()
+    # The snapshot of the source that was undone is taken at once and compressed later
+    assert history.pending() == [command.other]
+    encode(history.pending())
+    history.redo(pipeline)
+    assert (pipeline.source == resized).all()
+    encode(history.pending())
+
+    history.budget = command.nbytes - 1
+    history.push(ParamCommand('Sepia', pipeline.params, pipeline.params))
+    assert not any(isinstance(step, SourceCommand) for step in history.undo_stack)
+    assert history.nbytes <= history.budget
@@ -0,0 +1,101 @@
+import numpy as np
+from PyQt5.QtCore import QRect, QSize
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QMainWindow
+
+from views.image import Image, MainImage
+
+
+def test_as_array_is_a_view_over_the_image_buffer():
+    image = MainImage(7, 3, QImage.Format_RGB32)
+    image.fill(0xff102030)
+
+    image_array = image.as_array
+
+    assert image_array.shape == (3, 7, 4)
+    assert tuple(image_array[1, 6]) == (0x30, 0x20, 0x10, 0xff)
+    assert not image_array.flags.writeable
+    assert not image_array.flags.owndata
+
+
+def test_as_array_keeps_a_temporary_image_alive():
+    image_array = MainImage.from_array(np.full((64, 64, 4), 255, np.uint8)).as_array
+    # Reuse the memory any freed image would have left behind
+    allocations = [np.zeros((64, 64, 4), np.uint8) for _ in range(8)]
+
+    assert (image_array == 255).all()
+    assert isinstance(image_array.base.image, MainImage)
+    del allocations
+
+
+def test_buffer_view_respects_padded_rows():
+    image = QImage(5, 3, QImage.Format_Grayscale8)
+    image.fill(9)
+    image.setPixelColor(4, 2, image.pixelColor(0, 0).fromRgb(200, 200, 200))
+
+    view = MainImage.buffer_view(image)
+
+    assert image.bytesPerLine() == 8
+    assert view.shape == (3, 5)
+    assert view[2, 4] == 200
+    assert (view[:, :4] == 9).all()
+
+
+def test_from_array_shares_memory_and_keeps_the_array_alive():
+    image_array = np.zeros((4, 6, 4), dtype=np.uint8)
+    image = MainImage.from_array(image_array)
+    del image_array
+
+    image._array[2, 3] = (1, 2, 3, 255)
+
+    assert image.format() == QImage.Format_RGB32
+    assert image.pixelColor(3, 2).getRgb() == (3, 2, 1, 255)
+    assert np.shares_memory(image.as_array, image._array)
+
+
+def test_from_array_packs_strided_views():
+    image_array = np.arange(4 * 6, dtype=np.uint8).reshape(4, 6)[::-1, ::2]
+    image = MainImage.from_array(image_array)
+
+    assert image.format() == QImage.Format_Grayscale8
+    assert (MainImage.buffer_view(image) == image_array).all()
+
+
+def test_widget_rectangles_map_through_zoom(qapp):
+    label = Image(QMainWindow())
+    label.image_size = QSize(100, 50)
+    label.set_zoom(2.0)
+
+    assert label.widget_to_image(QRect(10, 20, 40, 60)) == QRect(5, 10, 20, 30)
+    assert label.widget_to_image(QRect(150, 0, 100, 10)) == QRect(75, 0, 25, 5)
+
+
+def test_each_slider_drag_is_one_history_step(qapp):
+    label = Image(QMainWindow())
+    label.set_original(np.zeros((32, 32), np.uint8))
+
+    for values in ((10, 20), (30,)):
+        label.begin_preview()
+        for value in values:
+            label.change_brightness(value)
+        label.end_preview()
+    label.worker.wait()
+    qapp.processEvents()
+
+    assert [step.after['levels']['brightness'] for step in label.history.undo_stack] == [20, 30]
+
+
+def test_preview_proxy_is_ready_before_a_drag(qapp):
+    window = QMainWindow()
+    window.resize(40, 30)
+    label = Image(window)
+    label.set_original(np.zeros((300, 400), np.uint8))
+    while True:
+        label.worker.wait()
+        qapp.processEvents()
+        if not label.worker.pool.activeThreadCount():
+            break
+
+    assert label.pipeline.proxy(40, 30, build=False) is not None
+    label.begin_preview()
+    assert label.preview is label.pipeline.proxy(40, 30)
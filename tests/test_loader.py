@@ -0,0 +1,66 @@
+import json
+
+import cv2
+import numpy as np
+
+from models import loader
+from models.pipeline import AdjustmentPipeline
+
+
+def gradient16(height=30, width=20):
+    return (np.arange(height * width, dtype=np.uint16).reshape(height, width) * 97)
+
+
+def test_npy_is_memory_mapped(tmp_path):
+    path = str(tmp_path / 'frame.npy')
+    np.save(path, gradient16())
+
+    mapped = loader.open_array(path)
+
+    assert isinstance(mapped, np.memmap)
+    assert (mapped == gradient16()).all()
+
+
+def test_uncompressed_tiff_is_memory_mapped(tmp_path):
+    gray_path, color_path = str(tmp_path / 'gray.tif'), str(tmp_path / 'color.tif')
+    color = np.random.default_rng(0).integers(0, 256, (12, 9, 3), dtype=np.uint8)
+    cv2.imwrite(gray_path, gradient16(), [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+    cv2.imwrite(color_path, color, [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+
+    gray, bgr = loader.open_array(gray_path), loader.open_array(color_path)
+
+    assert isinstance(gray, np.memmap) and gray.dtype == np.uint16
+    assert (gray == gradient16()).all()
+    assert isinstance(bgr, np.memmap)
+    assert (bgr == color).all()
+
+
+def test_compressed_tiff_falls_back_to_decoding(tmp_path):
+    path = str(tmp_path / 'lzw.tif')
+    cv2.imwrite(path, gradient16(), [cv2.IMWRITE_TIFF_COMPRESSION, 5])
+
+    decoded = loader.open_array(path)
+
+    assert not isinstance(decoded, np.memmap)
+    assert (decoded == gradient16()).all()
+
+
+def test_raw_uses_json_sidecar(tmp_path):
+    path = tmp_path / 'frame.raw'
+    path.write_bytes(b'\0' * 16 + gradient16().tobytes())
+    (tmp_path / 'frame.raw.json').write_text(json.dumps({'shape': [30, 20], 'dtype': 'uint16', 'offset': 16}))
+
+    assert (loader.open_array(str(path)) == gradient16()).all()
+
+
+def test_pipeline_keeps_memmap_until_a_stage_runs(tmp_path):
+    path = str(tmp_path / 'frame.npy')
+    np.save(path, gradient16())
+    pipeline = AdjustmentPipeline(loader.open_array(path))
+
+    assert isinstance(pipeline.render(), np.memmap)
+
+    pipeline.set('levels', brightness=1)
+    rendered = pipeline.render()
+    assert rendered.shape == (30, 20, 4) and rendered.dtype == np.uint16
+    assert (rendered[..., 0] == np.minimum(gradient16().astype(int) + 257, 65535)).all()
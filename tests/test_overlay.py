@@ -0,0 +1,153 @@
+import numpy as np
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QMainWindow
+
+from models.lazy import cv2
+from models.overlay import Overlay, contains, mask_levels
+from models.pyramid import Pyramid
+from views.image import Image, MainImage
+from views.tiles import TileRenderer
+
+
+def overlay(width=512, height=512, tile_size=128) -> Overlay:
+    return Overlay(Pyramid(np.zeros((height, width, 4), np.uint8), tile_size), color=(0, 255, 0))
+
+
+def particles(boxes, width=512, height=512):
+    """Masks and rows of solid rectangular particles."""
+    mask = np.zeros((height, width), np.uint8)
+    for left, top, box_width, box_height in boxes:
+        mask[top:top + box_height, left:left + box_width] = 1
+    rows = [(left, top, box_width, box_height, box_width * box_height) for left, top, box_width, box_height in boxes]
+    return mask_levels(mask, 3), rows
+
+
+def settle(qapp, label) -> None:
+    """Wait for every job, including those submitted by the callbacks of others."""
+    while True:
+        label.worker.wait()
+        qapp.processEvents()
+        if not label.worker.pool.activeThreadCount():
+            return
+
+
+def test_contours_are_drawn_only_in_the_tiles_they_touch():
+    layer = overlay()
+    layer.set_particles(*particles([(10, 10, 20, 20), (120, 200, 20, 10)]))
+
+    tile = layer.tile(0, 0, 0)
+    assert tile.shape == (128, 128, 4)
+    assert tuple(tile[10, 10]) == (0, 255, 0, 255) and tuple(tile[29, 29]) == (0, 255, 0, 255)
+    assert tile[20, 20, 3] == 0
+    # The second particle straddles the seam between two tiles and is outlined in both, but not along the seam
+    assert layer.tile(0, 1, 0)[200 - 128, 120, 3] == 255 and layer.tile(0, 1, 0)[205 - 128, 127, 3] == 0
+    assert layer.tile(0, 1, 1)[200 - 128, 0, 3] == 255 and layer.tile(0, 1, 1)[205 - 128, 0, 3] == 0
+    assert layer.tile(0, 3, 3) is None
+
+
+def test_outlines_follow_the_shape_of_particles():
+    mask = np.zeros((128, 128), np.uint8)
+    cv2.circle(mask, (64, 64), 30, 1, -1)
+    layer = overlay(128, 128)
+    layer.set_particles(mask_levels(mask, 1), [(34, 34, 61, 61, int(mask.sum()))])
+
+    outline = layer.tile(0, 0, 0)[..., 3] > 0
+    # The corners of the bounding box lie outside the circle and stay clear
+    assert outline[64, 34] and outline[34, 64] and not outline[34, 34] and not outline[64, 64]
+    assert not (outline & (mask == 0)).any()
+
+
+def test_small_particles_become_dots_at_coarse_levels():
+    layer = overlay()
+    layer.set_particles(*particles([(100, 100, 8, 8)]))
+
+    assert np.count_nonzero(layer.tile(0, 0, 0)[..., 3]) == 28
+    dot = layer.tile(2, 0, 0)
+    assert np.count_nonzero(dot[..., 3]) == 4 and dot[25:27, 25:27, 3].all()
+
+
+def test_set_particles_returns_only_the_changes():
+    layer = overlay()
+    assert layer.set_particles(*particles([(0, 0, 5, 5), (50, 50, 5, 5)])) == [(0, 0, 5, 5), (50, 50, 5, 5)]
+
+    assert layer.set_particles(*particles([(50, 50, 5, 5), (90, 90, 5, 5)])) == [(0, 0, 5, 5), (90, 90, 5, 5)]
+    assert layer.set_particles(*particles([(50, 50, 5, 5), (90, 90, 5, 5)])) == []
+
+
+def test_contains_tells_particles_apart_by_box_and_area():
+    rows = np.array([[1, 2, 3, 4, 12], [70000, 2, 3, 4, 12]], np.int64)
+
+    assert list(contains(rows[:1], np.array([[1, 2, 3, 4, 12], [1, 2, 3, 5, 12], [1, 2, 3, 4, 11]]))) == [
+        True, False, False]
+    # Coordinates beyond sixteen bits are compared as raw rows
+    assert list(contains(rows, np.array([[70000, 2, 3, 4, 12], [70000, 2, 3, 5, 12]]))) == [True, False]
+
+
+def test_invalidate_drops_only_overlapping_tiles(qapp):
+    layer = overlay()
+    layer.set_particles(*particles([(10, 10, 5, 5), (300, 300, 5, 5)]))
+    renderer = TileRenderer(lambda tile: MainImage.from_array(tile, QImage.Format_ARGB32_Premultiplied))
+    renderer.set_pyramid(layer)
+    target = QImage(512, 512, QImage.Format_ARGB32)
+    target.fill(0)
+    painter = QPainter(target)
+    renderer.paint(painter, QRect(0, 0, 512, 512), 512, 512)
+
+    tiles = []
+    layer.tile = lambda index, row, col: tiles.append((row, col)) or Overlay.tile(layer, index, row, col)
+    renderer.invalidate([(10, 10, 5, 5)])
+    renderer.paint(painter, QRect(0, 0, 512, 512), 512, 512)
+    painter.end()
+
+    assert tiles == [(0, 0)]
+    pixels = MainImage.buffer_view(target)
+    assert pixels[302, 302, 3] == 0 and pixels[300, 300, 3] == 255
+
+
+def test_invalidate_margin_reaches_neighbouring_tiles(qapp):
+    layer = overlay()
+    renderer = TileRenderer(lambda tile: MainImage.from_array(tile, QImage.Format_ARGB32_Premultiplied))
+    renderer.set_pyramid(layer)
+    target = QImage(512, 512, QImage.Format_ARGB32)
+    painter = QPainter(target)
+    renderer.paint(painter, QRect(0, 0, 512, 512), 512, 512)
+
+    tiles = []
+    layer.tile = lambda index, row, col: tiles.append((row, col)) or Overlay.tile(layer, index, row, col)
+    renderer.invalidate([(128, 10, 5, 5)], margin=1)
+    renderer.paint(painter, QRect(0, 0, 512, 512), 512, 512)
+    painter.end()
+
+    assert sorted(tiles) == [(0, 0), (0, 1)]
+
+
+def test_measured_particles_are_outlined(qapp):
+    source = np.zeros((64, 64), np.uint8)
+    source[20:30, 20:30] = 255
+    label = Image(QMainWindow())
+    label.set_original(source)
+    settle(qapp, label)
+
+    label.measure_particles()
+    settle(qapp, label)
+
+    assert label.overlay.rows[:, :4].tolist() == [[20, 20, 10, 10]]
+    assert label.overlay.tile(0, 0, 0)[20, 20, 3] == 255 and label.overlay.tile(0, 0, 0)[25, 25, 3] == 0
+
+
+def test_particles_are_dropped_when_the_source_is_resized(qapp):
+    source = np.zeros((64, 64), np.uint8)
+    source[20:30, 20:30] = 255
+    label = Image(QMainWindow())
+    label.set_original(source)
+    settle(qapp, label)
+    label.measure_particles()
+    settle(qapp, label)
+    assert label.particles is not None
+
+    label.resize_source((32, 32))
+    settle(qapp, label)
+
+    assert label.particles is None
+    assert label.overlay.tile(0, 0, 0) is None
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import numpy as np
+
+from models import color
+from models import parallel as strips_module
+from models.parallel import StripScheduler, strips
+from models.pipeline import AdjustmentPipeline, grayscale, levels, sepia
+
+
+def frame(dtype=np.uint8) -> np.ndarray:
+    image_array = np.random.default_rng(3).integers(0, 256, (203, 157, 4), dtype=np.uint8)
+    image_array[..., 3] = 255
+    if dtype == np.uint16:
+        return image_array.astype(np.uint16) * 257
+    if dtype == np.float32:
+        return image_array.astype(np.float32) / 255
+    return image_array
+
+
+def test_strips_cover_every_row_once():
+    cut = strips((203, 157, 4), row_bytes=157 * 8, count=4, strip_bytes=157 * 8 * 10)
+
+    assert cut[0] == slice(0, 10) and cut[-1].stop == 203
+    assert all(before.stop == after.start for before, after in zip(cut, cut[1:]))
+    assert len(strips((3, 10), row_bytes=10, count=8)) == 3
+
+
+def test_strips_match_one_call_over_the_frame():
+    scheduler = StripScheduler(threads=4, strip_bytes=4096, min_pixels=0)
+    kernels = [(levels, {'brightness': 30, 'contrast': 25}), (grayscale, {'enabled': True}),
+               (sepia, {'enabled': True}), (color.shift_hue, {'hue': 45, 'saturation': 20})]
+
+    for dtype in (np.uint8, np.uint16, np.float32):
+        source = frame(dtype)
+        for kernel, params in kernels:
+            result = scheduler.map(kernel, source, **params)
+            expected = kernel(source, **params)
+            assert result.dtype == expected.dtype
+            assert np.array_equal(result, expected), (kernel.__name__, dtype)
+    scheduler.shutdown()
+
+
+def test_pipeline_renders_the_same_on_any_thread_count():
+    source = frame()
+    serial = AdjustmentPipeline(source, StripScheduler(threads=1))
+    parallel = AdjustmentPipeline(source, StripScheduler(threads=3, strip_bytes=8192, min_pixels=0))
+    for pipeline in (serial, parallel):
+        pipeline.set('levels', brightness=-20, contrast=60)
+        pipeline.set('sepia', enabled=True)
+        pipeline.set('hue', hue=120)
+
+    assert np.array_equal(parallel.render(), serial.render())
+    assert parallel.proxy(50, 50).scheduler is parallel.scheduler
+
+
+def test_concurrent_maps_share_one_pool(monkeypatch):
+    created = []
+    executor = strips_module.ThreadPoolExecutor
+
+    def counted(*args, **kwargs):
+        # A slow start leaves every other thread time to find no pool and create its own
+        created.append(args)
+        time.sleep(0.05)
+        return executor(*args, **kwargs)
+
+    monkeypatch.setattr(strips_module, 'ThreadPoolExecutor', counted)
+    scheduler = StripScheduler(threads=2, strip_bytes=4096, min_pixels=0)
+    start = threading.Barrier(8)
+
+    def render():
+        start.wait()
+        scheduler.map(levels, frame(), brightness=10, contrast=0)
+
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.shutdown()
+
+    assert len(created) == 1
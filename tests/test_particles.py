@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+
+from models.particles import measure_particles, otsu_threshold
+
+
+def test_measures_two_squares():
+    image_array = np.zeros((50, 60), np.uint8)
+    image_array[5:15, 10:20] = 200   # 10 x 10
+    image_array[30:34, 40:46] = 200  # 4 x 6
+
+    table = measure_particles(image_array)
+
+    assert len(table) == 2
+    assert list(table['area']) == [100, 24]
+    assert list(table['perimeter']) == [40 * math.pi / 4, 20 * math.pi / 4]
+    assert table['equivalent_diameter'][0] == math.sqrt(400 / math.pi)
+    assert (table['centroid_x'][0], table['centroid_y'][0]) == (14.5, 9.5)
+    assert (table['left'][1], table['top'][1], table['width'][1], table['height'][1]) == (40, 30, 6, 4)
+
+
+def test_dark_particles_min_area_and_bgra_input():
+    image_array = np.full((20, 20, 4), 255, np.uint8)
+    image_array[2:4, 2:4, :3] = 0
+    image_array[10, 10, :3] = 0
+
+    table = measure_particles(image_array, dark=True, min_area=2)
+
+    assert list(table['area']) == [4]
+    assert len(table.select(table['area'] > 10)) == 0
+
+
+def test_otsu_threshold_on_16_bit_data():
+    gray = np.zeros((10, 10), np.uint16)
+    gray[:, 5:] = 40000
+
+    threshold = otsu_threshold(gray)
+
+    assert 0 < threshold < 40000
+
+
+def test_many_particles_are_all_measured():
+    image_array = np.zeros((2000, 2000), np.uint8)
+    image_array[::4, ::4] = 255  # 250k isolated single-pixel particles
+
+    table = measure_particles(image_array, threshold=128)
+
+    assert len(table) == 250_000
+    assert (table['area'] == 1).all()
@@ -0,0 +1,77 @@
+import numpy as np
+
+from models.geometry import Dihedral
+from models.pipeline import AdjustmentPipeline
+
+
+def make_source():
+    source = np.random.default_rng(0).integers(0, 256, (8, 6, 4), dtype=np.uint8)
+    source[..., 3] = 255
+    return source
+
+
+def test_identity_pipeline_returns_the_source():
+    source = make_source()
+    assert AdjustmentPipeline(source).render() is source
+
+
+def test_brightness_and_contrast_combine():
+    source = make_source()
+    pipeline = AdjustmentPipeline(source)
+
+    pipeline.set('levels', brightness=10)
+    pipeline.set('levels', contrast=50)
+    result = pipeline.render()
+
+    expected = np.clip(source[..., :3] * 1.5 + 10, 0, 255).round()
+    assert (result[..., :3] == expected).all()
+    assert (result[..., 3] == 255).all()
+
+
+def counting(name, function, calls):
+    def wrapper(image_array, **params):
+        calls.append(name)
+        return function(image_array, **params)
+    return wrapper
+
+
+def test_late_stage_change_reuses_earlier_outputs():
+    pipeline = AdjustmentPipeline(make_source())
+    pipeline.set('levels', brightness=20)
+    pipeline.set('sepia', enabled=True)
+    first = pipeline.render()
+
+    calls = []
+    for stage in pipeline.stages:
+        stage.function = counting(stage.name, stage.function, calls)
+
+    pipeline.set('geometry', orientation=Dihedral(1))
+    rotated = pipeline.render()
+
+    assert calls == ['geometry']
+    assert (rotated == np.rot90(first, -1)).all()
+
+
+def test_reset_restores_source():
+    source = make_source()
+    pipeline = AdjustmentPipeline(source)
+    pipeline.set('grayscale', enabled=True)
+    pipeline.set('geometry', orientation=Dihedral().flipped((-1, 1)))
+    gray = pipeline.render()
+
+    assert (gray[..., 0] == gray[..., 2]).all()
+    pipeline.reset()
+    assert pipeline.render() is source
+
+
+def test_proxy_is_cached_and_renders_with_given_params():
+    source = np.full((40, 80, 4), 100, dtype=np.uint8)
+    pipeline = AdjustmentPipeline(source)
+
+    proxy = pipeline.proxy(20, 20)
+    pipeline.set('levels', brightness=50)
+
+    assert proxy is pipeline.proxy(20, 20)
+    assert proxy.source.shape == (10, 20, 4)
+    assert (proxy.render(pipeline.params)[..., :3] == 150).all()
+    assert pipeline.proxy(100, 100).source is source
@@ -0,0 +1,84 @@
+import json
+import pstats
+
+import numpy as np
+
+from controllers.profiler import Profiler
+from views.profiler import ProfilerDock
+
+
+def allocate(size: int) -> int:
+    return np.ones(size, np.uint8).nbytes
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    wrapped = profiler.instrument(allocate, frame=lambda size: (size, 1))
+
+    assert wrapped(10) == 10
+    assert wrapped.__name__ == 'allocate'
+    assert profiler.count == 0 and not profiler.spans
+
+
+def test_spans_record_name_frame_and_allocations():
+    profiler = Profiler()
+    wrapped = profiler.instrument(allocate, name='allocate', frame=lambda size: (size, 1))
+    profiler.enable(allocations=True)
+    try:
+        wrapped(4_000_000)
+    finally:
+        profiler.disable()
+
+    span, = profiler.spans
+    assert span.name == 'allocate'
+    assert span.frame == (4_000_000, 1)
+    assert span.seconds > 0
+    assert span.allocated >= 4_000_000
+
+
+def test_ring_buffer_keeps_the_latest_spans():
+    profiler = Profiler(capacity=4)
+    profiler.enable()
+    for index in range(10):
+        with profiler.span(f"step {index}"):
+            pass
+    profiler.set_capacity(2)
+
+    assert profiler.count == 10
+    assert [span.name for span in profiler.spans] == ['step 8', 'step 9']
+
+
+def test_trace_and_profile_files(tmp_path):
+    profiler = Profiler()
+    profiler.enable()
+    profiler.start_profile()
+    with profiler.span('outer', (3, 2)):
+        with profiler.span('inner'):
+            allocate(100)
+    profiler.stop_profile(str(tmp_path / 'run.prof'))
+
+    profiler.write_trace(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as trace_file:
+        events = json.load(trace_file)['traceEvents']
+
+    assert [event['name'] for event in events] == ['inner', 'outer']
+    assert events[1]['args']['frame'] == [3, 2]
+    assert pstats.Stats(str(tmp_path / 'run.prof')).total_calls > 0
+
+
+def test_dock_switches_recording_and_lists_spans(qapp):
+    profiler = Profiler()
+    dock = ProfilerDock(profiler)
+
+    dock.record.setChecked(True)
+    with profiler.span('render', (640, 480)):
+        pass
+    dock.refresh()
+
+    assert profiler.enabled
+    assert dock.table.rowCount() == 1
+    assert dock.table.item(0, 0).text() == 'render'
+    assert dock.table.item(0, 3).text() == '640×480'
+
+    dock.record.setChecked(False)
+    assert not profiler.enabled
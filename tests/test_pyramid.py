@@ -0,0 +1,44 @@
+import numpy as np
+
+from models.pyramid import Pyramid
+
+
+def test_levels_are_built_lazily_by_halving():
+    pyramid = Pyramid(np.zeros((1000, 600, 4), np.uint8), tile_size=256)
+
+    assert len(pyramid.levels) == 1
+    assert pyramid.depth == 3
+    assert pyramid.level(2).shape == (250, 150, 4)
+    assert len(pyramid.levels) == 3
+
+
+def test_level_for_zoom_accounts_for_proxy_scale():
+    pyramid = Pyramid(np.zeros((4096, 4096), np.uint8), tile_size=256)
+
+    assert pyramid.level_for(2.0) == 0
+    assert pyramid.level_for(0.5) == 1
+    assert pyramid.level_for(0.3) == 1
+    assert pyramid.level_for(0.001) == pyramid.depth - 1
+    assert Pyramid(np.zeros((1024, 1024), np.uint8), scale=0.25).level_for(0.25) == 0
+
+
+def test_only_intersecting_tiles_are_selected():
+    base = np.arange(600 * 500, dtype=np.uint32).reshape(600, 500)
+    pyramid = Pyramid(base, tile_size=256)
+
+    rows, cols = pyramid.tile_range(0, 300, 10, 400, 270)
+
+    assert list(rows) == [0, 1]
+    assert list(cols) == [1]
+    assert pyramid.tile(0, 2, 1).shape == (88, 244)
+    assert np.shares_memory(pyramid.tile(0, 2, 1), base)
+
+
+def test_unbuilt_levels_are_painted_from_the_nearest_ready_one(tmp_path):
+    pyramid = Pyramid(np.zeros((1000, 600, 4), np.uint8), tile_size=256)
+
+    assert pyramid.ready(2) == 0 and len(pyramid.levels) == 1
+    assert pyramid.build() is pyramid
+    assert pyramid.ready(2) == 2
+    mapped = np.memmap(tmp_path / 'base', np.uint8, 'w+', shape=(1000, 600))
+    assert Pyramid(mapped, tile_size=256).ready(2) == 2
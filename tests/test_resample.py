@@ -0,0 +1,37 @@
+import itertools
+
+import cv2
+import numpy as np
+
+from models import resample
+from models.geometry import Dihedral
+
+
+def test_crop_is_a_clipped_view():
+    image_array = np.zeros((10, 20, 4), np.uint8)
+
+    cropped = resample.crop(image_array, (15, -2, 10, 5))
+
+    assert cropped.shape == (3, 5, 4)
+    assert np.shares_memory(cropped, image_array)
+
+
+def test_interpolation_follows_the_direction_of_the_resize():
+    shape = (100, 200, 4)
+
+    assert resample.interpolation_for(shape, (100, 50)) == cv2.INTER_AREA
+    assert resample.interpolation_for(shape, (400, 200)) == cv2.INTER_CUBIC
+    assert resample.resize(np.zeros(shape, np.uint8), scale=0.25).shape == (25, 50, 4)
+
+
+def test_unmap_rect_finds_the_source_of_a_transformed_selection():
+    source = np.arange(6 * 10).reshape(6, 10)
+    steps = [('rotate', 90), ('rotate', -90), ('rotate', 180), ('flip', (-1, 1)), ('flip', (1, -1))]
+
+    for transforms in itertools.product(steps, repeat=3):
+        orientation = Dihedral()
+        for name, value in transforms:
+            orientation = orientation.rotated(value) if name == 'rotate' else orientation.flipped(value)
+        x, y, width, height = orientation.unmap_rect((1, 2, 3, 2), source.shape)
+        selected = orientation.view(source)[2:4, 1:4]
+        assert sorted(selected.ravel()) == sorted(source[y:y + height, x:x + width].ravel())
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from models.particles import measure_particles
+from models.roi import RegionStatistics
+
+
+@pytest.mark.parametrize('rect', [(0, 0, 100, 80), (3, 5, 1, 1), (7, 9, 50, 33), (17, 0, 10, 80), (90, 70, 40, 40)])
+def test_matches_direct_statistics(rect):
+    rng = np.random.default_rng(0)
+    image_array = rng.integers(0, 256, (80, 100), dtype=np.uint8)
+    statistics = RegionStatistics(image_array, block=8)
+
+    left, top, width, height = rect
+    region = image_array[top:top + height, left:left + width]
+    summary = statistics.summary(*rect)
+
+    assert (summary.width, summary.height) == (region.shape[1], region.shape[0])
+    assert summary.mean == pytest.approx(region.mean())
+    assert summary.std == pytest.approx(region.std())
+    assert (summary.minimum, summary.maximum) == (region.min(), region.max())
+    assert np.array_equal(summary.histogram, np.bincount(region.ravel(), minlength=256))
+
+
+def test_counts_particles_by_centroid():
+    image_array = np.zeros((40, 40), np.uint8)
+    image_array[2:6, 2:6] = 255
+    image_array[30:34, 30:34] = 255
+    statistics = RegionStatistics(image_array)
+    statistics.set_particles(measure_particles(image_array))
+
+    assert statistics.summary(0, 0, 20, 20).particles == 1
+    assert statistics.summary(0, 0, 40, 40).particles == 2
+
+
+def test_large_images_are_analysed_downscaled():
+    image_array = np.full((400, 500, 4), 100, np.uint8)
+    statistics = RegionStatistics(image_array, max_pixels=20_000)
+
+    summary = statistics.summary(0, 0, 500, 400)
+
+    assert statistics.sum.size < 25_000
+    assert summary.mean == pytest.approx(100)
+    assert abs(summary.width - 500) <= 2
@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+from PyQt5.QtWidgets import QFileDialog, QMainWindow
+
+import views.image
+from models.lazy import cv2
+from models.session import FrameCache, Session, decode_frame, list_images
+from views.image import Image
+
+
+def write_frames(folder, count: int, size: int = 64) -> list[str]:
+    paths = []
+    for index in range(count):
+        path = str(folder / f"frame_{index}.png")
+        cv2.imwrite(path, np.full((size, size, 3), index, np.uint8))
+        paths.append(path)
+    return paths
+
+
+def settle(qapp, label) -> None:
+    # Callbacks submit further jobs, such as the prefetches of a shown frame
+    while True:
+        label.worker.wait()
+        qapp.processEvents()
+        if not label.worker.pool.activeThreadCount():
+            return
+
+
+def test_folders_list_images_in_natural_order(tmp_path):
+    for name in ('frame_10.png', 'frame_2.png', 'frame_1.tif', 'notes.txt', 'frame.raw.json'):
+        (tmp_path / name).write_bytes(b'')
+
+    names = [path[len(str(tmp_path)) + 1:] for path in list_images(str(tmp_path))]
+
+    assert names == ['frame_1.tif', 'frame_2.png', 'frame_10.png']
+
+
+def test_decoded_frames_carry_their_whole_pyramid(tmp_path):
+    path, = write_frames(tmp_path, 1, size=1000)
+
+    frame = decode_frame(path, tile_size=256)
+
+    assert len(frame.pyramid.levels) == frame.pyramid.depth == 3
+    assert frame.pyramid.levels[0] is frame.source
+    assert frame.nbytes == sum(level.nbytes for level in frame.pyramid.levels)
+
+
+def test_memory_mapped_frames_cost_no_budget(tmp_path):
+    path = str(tmp_path / 'stack.npy')
+    np.save(path, np.zeros((600, 600), np.uint16))
+
+    assert decode_frame(path).nbytes == 0
+
+
+def test_cache_evicts_least_recently_used_frames_over_budget(tmp_path):
+    frames = [decode_frame(path) for path in write_frames(tmp_path, 4)]
+    cache = FrameCache(budget=frames[0].nbytes * 3)
+
+    for frame in frames[:3]:
+        cache.put(frame)
+    cache.get(frames[0].path)
+    cache.put(frames[3])
+
+    assert len(cache) == 3
+    assert frames[1].path not in cache
+    assert frames[0].path in cache and frames[3].path in cache
+    assert cache.nbytes == frames[0].nbytes * 3
+    assert not FrameCache(budget=1).put(frames[0])
+
+
+def test_session_steps_and_prefetches_nearest_first():
+    session = Session([f"{index}.png" for index in range(6)], budget=0, prefetch=2, index=1)
+
+    assert session.neighbours() == ['2.png', '0.png', '3.png']
+    assert session.move(-5) and session.index == 0
+    assert not session.move(-1)
+    assert session.move(10) and session.path == '5.png'
+    assert session.neighbours() == ['4.png', '3.png']
+
+
+def test_stepping_shows_prefetched_frames(qapp, tmp_path):
+    paths = write_frames(tmp_path, 3)
+    label = Image(QMainWindow())
+    positions = []
+    label.frame_changed.connect(lambda index, count, path: positions.append((index, count)))
+
+    label.open_session(paths)
+    settle(qapp, label)
+    assert all(path in label.session.cache for path in paths)
+
+    label.next_image()
+    settle(qapp, label)
+
+    assert positions == [(0, 3), (1, 3)]
+    assert label.original[0, 0, 0] == 1
+
+
+def test_stepping_onto_a_frame_being_prefetched_decodes_it_once(qapp, tmp_path, monkeypatch):
+    paths = write_frames(tmp_path, 3)
+    decoded = []
+
+    def slow_decode(path, *args):
+        decoded.append(path)
+        time.sleep(0.05)
+        return decode_frame(path, *args)
+
+    monkeypatch.setattr(views.image, 'decode_frame', slow_decode)
+    label = Image(QMainWindow())
+    label.open_session(paths)
+    label.worker.wait()
+    qapp.processEvents()
+    assert label.worker.is_busy(('prefetch', paths[1]))
+
+    label.next_image()
+    settle(qapp, label)
+
+    assert decoded.count(paths[1]) == 1
+    assert label.original[0, 0, 0] == 1
+
+
+def test_a_file_the_folder_listing_leaves_out_opens_on_its_own(qapp, tmp_path, monkeypatch):
+    paths = write_frames(tmp_path, 2)
+    chosen = str(tmp_path / 'chosen.webp')
+    cv2.imwrite(chosen, np.full((64, 64, 3), 9, np.uint8))
+    monkeypatch.setattr(QFileDialog, 'getOpenFileNames', lambda *args, **kwargs: ([chosen], ''))
+    label = Image(QMainWindow())
+
+    label.open_image()
+    settle(qapp, label)
+
+    assert label.session.paths == [chosen] and paths[0] not in label.session.paths
+    assert label.original[0, 0, 0] == 9
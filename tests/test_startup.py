@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from measurer.settings import SETTINGS_PATH, load_settings
+from views.icons import icon
+
+ROOT = os.path.dirname(SETTINGS_PATH)
+
+
+def test_settings_resolve_relative_to_the_package(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    settings = load_settings()
+
+    assert settings is load_settings()
+    assert os.path.isdir(settings['ICON_PATH'])
+
+
+def test_gui_import_defers_opencv(tmp_path):
+    code = "import sys, measurer.gui; print('cv2' in sys.modules)"
+    env = {**os.environ, 'PYTHONPATH': ROOT, 'QT_QPA_PLATFORM': 'offscreen'}
+
+    output = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                            check=True, capture_output=True, text=True).stdout
+
+    assert output.strip() == 'False'
+
+
+def test_icons_are_read_on_first_paint(qapp):
+    lazy = icon('open.png')
+
+    assert not lazy.isNull()
+    assert lazy is icon('open.png')
+    assert not lazy.pixmap(16, 16).isNull()
+    assert icon('missing.png').isNull()
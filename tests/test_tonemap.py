@@ -0,0 +1,87 @@
+import numpy as np
+from PyQt5.QtWidgets import QMainWindow
+
+from models import loader
+from models.color import shift_hue
+from models.loader import to_working
+from models.pipeline import AdjustmentPipeline
+from models.tonemap import ToneMap
+from views.image import Image, display_image
+
+
+def test_pipeline_keeps_16_bit_depth():
+    source = np.full((8, 8), 1000, np.uint16)
+    pipeline = AdjustmentPipeline(source)
+    pipeline.set('levels', brightness=1, contrast=100)
+    pipeline.set('grayscale', enabled=True)
+
+    rendered = pipeline.render()
+
+    assert rendered.dtype == np.uint16 and rendered.shape == (8, 8, 4)
+    assert (rendered[..., :3] == 2000 + 257).all()
+    assert (rendered[..., 3] == 65535).all()
+
+
+def test_float_data_is_clipped_to_unit_range():
+    pipeline = AdjustmentPipeline(np.full((4, 4, 3), 0.75, np.float32))
+    pipeline.set('levels', contrast=100)
+    pipeline.set('sepia', enabled=True)
+
+    rendered = pipeline.render()
+
+    assert rendered.dtype == np.float32
+    assert rendered.max() <= 1.0
+
+
+def test_hue_shift_at_depth_round_trips():
+    image_array = to_working(np.random.default_rng(0).integers(0, 65536, (6, 6, 3), dtype=np.uint16))
+
+    shifted = shift_hue(shift_hue(image_array, 120), 240)
+
+    assert shifted.dtype == np.uint16
+    assert np.abs(shifted.astype(int) - image_array).max() <= 2
+
+
+def test_tone_map_stretches_the_fitted_window():
+    image_array = to_working(np.linspace(0, 4095, 64 * 64).astype(np.uint16).reshape(64, 64))
+    tone_map = ToneMap()
+    tone_map.fit(image_array, clip=0)
+
+    display = tone_map(image_array)
+
+    assert display.dtype == np.uint8
+    assert display[..., :3].min() == 0 and display[..., :3].max() == 255
+    assert (display[..., 3] == 255).all()
+    assert tone_map.lut is tone_map.lut
+
+
+def test_float_frames_outside_unit_range_are_normalised(qapp, tmp_path):
+    frame = np.linspace(0, 1000, 32 * 32, dtype=np.float32).reshape(32, 32)
+    np.save(tmp_path / 'frame.npy', frame)
+
+    assert np.allclose(loader.open_array(str(tmp_path / 'frame.npy')), frame / 1000)
+    in_range = np.load(tmp_path / 'frame.npy', mmap_mode='r') / np.float32(1000)
+    assert loader.normalise_float(in_range) is in_range
+
+    label = Image(QMainWindow())
+    label.set_original(frame)
+    image = display_image(label.pipeline.render(), label.tone_map)
+    display = image.as_array
+    assert display[..., :3].min() == 0 and display[..., :3].max() == 255
+
+    # A levels edit works on the normalised values instead of clipping them to 0..1
+    label.pipeline.set('levels', brightness=10)
+    rendered = label.pipeline.render()
+    assert len(np.unique(rendered[..., 0])) > 1000 - 32
+
+
+def test_unedited_deep_frames_display_as_edited_ones(qapp):
+    frame = np.linspace(0, 4095, 64 * 64).astype(np.uint16).reshape(64, 64)
+    tone_map = ToneMap()
+    tone_map.fit(frame)
+
+    unedited_image, edited_image = display_image(frame, tone_map), display_image(to_working(frame), tone_map)
+    unedited, edited = unedited_image.as_array, edited_image.as_array
+
+    assert np.array_equal(unedited, edited)
+    assert unedited[..., :3].max() == 255
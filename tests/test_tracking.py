@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from PyQt5.QtWidgets import QMainWindow
+
+from models import tracking
+from models.lazy import cv2
+from models.particles import ParticleTable
+from models.tracking import SpatialGrid, Tracker, link
+from views.image import Image
+
+
+def table(points, area=9) -> ParticleTable:
+    points = np.asarray(points, np.float64).reshape(-1, 2)
+    count = len(points)
+    integers = np.zeros(count, np.int32)
+    return ParticleTable(label=np.arange(1, count + 1), area=np.full(count, area), perimeter=np.zeros(count),
+                         equivalent_diameter=np.zeros(count), centroid_x=points[:, 0], centroid_y=points[:, 1],
+                         left=integers, top=integers, width=integers, height=integers)
+
+
+def test_grid_finds_the_same_pairs_as_brute_force():
+    rng = np.random.default_rng(2)
+    points, queries = rng.uniform(-50, 200, (300, 2)), rng.uniform(-50, 200, (200, 2))
+
+    query, point, distance = SpatialGrid(points[:, 0], points[:, 1], 12).pairs(queries[:, 0], queries[:, 1], 12)
+
+    all_distances = np.hypot(*(queries[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    expected = set(zip(*np.nonzero(all_distances <= 12)))
+    assert set(zip(query, point)) == expected
+    assert np.allclose(distance, all_distances[query, point])
+
+
+def test_link_prefers_the_nearest_pairs():
+    previous, current = link(np.array([0.0, 10.0]), np.zeros(2), np.array([9.0, 1.0, 50.0]), np.zeros(3), 5)
+
+    assert sorted(zip(previous, current)) == [(0, 1), (1, 0)]
+    assert [len(array) for array in link(np.zeros(0), np.zeros(0), np.ones(2), np.ones(2), 5)] == [0, 0]
+
+
+def test_tracks_survive_gaps_within_memory():
+    tracker = Tracker(max_displacement=3, memory=1)
+
+    first = tracker.update(0, table([(0, 0), (20, 20)]))
+    second = tracker.update(1, table([(1, 0)]))
+    third = tracker.update(2, table([(2, 0), (21, 21)]))
+    fourth = tracker.update(5, table([(22, 22)]))
+
+    assert list(first) == [0, 1]
+    assert list(second) == [0]
+    assert list(third) == [0, 1]
+    assert list(fourth) == [2]
+    with pytest.raises(ValueError):
+        Tracker(0)
+
+
+def test_trajectories_summarize_motion():
+    stream = tracking.track(enumerate([table([(0, 0), (50, 50)]), table([(3, 4), (50, 50)]),
+                                       table([(6, 8)], area=11)]), max_displacement=6)
+
+    result = tracking.trajectories(stream)
+
+    assert list(result['track']) == [0, 1]
+    assert list(result['lifetime']) == [3, 2]
+    assert list(result['displacement']) == [10, 0]
+    assert list(result['path_length']) == [10, 0]
+    assert (result['velocity_x'][0], result['velocity_y'][0], result['speed'][0]) == (3, 4, 5)
+    assert result['mean_area'][0] == pytest.approx(29 / 3)
+    assert len(tracking.trajectories(iter([]))) == 0
+
+
+def test_frames_stream_from_disk(tmp_path):
+    paths = []
+    for index in range(4):
+        frame = np.zeros((40, 60), np.uint8)
+        frame[10:14, 5 + 5 * index:9 + 5 * index] = 255
+        paths.append(str(tmp_path / f"{index}.png"))
+        cv2.imwrite(paths[-1], frame)
+
+    frames = tracking.frames(paths)
+    assert next(frames)[0] == 0
+
+    result = tracking.trajectories(tracking.track(tracking.detections(tracking.frames(paths)), 8))
+    assert len(result) == 1 and result['lifetime'][0] == 4
+    assert result['velocity_x'][0] == pytest.approx(5)
+
+
+def test_image_tracks_the_open_session(qapp, tmp_path, monkeypatch):
+    paths = []
+    for index in range(3):
+        frame = np.zeros((30, 30), np.uint8)
+        frame[5 + 2 * index:9 + 2 * index, 5:9] = 255
+        paths.append(str(tmp_path / f"{index}.png"))
+        cv2.imwrite(paths[-1], frame)
+    label = Image(QMainWindow())
+    results = []
+    label.tracked.connect(results.append)
+
+    # The view streams frames through the same stages as the tested pipeline
+    opened = []
+    frames = tracking.frames
+
+    def counted(paths):
+        for index, image_array in frames(paths):
+            opened.append(index)
+            yield index, image_array
+
+    monkeypatch.setattr(tracking, 'frames', counted)
+
+    label.open_session(paths)
+    label.track_particles()
+    while True:
+        label.worker.wait()
+        qapp.processEvents()
+        if not label.worker.pool.activeThreadCount():
+            break
+
+    assert len(results) == 1 and list(results[0]['velocity_y']) == [2]
+    assert opened == [0, 1, 2]
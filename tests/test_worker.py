@@ -0,0 +1,81 @@
+import threading
+import weakref
+
+from controllers.worker import ImageWorker
+
+
+def drain(qapp, worker):
+    worker.wait()
+    qapp.processEvents()
+
+
+class Owner:
+    def receive(self, result) -> None:
+        raise AssertionError("cancelled jobs must not deliver results")
+
+
+def test_only_latest_result_is_delivered(qapp):
+    worker = ImageWorker()
+    release = threading.Event()
+    started = []
+    delivered = []
+
+    def job(value):
+        started.append(value)
+        if value == 0:
+            release.wait(5)
+        return value
+
+    for value in range(5):
+        worker.submit('render', job, value, callback=delivered.append)
+
+    release.set()
+    while worker.is_busy('render'):
+        drain(qapp, worker)
+
+    assert started == [0, 4]
+    assert delivered == [4]
+
+
+def test_cancel_discards_running_job(qapp):
+    worker = ImageWorker()
+    delivered = []
+
+    worker.submit('source', sum, (1, 2), callback=delivered.append)
+    worker.cancel('source')
+    drain(qapp, worker)
+
+    assert delivered == []
+    assert not worker.is_busy('source')
+
+
+def test_finished_jobs_release_their_callbacks(qapp):
+    worker = ImageWorker()
+    release = threading.Event()
+    owner = Owner()
+    owned = weakref.ref(owner)
+
+    worker.submit(('prefetch', 'a'), release.wait, 5, callback=owner.receive)
+    worker.submit(('prefetch', 'b'), sum, (1, 2), callback=owner.receive)
+    worker.submit('render', sum, (1, 2))
+    worker.cancel_all('prefetch')
+    del owner
+    release.set()
+    drain(qapp, worker)
+
+    assert owned() is None
+    assert not worker.is_busy(('prefetch', 'a'))
+
+
+def test_idle_only_once_chained_jobs_are_delivered(qapp):
+    worker = ImageWorker()
+    delivered = []
+
+    worker.submit('render', sum, (1, 2), callback=lambda result: worker.submit(
+        'pyramid', sum, (result, 1), callback=delivered.append))
+    worker.wait()
+    assert not worker.is_idle()
+    while not worker.is_idle():
+        drain(qapp, worker)
+
+    assert delivered == [4]
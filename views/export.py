@@ -0,0 +1,55 @@
+from PyQt5.QtWidgets import QDialog, QFormLayout, QSpinBox, QComboBox, QCheckBox, QDialogButtonBox, QWidget
+
+from models.export import TABLE_EXTENSIONS, TIFF_COMPRESSIONS, ExportOptions
+
+
+class ExportDialog(QDialog):
+    """
+    Compression settings for the chosen format, and whether to write the
+    particle measurements alongside the image.
+    """
+
+    def __init__(self, extension: str, options: ExportOptions, has_table: bool, parent: QWidget = None):
+        super().__init__(parent)
+        self.setWindowTitle("Export")
+        extension = extension.lower()
+
+        self.png_level = QSpinBox()
+        self.png_level.setRange(0, 9)
+        self.png_level.setValue(options.png_level)
+        self.jpeg_quality = QSpinBox()
+        self.jpeg_quality.setRange(0, 100)
+        self.jpeg_quality.setValue(options.jpeg_quality)
+        self.tiff_compression = QComboBox()
+        self.tiff_compression.addItems(list(TIFF_COMPRESSIONS))
+        self.tiff_compression.setCurrentText(options.tiff_compression)
+
+        self.table = QCheckBox("Export particle measurements")
+        self.table.setChecked(has_table)
+        self.table.setEnabled(has_table)
+        self.table_format = QComboBox()
+        self.table_format.addItems(list(TABLE_EXTENSIONS))
+        self.table_format.setEnabled(has_table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        form = QFormLayout()
+        if extension == '.png':
+            form.addRow("PNG compression level:", self.png_level)
+        elif extension in ('.jpg', '.jpeg'):
+            form.addRow("JPEG quality:", self.jpeg_quality)
+        elif extension in ('.tif', '.tiff'):
+            form.addRow("TIFF compression:", self.tiff_compression)
+        form.addRow(self.table)
+        form.addRow("Measurements format:", self.table_format)
+        form.addRow(buttons)
+        self.setLayout(form)
+
+    def options(self) -> ExportOptions:
+        return ExportOptions(self.png_level.value(), self.jpeg_quality.value(), self.tiff_compression.currentText())
+
+    def table_extension(self):
+        """Extension to write the measurements with, or None to skip them."""
+        return self.table_format.currentText() if self.table.isChecked() else None
@@ -0,0 +1,48 @@
+import numpy as np
+
+from PyQt5.QtCore import Qt, QPointF, QSize
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPaintEvent
+from PyQt5.QtWidgets import QWidget
+
+# Blue, green and red, in the order of channel_histograms
+CHANNEL_COLORS = (QColor(60, 110, 255, 110), QColor(60, 200, 60, 110), QColor(255, 60, 60, 110))
+
+
+class HistogramPanel(QWidget):
+    """Overlaid blue, green and red histograms of the displayed image."""
+
+    def __init__(self, parent: QWidget = None):
+        super().__init__(parent)
+        self.histograms = None
+        self.setMinimumHeight(80)
+
+    def sizeHint(self) -> QSize:
+        return QSize(200, 100)
+
+    def set_histograms(self, histograms: np.ndarray) -> None:
+        self.histograms = histograms
+        self.update()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().dark())
+        if self.histograms is None or not self.histograms.any():
+            painter.end()
+            return
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        width, height = self.width(), self.height()
+
+        # Scale to a high quantile so one saturated bin does not flatten the rest
+        peak = max(np.percentile(self.histograms, 99.5), 1)
+        heights = np.minimum(self.histograms / peak, 1.0) * height
+        xs = np.linspace(0, width, self.histograms.shape[1])
+
+        for color, column in zip(CHANNEL_COLORS, heights):
+            path = QPainterPath(QPointF(0, height))
+            for x, y in zip(xs, height - column):
+                path.lineTo(x, y)
+            path.lineTo(width, height)
+            painter.fillPath(path, color)
+        painter.end()
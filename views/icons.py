@@ -0,0 +1,42 @@
+import os
+from functools import lru_cache
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon, QIconEngine
+
+from measurer.settings import settings
+
+
+class LazyIconEngine(QIconEngine):
+    """Icon engine that reads its image file only when the icon is first drawn."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.__icon = None
+
+    @property
+    def icon(self) -> QIcon:
+        if self.__icon is None:
+            self.__icon = QIcon(self.path)
+        return self.__icon
+
+    def paint(self, painter, rect, mode, state):
+        self.icon.paint(painter, rect, Qt.AlignCenter, mode, state)
+
+    def pixmap(self, size, mode, state):
+        return self.icon.pixmap(size, mode, state)
+
+    def actualSize(self, size, mode, state):
+        # Layout asks for sizes before anything is drawn; answering without the file keeps it unread
+        return size if self.__icon is None else self.icon.actualSize(size, mode, state)
+
+    def clone(self):
+        return LazyIconEngine(self.path)
+
+
+@lru_cache(maxsize=None)
+def icon(filename: str) -> QIcon:
+    """Icon from the icon directory, shared between actions and loaded on first paint."""
+    path = os.path.join(settings['ICON_PATH'], filename)
+    return QIcon(LazyIconEngine(path)) if os.path.isfile(path) else QIcon()
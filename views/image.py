@@ -1,25 +1,131 @@
-import cv2
-import numpy as np
+import math
+import os
+import time
+from functools import partial
 
-from PyQt5.QtCore import Qt, QSize, QRect
-from PyQt5.QtGui import QPixmap, QImage, QColor, QTransform, qRgb
-from PyQt5.QtWidgets import QLabel, QMessageBox, QFileDialog, QSizePolicy, QRubberBand, QMainWindow
+import numpy as np
 
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QPoint, QSize, QRect, QRectF, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QGuiApplication, QPainter, QPaintEvent
+from PyQt5.QtWidgets import (QLabel, QMessageBox, QFileDialog, QSizePolicy, QRubberBand, QMainWindow,
+                             QInputDialog)
+
+from controllers.profiler import instrumented
+from controllers.worker import ImageWorker
+from measurer.settings import settings
+from models import export, parallel, particles, resample, tracking
+from models.calibration import Calibration, ViewTransform, parse_length, scale_bar_length
+from models.histogram import HistogramCache, auto_levels, channel_histograms, sample_step
+from models.history import History, Command, ParamCommand, SourceCommand, CompoundCommand, encode
+from models.loader import is_bgra, is_working, normalise_float, to_bgra, to_working
+from models.overlay import Overlay, mask_levels, particle_rows
+from models.pipeline import AdjustmentPipeline
+from models.pyramid import Pyramid
+from models.diskcache import DiskCache, default_directory
+from models.geometry import map_points, scaling, translation
+from models.roi import RegionStatistics
+from models.session import IMAGE_EXTENSIONS, Frame, Session, decode_frame, list_images
+from models.tonemap import ToneMap
+from views.export import ExportDialog
+from views.tiles import TileRenderer
+
+
+ARRAY_FORMATS = {
+    QImage.Format_Grayscale8: (np.uint8, 1),
+    QImage.Format_Grayscale16: (np.uint16, 1),
+    QImage.Format_BGR888: (np.uint8, 3),
+    QImage.Format_RGB32: (np.uint8, 4),
+    QImage.Format_ARGB32: (np.uint8, 4),
+}
+
+
+class _ImageBuffer:
+    """
+    Array interface over the pixels of a QImage. Arrays built on it hold it
+    as their base, and through it the image that owns the memory.
+    """
+
+    def __init__(self, image: QImage, shape: tuple, dtype: np.dtype, strides: tuple):
+        self.image = image
+        # constBits never detaches, so the address stays that of the buffer shared with other copies
+        self.__array_interface__ = {'version': 3, 'shape': shape, 'typestr': dtype.str, 'strides': strides,
+                                    'data': (int(image.constBits()), True)}
 
-# TODO: save all parameters state after each change
 
 class MainImage(QImage):
-    @property
-    def as_array(self):
-        image = self.convertToFormat(QImage.Format_RGB32)
+    """
+    QImage that exposes its pixel buffer to NumPy without copying.
+
+    Ownership rules:
+    - as_array borrows this image's memory. The view is read-only and keeps
+      the image it reads alive, so views of temporaries stay valid. Images
+      that are not RGB32/ARGB32 are converted once and the converted buffer
+      is kept on the instance.
+    - from_array borrows the array's memory and keeps a reference to it, so
+      the array lives as long as the image. Qt shallow copies such as
+      QImage(image) share the buffer but not that reference, so call copy()
+      before handing a borrowed image to code that outlives the array.
+    """
+    _array = None
+    _rgb32 = None
+
+    @classmethod
+    def from_array(cls, image_array: np.ndarray, image_format=None) -> "MainImage":
+        """Wrap a (height, width[, channels]) array as an image without copying it."""
+        if image_format is None:
+            image_format = cls.__format_for(image_array)
+
+        if not cls.__rows_are_packed(image_array):
+            image_array = np.ascontiguousarray(image_array)
+
+        # Address rather than buffer protocol, so row-packed views such as tiles need no copy either
+        data = sip.voidptr(image_array.ctypes.data)
+        image = cls(data, image_array.shape[1], image_array.shape[0], image_array.strides[0], image_format)
+        image._array = image_array
+        return image
+
+    @staticmethod
+    def __rows_are_packed(image_array: np.ndarray) -> bool:
+        """Whether every row is one contiguous run of pixels, as QImage expects."""
+        packed = (image_array.shape[2] * image_array.itemsize,) if image_array.ndim == 3 else ()
+        return image_array.strides[0] > 0 and image_array.strides[1:] == packed + (image_array.itemsize,)
+
+    @staticmethod
+    def __format_for(image_array: np.ndarray) -> QImage.Format:
+        channels = image_array.shape[2] if image_array.ndim == 3 else 1
+        for image_format, layout in ARRAY_FORMATS.items():
+            if layout == (image_array.dtype, channels):
+                return image_format
+        raise ValueError(f"No QImage format for {image_array.dtype} array with {channels} channels")
 
-        width = image.width()
-        height = image.height()
+    @property
+    def as_array(self) -> np.ndarray:
+        """Read-only BGRA view over the RGB32 pixels of the image."""
+        image = self
+        if self.format() not in (QImage.Format_RGB32, QImage.Format_ARGB32):
+            if self._rgb32 is None or self._rgb32[0] != self.cacheKey():
+                self._rgb32 = (self.cacheKey(), self.convertToFormat(QImage.Format_RGB32))
+            image = self._rgb32[1]
+
+        return self.buffer_view(image)
+
+    @staticmethod
+    def buffer_view(image: QImage) -> np.ndarray:
+        """
+        Read-only view over the buffer of an image in one of ARRAY_FORMATS,
+        honouring bytesPerLine. The view keeps the image alive.
+        """
+        dtype, channels = ARRAY_FORMATS[image.format()]
+        itemsize = np.dtype(dtype).itemsize
 
-        ptr = image.bits()
-        ptr.setsize(image.byteCount())
+        if channels == 1:
+            shape, strides = (image.height(), image.width()), (image.bytesPerLine(), itemsize)
+        else:
+            shape = (image.height(), image.width(), channels)
+            strides = (image.bytesPerLine(), channels * itemsize, itemsize)
 
-        return np.array(ptr).reshape((height, width, QImage.Format_RGB32))
+        return np.asarray(_ImageBuffer(image, shape, np.dtype(dtype), strides))
 
     def as_qimage(self):
         return self.copy()
@@ -28,200 +134,809 @@ class MainImage(QImage):
         raise NotImplemented()
 
 
+def display_image(image_array: np.ndarray, tone_map: ToneMap = None) -> MainImage:
+    """
+    MainImage over an array in any layout, converting to 8-bit BGRA only when
+    needed. Deep data of any layout goes through `tone_map` when one is
+    given, so an unedited frame looks the same as an edited one.
+    """
+    if is_bgra(image_array):
+        return MainImage.from_array(image_array)
+    if tone_map is not None and image_array.dtype != np.uint8:
+        return MainImage.from_array(tone_map(image_array if is_working(image_array) else to_working(image_array)))
+    return MainImage.from_array(to_bgra(image_array))
+
+
+def image_frame(image: "Image", *args, **kwargs) -> tuple[int, int]:
+    """Size of the image shown by an Image, as the frame of its instrumented operations."""
+    return image.image_size.width(), image.image_size.height()
+
+
 class Image(QLabel):
     """Subclass of QLabel for displaying image"""
-    image: MainImage
-    original_image: MainImage
-    qpixmap: QPixmap
+    original: np.ndarray
+    tiles: TileRenderer
+
+    # Render mode ('preview' or 'full') and milliseconds from request to pixmap
+    rendered = pyqtSignal(str, float)
+    history_changed = pyqtSignal()
+    measured = pyqtSignal(object)
+    # RegionSummary of the rubber-band selection, emitted on every drag step
+    region_measured = pyqtSignal(object)
+    # (3, 256) blue, green and red histograms of the displayed image, coarse first and then refined
+    histogram_changed = pyqtSignal(object)
+    # Index, number of frames and path of the session frame being shown
+    frame_changed = pyqtSignal(int, int, str)
+    # Paths written by a finished export
+    exported = pyqtSignal(list)
+    # TrajectoryTable of the particles tracked through the session
+    tracked = pyqtSignal(object)
+    # Pointer position in calibrated units, or pixels of the file, and the unit
+    pointer_moved = pyqtSignal(float, float, str)
+    # New Calibration of the image
+    calibration_changed = pyqtSignal(object)
 
     def __init__(self, parent: QMainWindow):
         super().__init__(parent)
 
         self.parent = parent
 
-        self.image = MainImage()
+        # Source as opened: memory-mapped files stay on disk instead of being copied into RAM
+        self.original = np.zeros((0, 0, 4), np.uint8)
+
+        self.pipeline = AdjustmentPipeline(self.original)
+
+        self.history = History(settings['HISTORY_MEMORY_BUDGET_MB'] * 2 ** 20)
 
-        self.original_image = self.image
+        self.__rendered = self.original
+        # Source and parameters the full render came from
+        self.__rendered_from = (self.original, self.pipeline.params)
+        self.__image = None
+
+        self.particles = None
+        # Source and geometry of the render the particles were measured on, their mask at every pyramid level
+        # and their outlines over the full render
+        self.__particles_from = None
+        self.__particle_masks = None
+        self.overlay = None
+        self.histograms = HistogramCache()
+
+        # Files being stepped through, the file the original came from and the pyramid that came with it
+        self.session = None
+        self.path = None
+        self.__pyramid = None
+        self.__disk_cache = None
+
+        self.worker = ImageWorker(self)
+
+        # Set while a slider is dragged: renders go to a viewport-sized proxy instead of the full frame
+        self.preview = None
+        self.__preview_pending = False
+        # Number of the slider drag under way, which merges its values into one history step
+        self.__drags = 0
+        self.__drag = None
+        self.__frame_timer = QTimer(self)
+        self.__frame_timer.setSingleShot(True)
+        self.__frame_timer.timeout.connect(self.__next_preview_frame)
 
         self.rubber_band = QRubberBand(QRubberBand.Rectangle, self)
+        self.origin = None
+        # Selection in pixels of the rendered image, and the summed-area tables of that render
+        self.selection = QRect()
+        self.region_statistics = None
+
+        # Pixel size of the file, and the transforms from widget to file pixels and physical units
+        self.calibration = None
+        self.view = ViewTransform()
+        # Where the scale bar was last drawn, in widget coordinates
+        self.__scale_bar = None
+        # Set while the next drag is a reference line of known length
+        self.__calibrating = False
 
         self.__init_settings()
 
     def __init_settings(self):
         self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
-        self.setScaledContents(True)
-        self.qpixmap = QPixmap()
-        self.setPixmap(self.qpixmap.fromImage(self.image))
         self.setAlignment(Qt.AlignCenter)
-
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setMouseTracking(True)
+        self.zoom = 1.0
+        self.image_size = QSize()
+        self.tone_map = ToneMap()
+        self.tiles = TileRenderer(partial(display_image, tone_map=self.tone_map))
+        self.overlay_tiles = TileRenderer(partial(MainImage.from_array,
+                                                  image_format=QImage.Format_ARGB32_Premultiplied))
+        parallel.scheduler.set_threads(settings['THREADS'])
+
+    @instrumented(frame=image_frame)
     def open_image(self) -> None:
-        """Load a new image into the label"""
+        """
+        Open images to step through. Choosing one file opens every image of
+        its folder, starting from that file.
+        """
         options = QFileDialog.Options() | QFileDialog.DontUseNativeDialog
-        image, _ = QFileDialog.getOpenFileName(self, "QFileDialog.getOpenFileName()", "",
-                                               "All Files (*);;Python Files (*.py)", options=options)
-        if image:
-            self.parent.print_act.setEnabled(True)
-            self.parent.update_actions()
-            self.image = MainImage(image)
-            self.original_image = self.image.copy()
-            self.setPixmap(QPixmap().fromImage(self.image))
-            self.resize(self.pixmap().size())
+        extensions = ' '.join(f"*{extension}" for extension in IMAGE_EXTENSIONS)
+        images, _ = QFileDialog.getOpenFileNames(self, "QFileDialog.getOpenFileNames()", "",
+                                                 f"Images ({extensions});;All Files (*)", options=options)
+        paths = list_images(os.path.dirname(images[0])) if len(images) == 1 else []
+        if images and images[0] in paths:
+            self.open_session(paths, paths.index(images[0]))
+        elif images:
+            # A file chosen through "All Files" may have an extension the folder listing leaves out
+            self.open_session(images)
+
+    @instrumented(frame=image_frame)
+    def open_folder(self) -> None:
+        """Open every image of a folder to step through."""
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder", "")
+        if not folder:
+            return
+        paths = list_images(folder)
+        if not paths:
+            QMessageBox.information(self, "Open Folder", "There are no images in this folder.", QMessageBox.Ok)
+            return
+        self.open_session(paths)
+
+    def open_session(self, paths: list[str], index: int = 0) -> None:
+        """Step through these files, starting with the one at `index`."""
+        # Frames decoded for the previous session would keep it and its cache alive until they finish
+        self.worker.cancel_all('prefetch')
+        self.session = Session(paths, settings['SESSION']['CACHE_MB'] * 2 ** 20,
+                               settings['SESSION']['PREFETCH'], index)
+        self.__load_frame()
+
+    @instrumented(frame=image_frame)
+    def next_image(self) -> None:
+        if self.session is not None and self.session.move(1):
+            self.__load_frame()
+
+    @instrumented(frame=image_frame)
+    def previous_image(self) -> None:
+        if self.session is not None and self.session.move(-1):
+            self.__load_frame()
+
+    def __load_frame(self) -> None:
+        """Show the current session frame: at once from the cache, otherwise once decoded."""
+        frame = self.session.cache.get(self.session.path)
+        if frame is not None:
+            self.worker.cancel('frame')
+            self.__show_frame(frame)
+        elif self.worker.is_busy(('prefetch', self.session.path)):
+            # The prefetch already decoding this frame shows it when done
+            self.worker.cancel('frame')
+        else:
+            self.worker.submit('frame', self.__decoded, self.session.path, settings['TILE_SIZE'], self.disk_cache,
+                               callback=self.__show_frame)
+
+    @property
+    def disk_cache(self):
+        """Persistent cache of decoded pyramids and measurements, opened on first use; None if disabled."""
+        if self.__disk_cache is None and settings['DISK_CACHE']['ENABLED']:
+            self.__disk_cache = DiskCache(settings['DISK_CACHE']['PATH'] or default_directory(),
+                                          settings['DISK_CACHE']['SIZE_MB'] * 2 ** 20)
+        return self.__disk_cache
+
+    @staticmethod
+    def __decoded(path: str, tile_size: int, cache: DiskCache = None):
+        # Errors are returned rather than raised, so the GUI thread can report them
+        try:
+            return decode_frame(path, tile_size, cache)
+        except (OSError, ValueError) as error:
+            return error
+
+    def __show_frame(self, frame) -> None:
+        if isinstance(frame, Exception):
+            QMessageBox.information(self, "Error", f"Unable to open image: {frame}", QMessageBox.Ok)
+            return
 
+        self.session.cache.put(frame)
+        self.set_original(frame.source, frame.pyramid, frame.path)
+        # Frames without a recorded pixel size keep the scale of the previous one, as a sequence usually shares it
+        if frame.calibration is not None:
+            self.set_calibration(frame.calibration)
+        self.frame_changed.emit(self.session.index, len(self.session.paths), frame.path)
+        self.__prefetch()
+
+    def __prefetch(self) -> None:
+        """Decode the neighbours of the current frame in the background, so stepping to them is instant."""
+        for path in self.session.neighbours():
+            key = ('prefetch', path)
+            if path not in self.session.cache and not self.worker.is_busy(key):
+                self.worker.submit(key, self.__decoded, path, settings['TILE_SIZE'], self.disk_cache,
+                                   callback=partial(self.__prefetched, self.session, path))
+
+    def __prefetched(self, session: Session, path: str, frame) -> None:
+        if session is not self.session:
+            return
+        if path == session.path:
+            # The user stepped onto this frame while it was decoding, and is waiting for it
+            self.worker.cancel('frame')
+            self.__show_frame(frame)
+        elif isinstance(frame, Frame) and path in session.neighbours():
+            # Frames that arrive after the session moved on are only kept if still near the current one
+            session.cache.put(frame)
+
+    @instrumented(frame=image_frame)
+    def set_original(self, original: np.ndarray, pyramid: Pyramid = None, path: str = None) -> None:
+        """
+        Start editing a new source array at normal size. `pyramid` is a
+        display pyramid already built over `original`, shown until it is
+        edited, and `path` the file it was read from, which keys its results
+        in the disk cache.
+        """
+        # Edits never touch the source pixels, so the original needs no copy. Float data is brought into 0..1
+        # unless memory-mapped, as open_array has already done that for mapped files
+        self.original = original if isinstance(original, np.memmap) else normalise_float(original)
+        self.path = path
+        self.__pyramid = pyramid
+        self.__clear_particles()
+        self.pipeline = AdjustmentPipeline(self.original)
+        # Deep data is shown stretched over its own range, e.g. 12-bit camera frames stored in 16 bits
+        self.tone_map.fit(self.original)
+        self.history.clear()
+        self.history_changed.emit()
+        self.worker.cancel('source')
+        self.clear_selection()
+        self.__render()
+        self.image_size = QSize(self.original.shape[1], self.original.shape[0])
+        self.set_zoom(1.0)
+
+    @instrumented(frame=image_frame)
     def save_image(self) -> None:
-        """Save the image displayed in the label."""
-
-        if not self.image.isNull():
-            image, _ = QFileDialog.getSaveFileName(self, "Save Image", "",
-                                                   "PNG Files (*.png);;JPG Files (*.jpeg *.jpg );;Bitmap Files ("
-                                                   "*.bmp);; GIF Files (*.gif)")
-            if image:
-                self.image.save(image)
-            else:
-                QMessageBox.information(self, "Error",
-                                        "Unable to save image.", QMessageBox.Ok)
-        else:
+        """Ask for a file and compression settings, then export the edited image in the background."""
+        if not self.__image_exists():
             QMessageBox.information(self, "Empty Image",
                                     "There is no image to save.", QMessageBox.Ok)
+            return
+
+        image, _ = QFileDialog.getSaveFileName(self, "Save Image", "",
+                                               "PNG Files (*.png);;JPG Files (*.jpeg *.jpg);;"
+                                               "TIFF Files (*.tif *.tiff);;Bitmap Files (*.bmp)")
+        if not image:
+            return
+        stem, extension = os.path.splitext(image)
+        if extension.lower() not in export.DEPTHS:
+            stem, extension = image, '.png'
+
+        options = export.ExportOptions(settings['EXPORT']['PNG_LEVEL'], settings['EXPORT']['JPEG_QUALITY'],
+                                       settings['EXPORT']['TIFF_COMPRESSION'])
+        dialog = ExportDialog(extension, options, self.particles is not None, self)
+        if not dialog.exec_():
+            return
+        table_extension = dialog.table_extension()
+        self.export_image(stem + extension, dialog.options(), stem + table_extension if table_extension else None)
+
+    def export_image(self, path: str, options: export.ExportOptions = export.ExportOptions(),
+                     table_path: str = None) -> None:
+        """Encode and write the latest full render, and the particle table when given its path, off the GUI thread."""
+        # Keyed by path: a second export to another file must not supersede this one
+        self.worker.submit(('export', path), self.__exported_files, path, self.__rendered, options, self.tone_map,
+                           self.particles, table_path, callback=self.__show_export)
+
+    @staticmethod
+    def __exported_files(*args):
+        # Errors are returned rather than raised, so the GUI thread can report them
+        try:
+            return export.export(*args)
+        except (OSError, ValueError) as error:
+            return error
+
+    def __show_export(self, result) -> None:
+        if isinstance(result, Exception):
+            QMessageBox.information(self, "Error", f"Unable to save image: {result}", QMessageBox.Ok)
+        else:
+            self.exported.emit(result)
 
     def clear_image(self) -> None:
         raise NotImplemented()
 
+    @instrumented(frame=image_frame)
     def revertToOriginal(self):
         """Revert the image back to original image."""
         # TODO: Display message dialog to confirm actions
-        self.image = self.original_image
-        self.setPixmap(QPixmap().fromImage(self.image))
-        self.repaint()
+        if not self.__image_exists():
+            return
 
+        self.worker.cancel('source')
+        before_source, before_params, before_placement = (self.pipeline.source, self.pipeline.params,
+                                                          self.pipeline.placement)
+        self.pipeline.set_source(self.original)
+        self.pipeline.reset()
+        self.__record(CompoundCommand('Revert',
+                                      SourceCommand('Revert', before_source, self.original, before_placement),
+                                      ParamCommand('Revert', before_params, self.pipeline.params)))
+        self.__render()
+
+    @instrumented(frame=image_frame)
     def resizeImage(self):
-        """Resize image."""
-        # TODO: Resize image by specified size
-        if self.image.isNull() == False:
-            resize = QTransform().scale(0.5, 0.5)
-
-            pixmap = QPixmap(self.image)
-
-            resized_image = pixmap.transformed(resize, mode=Qt.SmoothTransformation)
-            # rotated = pixmap.trueMatrix(transform90, pixmap.width, pixmap.height)
-
-            # self.image_label.setPixmap(rotated)
-
-            # self.image_label.setPixmap(rotated.scaled(self.image_label.size(),
-            #    Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            self.image = QImage(resized_image)
-            self.setPixmap(resized_image)
-            # self.image = QPixmap(rotated)
-            self.setScaledContents(True)
-            self.repaint()  # repaint the child widget
-        else:
-            # No image to rotate
-            pass
+        """Ask for a new size, as width x height or a percentage, and resize the image to it."""
+        if not self.__image_exists():
+            return
 
+        text, accepted = QInputDialog.getText(self, "Resize", "New size (width x height, or percent):",
+                                              text=f"{self.image_size.width()} x {self.image_size.height()}")
+        if not accepted:
+            return
+        try:
+            size = self.__parse_size(text)
+        except ValueError:
+            QMessageBox.information(self, "Error", f"Invalid size: {text}", QMessageBox.Ok)
+            return
+        self.resize_source(size)
+
+    def __parse_size(self, text: str) -> tuple[int, int]:
+        text = text.strip().lower().replace('×', 'x')
+        if text.endswith('%'):
+            return resample.target_size((self.image_size.height(), self.image_size.width()),
+                                        scale=float(text[:-1]) / 100)
+        width, height = (int(value) for value in text.split('x'))
+        if width <= 0 or height <= 0:
+            raise ValueError(text)
+        return width, height
+
+    @instrumented(frame=image_frame)
+    def resize_source(self, size: tuple[int, int]) -> None:
+        """Resize to (width, height) of the displayed image, which may be rotated from the source."""
+        source = self.pipeline.source
+        orientation = self.pipeline.get('geometry')['orientation']
+        size = orientation.unmap_rect((0, 0) + tuple(size), source.shape)[2:]
+        self.worker.submit('source', self.__resized, source, self.pipeline.placement, size,
+                           callback=self.__replace_source)
+
+    @staticmethod
+    def __resized(source: np.ndarray, placement: np.ndarray,
+                  size: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, SourceCommand]:
+        # Runs in the worker, so snapshotting the previous source stays off the GUI thread too
+        resized = resample.resize(source, size)
+        placement_after = placement @ scaling(source.shape[1] / resized.shape[1], source.shape[0] / resized.shape[0])
+        return resized, placement_after, SourceCommand('Resize', source, resized, placement)
+
+    @instrumented(frame=image_frame)
     def cropImage(self):
-        """Crop selected portions in the image."""
-        if self.image.isNull() == False:
-            rect = QRect(10, 20, 400, 200)
-            original_image = self.image
-            cropped = original_image.copy(rect)
-
-            self.image = QImage(cropped)
-            self.setPixmap(QPixmap().fromImage(cropped))
+        """Crop the image to the selection."""
+        if not self.__image_exists():
+            return
+        if self.selection.isEmpty():
+            QMessageBox.information(self, "Crop", "Select a region of the image to crop.", QMessageBox.Ok)
+            return
 
+        self.worker.cancel('source')
+        source = self.pipeline.source
+        selection = self.selection
+        orientation = self.pipeline.get('geometry')['orientation']
+        rect = orientation.unmap_rect((selection.x(), selection.y(), selection.width(), selection.height()),
+                                      source.shape)
+
+        # A view into the source: cropping copies no pixels, and undo keeps it by reference
+        cropped = resample.crop(source, rect)
+        placement = self.pipeline.placement
+        self.pipeline.set_source(cropped, placement @ translation(rect[0], rect[1]))
+        self.__record(SourceCommand('Crop', source, cropped, placement))
+        self.clear_selection()
+        self.__render()
+
+    @instrumented(frame=image_frame)
     def rotate_image(self, direction: int) -> None:
         """Rotate image"""
-        if not self.image.isNull():
-            transform = QTransform().rotate(direction)
-            pixmap = QPixmap(self.image.as_qimage())
-            rotated = pixmap.transformed(transform, mode=Qt.SmoothTransformation)
+        if not self.__image_exists():
+            return
 
-            self.resize(self.image.height(), self.image.width())
-            self.image = MainImage(rotated)
-            self.setPixmap(rotated.scaled(self.size()))
-            self.repaint()
+        orientation = self.pipeline.get('geometry')['orientation']
+        self.__adjust('Rotate', 'geometry', orientation=orientation.rotated(direction))
+        self.__render()
 
+    @instrumented(frame=image_frame)
     def flip_image(self, axis: tuple[float, float]) -> None:
         """Mirror the image across the horizontal axis."""
-        if not self.image.isNull():
-            transform = QTransform().scale(*axis)
-
-            pixmap = QPixmap(self.image.as_qimage())
-            flipped = pixmap.transformed(transform)
+        if not self.__image_exists():
+            return
 
-            self.image = MainImage(flipped)
-            self.setPixmap(flipped)
-            self.repaint()
+        orientation = self.pipeline.get('geometry')['orientation']
+        self.__adjust('Flip', 'geometry', orientation=orientation.flipped(axis))
+        self.__render()
 
+    @instrumented(frame=image_frame)
     def convertToGray(self):
         """Convert image to grayscale."""
-        if self.image.isNull() == False:
-            converted_img = self.image.convertToFormat(QImage.Format_Grayscale16)
-            # self.image = converted_img
-            self.image = QImage(converted_img)
-            self.setPixmap(QPixmap().fromImage(converted_img))
-            self.repaint()
+        if not self.__image_exists():
+            return
+
+        self.__adjust('Grayscale', 'grayscale', enabled=True)
+        self.__render()
 
+    @instrumented(frame=image_frame)
     def convert2rgb(self):
         """Convert image to RGB format."""
-        if self.image.isNull() == False:
-            converted_img = self.image.convertToFormat(QImage.Format_RGB32)
-            # self.image = converted_img
-            self.image = QImage(converted_img)
-            self.setPixmap(QPixmap().fromImage(converted_img))
-            self.repaint()
+        if not self.__image_exists():
+            return
+
+        self.__adjust('RGB', 'grayscale', enabled=False)
+        self.__render()
+
+    @instrumented(frame=image_frame)
+    def auto_levels(self) -> None:
+        """Stretch brightness and contrast so the source values span the full range."""
+        if not self.__image_exists():
+            return
 
+        source = self.pipeline.source
+        step = sample_step(source.shape, settings['HISTOGRAM']['AUTO_LEVELS_PIXELS'])
+        # Deep data is binned over the tone window, since that is what the levels stage is displayed through
+        window = (0.0, 1.0) if source.dtype == np.uint8 else self.tone_map.window
+        brightness, contrast = auto_levels(self.histograms.sample(source, {}, source, step, self.tone_map),
+                                           settings['HISTOGRAM']['AUTO_LEVELS_CLIP'], window)
+
+        brightness = min(max(brightness, settings['BRIGHTNESS_MIN_VALUE']), settings['BRIGHTNESS_MAX_VALUE'])
+        contrast = min(max(contrast, settings['CONTRAST_MIN_VALUE']), settings['CONTRAST_MAX_VALUE'])
+        self.__adjust('Auto levels', 'levels', brightness=brightness, contrast=contrast)
+        self.__render()
+
+    @instrumented(frame=image_frame)
+    def equalize(self) -> None:
+        """Toggle contrast-limited adaptive histogram equalization (CLAHE)."""
+        if not self.__image_exists():
+            return
+
+        enabled = bool(self.pipeline.get('clahe')['clip_limit'])
+        self.__adjust('Equalize', 'clahe', clip_limit=0.0 if enabled else settings['CLAHE']['CLIP_LIMIT'],
+                      tile_grid=settings['CLAHE']['TILE_GRID'])
+        self.__render()
+
+    @instrumented(frame=image_frame)
     def convertToSepia(self):
         """Convert image to sepia filter."""
-        # TODO: Sepia #704214 rgb(112, 66, 20)
-        # TODO: optimize speed that the image converts, or add to thread
-        if self.image.isNull() == False:
-            for row_pixel in range(self.image.width()):
-                for col_pixel in range(self.image.height()):
-                    current_val = QColor(self.image.pixel(row_pixel, col_pixel))
-
-                    # Calculate r, g, b values for current pixel
-                    red = current_val.red()
-                    green = current_val.green()
-                    blue = current_val.blue()
-
-                    new_red = int(0.393 * red + 0.769 * green + 0.189 * blue)
-                    new_green = int(0.349 * red + 0.686 * green + 0.168 * blue)
-                    new_blue = int(0.272 * red + 0.534 * green + 0.131 * blue)
-
-                    # Set the new RGB values for the current pixel
-                    if new_red > 255:
-                        red = 255
-                    else:
-                        red = new_red
-
-                    if new_green > 255:
-                        green = 255
-                    else:
-                        green = new_green
-
-                    if new_blue > 255:
-                        blue = 255
-                    else:
-                        blue = new_blue
-
-                    new_value = qRgb(red, green, blue)
-                    self.image.setPixel(row_pixel, col_pixel, new_value)
-
-        self.setPixmap(QPixmap().fromImage(self.image))
-        self.repaint()
+        if not self.__image_exists():
+            return
+
+        self.__adjust('Sepia', 'sepia', enabled=True)
+        self.__render()
+
+    @property
+    def image(self) -> MainImage:
+        """Latest full-resolution render as a QImage, built on first access."""
+        if self.__image is None:
+            self.__image = display_image(self.__rendered, self.tone_map)
+        return self.__image
 
     def __image_exists(self) -> bool:
-        return bool(self.image.width() and self.image.height())
+        return bool(self.original.size)
+
+    def __replace_source(self, result: tuple[np.ndarray, np.ndarray, SourceCommand]) -> None:
+        source, placement, command = result
+        self.pipeline.set_source(source, placement)
+        self.__record(command)
+        self.__render()
+
+    def __adjust(self, label: str, name: str, merge=None, **params) -> None:
+        """Set parameters of one pipeline stage as an undoable step, merged with the last one of the same `merge`."""
+        before = self.pipeline.params
+        self.pipeline.set(name, **params)
+        self.__record(ParamCommand(label, before, self.pipeline.params), merge)
+
+    def __record(self, command: Command, merge=None) -> None:
+        self.history.push(command, merge)
+        self.history_changed.emit()
+        self.__encode_history()
+
+    def __encode_history(self) -> None:
+        """Compress the source snapshots of new, undone or redone steps in the background."""
+        snapshots = self.history.pending(self.pipeline.source)
+        if snapshots:
+            self.worker.submit('history', encode, snapshots, callback=self.__history_encoded)
+
+    def __history_encoded(self, _) -> None:
+        # Snapshots only count against the memory budget once compressed, which may forget the oldest steps
+        self.history.trim()
+        self.history_changed.emit()
+
+    @instrumented(frame=image_frame)
+    def measure_particles(self) -> None:
+        """Detect and measure particles in the current image in the background."""
+        if not self.__image_exists():
+            return
+
+        # Results are cached by file and edits, so only renders of an unchanged source have a key
+        source, params = self.__rendered_from
+        cache = self.disk_cache if self.path is not None and source is self.original else None
+        # The mask is pooled down to every level the overlay will be drawn at
+        pyramid = self.__pyramid or Pyramid(self.__rendered, settings['TILE_SIZE'])
+        self.worker.submit('measure', self.__segmented, self.__rendered,
+                           settings['PARTICLES']['THRESHOLD'], settings['PARTICLES']['DARK'],
+                           settings['PARTICLES']['MIN_AREA'], cache, self.path, params, pyramid.depth,
+                           callback=partial(self.__show_particles, source, params['geometry']))
+
+    @staticmethod
+    def __segmented(image_array: np.ndarray, threshold: float, dark: bool, min_area: int, cache: DiskCache,
+                    path: str, params: dict, depth: int) -> tuple[particles.ParticleTable, list]:
+        if cache is None:
+            table, mask = particles.segment_particles(image_array, threshold, dark, min_area)
+            return table, mask_levels(mask, depth)
+
+        # The table is shared with __measured; the mask is stored packed to eight pixels a byte
+        digest = cache.digest(path)
+        key = cache.key(digest, 'particles', params=params, threshold=threshold, dark=dark, min_area=min_area)
+        mask_key = cache.key(digest, 'particle_mask', params=params, threshold=threshold, dark=dark,
+                             min_area=min_area)
+        records, packed = cache.get(key), cache.get(mask_key)
+        height, width = image_array.shape[:2]
+        if records is not None and packed is not None:
+            mask = np.unpackbits(packed, count=height * width).reshape(height, width)
+            return particles.ParticleTable.from_records(records), mask_levels(mask, depth)
+        table, mask = particles.segment_particles(image_array, threshold, dark, min_area)
+        cache.put(key, table.to_records())
+        cache.put(mask_key, np.packbits(mask))
+        return table, mask_levels(mask, depth)
+
+    @staticmethod
+    def __measured(image_array: np.ndarray, threshold: float, dark: bool, min_area: int,
+                   cache: DiskCache, path: str, params: dict) -> particles.ParticleTable:
+        if cache is None:
+            return particles.measure_particles(image_array, threshold, dark, min_area)
+
+        key = cache.key(cache.digest(path), 'particles', params=params, threshold=threshold, dark=dark,
+                        min_area=min_area)
+        records = cache.get(key)
+        if records is not None:
+            return particles.ParticleTable.from_records(records)
+        table = particles.measure_particles(image_array, threshold, dark, min_area)
+        cache.put(key, table.to_records())
+        return table
+
+    @instrumented(frame=image_frame)
+    def track_particles(self) -> None:
+        """Link the particles of every frame of the session into trajectories, in the background."""
+        if self.session is None or len(self.session.paths) < 2:
+            QMessageBox.information(self, "Track Particles", "Open a sequence of images to track particles.",
+                                    QMessageBox.Ok)
+            return
 
-    def __get_pixmap(self, image_array: np.array) -> QPixmap:
-        qimage = MainImage(
-            image_array,
-            image_array.shape[1],
-            image_array.shape[0],
-            QImage.Format_RGB32
-        ).as_qimage()
+        self.worker.submit('track', self.__tracked, list(self.session.paths), settings['PARTICLES']['THRESHOLD'],
+                           settings['PARTICLES']['DARK'], settings['PARTICLES']['MIN_AREA'],
+                           settings['TRACKING']['MAX_DISPLACEMENT'], settings['TRACKING']['MEMORY'],
+                           self.disk_cache, AdjustmentPipeline(self.original).params,
+                           callback=self.__show_trajectories)
+
+    @staticmethod
+    def __tracked(paths: list[str], threshold: float, dark: bool, min_area: int, max_displacement: float,
+                  memory: int, cache: DiskCache, params: dict):
+        # Frames are opened, measured and dropped one at a time, in order, so each measurement is keyed by the
+        # next path; measurements of unedited frames are shared with measure_particles through the disk cache
+        keys = iter(paths)
+        detections = tracking.detections(tracking.frames(paths), measure=lambda image_array: Image.__measured(
+            image_array, threshold, dark, min_area, cache, next(keys), params))
+        try:
+            return tracking.trajectories(tracking.track(detections, max_displacement, memory))
+        except (OSError, ValueError) as error:
+            return error
+
+    def __show_trajectories(self, result) -> None:
+        if isinstance(result, Exception):
+            QMessageBox.information(self, "Error", f"Unable to track particles: {result}", QMessageBox.Ok)
+        else:
+            self.tracked.emit(result)
+
+    def __show_particles(self, source: np.ndarray, geometry: dict, result: tuple) -> None:
+        # Particles of a frame that has since been cropped, resized or replaced would describe the wrong pixels
+        if source is not self.pipeline.source or geometry != self.pipeline.get('geometry'):
+            return
+        table, masks = result
+        self.particles, self.__particle_masks = table, masks
+        self.__particles_from = (source, geometry)
+        rendered_source, rendered_params = self.__rendered_from
+        if self.overlay is not None and rendered_source is source and rendered_params['geometry'] == geometry:
+            # Only tiles around particles that appeared or went away are traced again; the margin covers the
+            # outline of a particle at the edge of its box at coarser levels
+            self.overlay_tiles.invalidate(self.overlay.set_particles(masks, particle_rows(table)), margin=1)
+            self.update()
+        if self.region_statistics is not None:
+            self.region_statistics.set_particles(table)
+            self.__measure_selection()
+        self.measured.emit(table)
+
+    @instrumented(frame=image_frame)
+    def undo(self) -> None:
+        """Step back through the edit history."""
+        self.worker.cancel('source')
+        if self.history.undo(self.pipeline):
+            self.history_changed.emit()
+            self.__encode_history()
+            self.__render()
+
+    @instrumented(frame=image_frame)
+    def redo(self) -> None:
+        """Step forward through the edit history."""
+        self.worker.cancel('source')
+        if self.history.redo(self.pipeline):
+            self.history_changed.emit()
+            self.__encode_history()
+            self.__render()
+
+    @instrumented(frame=image_frame)
+    def begin_preview(self) -> None:
+        """Render further adjustments on a proxy sized to the viewport, at most once per frame."""
+        if not self.__image_exists():
+            return
+
+        self.__drags += 1
+        self.__drag = self.__drags
+        viewport = self.__viewport()
+        # Proxies are built on the worker after each full render, so usually this one is ready
+        self.preview = self.pipeline.proxy(viewport.width(), viewport.height(), build=False)
+        if self.preview is None:
+            # Until it is, the drag renders at full resolution
+            self.worker.submit('proxy', self.pipeline.proxy, viewport.width(), viewport.height(),
+                               callback=partial(self.__start_preview, self.__drag, self.pipeline.source))
+
+    def __start_preview(self, drag: int, source: np.ndarray, proxy: AdjustmentPipeline) -> None:
+        if drag == self.__drag and source is self.pipeline.source:
+            self.preview = proxy
+
+    def __prepare_preview(self) -> None:
+        """Build the proxy for the next slider drag in the background, unless a drag is already waiting for one."""
+        if self.__drag is None:
+            viewport = self.__viewport()
+            self.worker.submit('proxy', self.pipeline.proxy, viewport.width(), viewport.height())
+
+    def __viewport(self) -> QSize:
+        return self.parentWidget().size() if self.parentWidget() else self.size()
+
+    @instrumented(frame=image_frame)
+    def end_preview(self) -> None:
+        """Leave preview mode with a single full-resolution render."""
+        self.__drag = None
+        if self.preview is None:
+            return
 
-        return self.qpixmap.fromImage(qimage)
+        self.preview = None
+        self.__preview_pending = False
+        self.__frame_timer.stop()
+        self.__render()
 
+    def __schedule_render(self) -> None:
+        if self.preview is None:
+            self.__render()
+        elif self.__frame_timer.isActive():
+            self.__preview_pending = True
+        else:
+            self.__render()
+            self.__frame_timer.start(self.__frame_interval())
+
+    def __next_preview_frame(self) -> None:
+        if self.__preview_pending and self.preview is not None:
+            self.__preview_pending = False
+            self.__render()
+            self.__frame_timer.start(self.__frame_interval())
+
+    @staticmethod
+    def __frame_interval() -> int:
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 60
+        return max(int(1000 / refresh_rate), 1)
+
+    def __render(self) -> None:
+        """Run the adjustment pipeline in the background and display its latest output."""
+        mode, pipeline = ('preview', self.preview) if self.preview is not None else ('full', self.pipeline)
+        params = self.pipeline.params
+        if self.particles is not None and not self.__particles_match(self.pipeline.source, params['geometry']):
+            self.__clear_particles()
+        self.worker.submit('render', pipeline.render, params,
+                           callback=partial(self.__show, mode, time.perf_counter(), pipeline.source, params))
+
+    @instrumented(frame=image_frame)
+    def __show(self, mode: str, requested_at: float, source: np.ndarray, params: dict,
+               image_array: np.ndarray) -> None:
+        if mode == 'full':
+            self.__rendered = image_array
+            self.__rendered_from = (source, params)
+            self.__image = None
+            self.region_statistics = None
+            self.worker.cancel('regions')
+            self.image_size = QSize(image_array.shape[1], image_array.shape[0])
+            if self.__pyramid is None or self.__pyramid.levels[0] is not image_array:
+                # Coarser levels are downsampled in the background and painted once they are ready
+                self.__pyramid = Pyramid(image_array, settings['TILE_SIZE'])
+                self.worker.submit('pyramid', self.__pyramid.build, callback=self.__pyramid_built)
+            self.tiles.set_pyramid(self.__pyramid)
+            self.__show_overlay(source, params)
+            self.set_zoom(self.zoom)
+            self.__prepare_preview()
+        else:
+            self.tiles.set_pyramid(Pyramid(image_array, settings['TILE_SIZE'],
+                                           scale=image_array.shape[1] / max(self.image_size.width(), 1)))
+        self.update()
+        self.__update_histogram(mode, source, params, image_array)
+        self.rendered.emit(mode, (time.perf_counter() - requested_at) * 1000)
+
+    def __pyramid_built(self, pyramid: Pyramid) -> None:
+        if pyramid is self.__pyramid:
+            self.update()
+
+    def __show_overlay(self, source: np.ndarray, params: dict) -> None:
+        """Outline the measured particles over a new full render, as long as they still line up with it."""
+        self.overlay = Overlay(self.__pyramid, settings['OVERLAY']['COLOR'], settings['OVERLAY']['ALPHA'])
+        if self.particles is not None and self.__particles_match(source, params['geometry']):
+            self.overlay.set_particles(self.__particle_masks, particle_rows(self.particles))
+        self.overlay_tiles.set_pyramid(self.overlay)
+
+    def __particles_match(self, source: np.ndarray, geometry: dict) -> bool:
+        # Sources are told apart by identity, as edits never change a source in place
+        return (self.__particles_from is not None and self.__particles_from[0] is source
+                and self.__particles_from[1] == geometry)
+
+    def __clear_particles(self) -> None:
+        """Forget particles measured on another source or geometry, so counts and exports never describe it."""
+        self.particles = self.__particle_masks = self.__particles_from = None
+        self.overlay = None
+        self.overlay_tiles.set_pyramid(None)
+
+    def __update_histogram(self, mode: str, source: np.ndarray, params: dict, image_array: np.ndarray) -> None:
+        """Show a histogram from a sparse sample at once, then refine full renders in the background."""
+        coarse = sample_step(image_array.shape, settings['HISTOGRAM']['PREVIEW_PIXELS'])
+        self.histogram_changed.emit(self.histograms.sample(source, params, image_array, coarse, self.tone_map))
+
+        fine = sample_step(image_array.shape, settings['HISTOGRAM']['MAX_PIXELS'])
+        if mode == 'full' and self.histograms.get(source, params)[1] > fine:
+            self.worker.submit('histogram', channel_histograms, image_array, fine, self.tone_map,
+                               callback=partial(self.__refine_histogram, source, params, fine))
+
+    def __refine_histogram(self, source: np.ndarray, params: dict, step: int, histograms: np.ndarray) -> None:
+        self.histograms.put(source, params, histograms, step)
+        if source is self.pipeline.source and params == self.pipeline.params and self.preview is None:
+            self.histogram_changed.emit(histograms)
+
+    @instrumented(frame=image_frame)
+    def set_zoom(self, zoom: float) -> None:
+        """Display the image at `zoom` times its pixel size."""
+        self.zoom = zoom
+        self.resize(self.image_size * zoom)
+
+    @instrumented(frame=image_frame)
+    def paintEvent(self, event: QPaintEvent) -> None:
+        """Paint only the tiles of the visible part of the image, then the annotations over them."""
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), self.palette().dark())
+        self.tiles.paint(painter, event.rect(), self.width(), self.height())
+        self.overlay_tiles.paint(painter, event.rect(), self.width(), self.height())
+        if self.calibration is not None and settings['SCALE_BAR']['ENABLED']:
+            self.__paint_scale_bar(painter)
+        painter.end()
+
+    def __paint_scale_bar(self, painter: QPainter) -> None:
+        """Draw a bar of a round physical length in the bottom-left corner of the visible part of the image."""
+        transform = self.transform
+        length = scale_bar_length(transform.widget_pixel_length, settings['SCALE_BAR']['MAX_WIDTH'])
+        if not length:
+            return
+        width = length / transform.widget_pixel_length
+        label = f"{length:g} {transform.unit}"
+        text_width = painter.fontMetrics().horizontalAdvance(label)
+        height = painter.fontMetrics().height()
+
+        # Drawn in widget pixels, so the bar keeps its size and stays readable at any zoom
+        backing = self.__scale_bar_rect(max(width, text_width) + 8, height + 14)
+        self.__scale_bar = backing
+        painter.fillRect(backing, QColor(0, 0, 0, 160))
+        painter.fillRect(QRectF(backing.left() + 4, backing.bottom() - 8, width, 4), Qt.white)
+        painter.setPen(Qt.white)
+        painter.drawText(QRectF(backing.left() + 4, backing.top() + 2, text_width, height), Qt.AlignLeft, label)
+
+    def __scale_bar_rect(self, width: float, height: float) -> QRectF:
+        """Backing of the scale bar, in the bottom-left corner of the part of the widget the viewport shows."""
+        visible = self.visibleRegion().boundingRect()
+        if visible.isEmpty():
+            visible = self.rect()
+        margin = 8
+        return QRectF(visible.left() + margin, visible.bottom() + 1 - margin - height, width, height)
+
+    def moveEvent(self, event) -> None:
+        """Keep the scale bar in the visible corner while the image is scrolled."""
+        super().moveEvent(event)
+        if self.__scale_bar is not None:
+            # Scrolling carries the painted bar along with the image: repaint where it was and where it now goes
+            self.update(self.__scale_bar.toAlignedRect())
+            self.update(self.__scale_bar_rect(self.__scale_bar.width(), self.__scale_bar.height()).toAlignedRect())
+
+    @instrumented(frame=image_frame)
     def change_brightness(self, brightness: int) -> None:
         """
         Change the brightness of the pixels in the image.
@@ -231,15 +946,10 @@ class Image(QLabel):
         if not self.__image_exists():
             return
 
-        image_array = self.image.as_array
-        zeros = np.zeros(image_array.shape, image_array.dtype)
-
-        image_array = cv2.addWeighted(image_array, 1, zeros, 0, brightness)
-
-        pixmap = self.__get_pixmap(image_array)
-
-        self.setPixmap(pixmap)
+        self.__adjust('Brightness', 'levels', merge=self.__drag, brightness=brightness)
+        self.__schedule_render()
 
+    @instrumented(frame=image_frame)
     def change_contrast(self, contrast: int) -> None:
         """
         Change the contrast of the pixels in the image.
@@ -249,42 +959,118 @@ class Image(QLabel):
         if not self.__image_exists():
             return
 
-        image = self.image.as_array
-        zeros = np.zeros(image.shape, image.dtype)
-        image_array = cv2.addWeighted(image, 1.0 + contrast / 100, zeros, 0, 0)
+        self.__adjust('Contrast', 'levels', merge=self.__drag, contrast=contrast)
+        self.__schedule_render()
 
-        pixmap = self.__get_pixmap(image_array)
+    @instrumented(frame=image_frame)
+    def changeHue(self, hue: int, saturation: int = 0) -> None:
+        """Rotate the hue of the image by the given angle in degrees."""
+        if not self.__image_exists():
+            return
 
-        self.setPixmap(pixmap)
+        current = self.pipeline.get('hue')
+        self.__adjust('Hue', 'hue', hue=(current['hue'] + hue) % 360, saturation=saturation)
+        self.__render()
 
-    def changeHue(self):
-        for row_pixel in range(self.image.width()):
-            for col_pixel in range(self.image.height()):
-                current_val = QColor(self.image.pixel(row_pixel, col_pixel))
+    def __build_region_statistics(self) -> None:
+        """Precompute the summed-area tables of the current render in the background."""
+        self.worker.submit('regions', self.__region_statistics, self.__rendered, self.particles,
+                           callback=self.__set_region_statistics)
 
-                hue = current_val.hue()
+    @staticmethod
+    def __region_statistics(image_array: np.ndarray, table) -> RegionStatistics:
+        statistics = RegionStatistics(image_array, settings['ROI']['BLOCK'], settings['ROI']['MAX_PIXELS'])
+        if table is not None:
+            statistics.set_particles(table)
+        return statistics
 
-                current_val.setHsv(hue, current_val.saturation(),
-                                   current_val.value(), current_val.alpha())
-                self.image.setPixelColor(row_pixel, col_pixel, current_val)
+    def __set_region_statistics(self, statistics: RegionStatistics) -> None:
+        self.region_statistics = statistics
+        self.__measure_selection()
 
-        self.setPixmap(QPixmap().fromImage(self.image))
+    def __measure_selection(self) -> None:
+        if self.region_statistics is None or self.selection.isEmpty():
+            return
+        selection = self.selection
+        self.region_measured.emit(self.region_statistics.summary(selection.x(), selection.y(),
+                                                                 selection.width(), selection.height()))
+
+    @property
+    def transform(self) -> ViewTransform:
+        """Transforms from widget coordinates, recomposed only after the zoom, edits or calibration change."""
+        return self.view.update(self.zoom or 1.0, self.pipeline.get('geometry')['orientation'],
+                                self.pipeline.source.shape, self.pipeline.placement, self.calibration)
+
+    def set_calibration(self, calibration: Calibration) -> None:
+        """Set the pixel size of the file; None measures in pixels."""
+        self.calibration = calibration
+        self.calibration_changed.emit(calibration)
+        self.update()
+
+    @instrumented(frame=image_frame)
+    def calibrate(self) -> None:
+        """Take the next line dragged over the image as a reference of known length."""
+        if not self.__image_exists():
+            return
+        self.__calibrating = True
+        self.clear_selection()
+
+    def calibrate_line(self, start: QPoint, end: QPoint, length: float, unit: str = 'µm') -> None:
+        """Calibrate from a line between two widget points that measures `length` units."""
+        # Measured in pixels of the file, so crops, resizes, rotations and the zoom do not skew it
+        first, second = map_points(self.transform.to_pixels, [(start.x(), start.y()), (end.x(), end.y())])
+        self.set_calibration(Calibration.from_line(float(np.hypot(*(second - first))), length, unit))
+
+    def widget_to_image(self, rect: QRect) -> QRect:
+        """Map a rectangle in widget coordinates to pixels of the rendered image."""
+        zoom = self.zoom or 1.0
+        left, top = int(rect.left() / zoom), int(rect.top() / zoom)
+        right, bottom = math.ceil((rect.right() + 1) / zoom), math.ceil((rect.bottom() + 1) / zoom)
+        bounds = QRect(QPoint(0, 0), self.image_size)
+        return QRect(left, top, right - left, bottom - top).intersected(bounds)
+
+    def clear_selection(self) -> None:
+        self.selection = QRect()
+        self.rubber_band.hide()
 
     def mousePressEvent(self, event):
-        """Handle mouse press event."""
+        """Start a new selection."""
         self.origin = event.pos()
-        if not self.rubber_band:
-            self.rubber_band = QRubberBand(QRubberBand.Rectangle, self)
         self.rubber_band.setGeometry(QRect(self.origin, QSize()))
         self.rubber_band.show()
 
-        # print(self.rubber_band.height())
-        print(self.rubber_band.x())
+        self.selection = QRect()
+        if self.__image_exists() and self.region_statistics is None:
+            self.__build_region_statistics()
 
+    @instrumented(frame=image_frame)
     def mouseMoveEvent(self, event):
-        """Handle mouse move event."""
-        self.rubber_band.setGeometry(QRect(self.origin, event.pos()).normalized())
+        """Report where the pointer is; while dragging, stretch the selection and measure it."""
+        if self.__image_exists():
+            transform = self.transform
+            x, y = map_points(transform.to_physical, (event.x(), event.y()))
+            self.pointer_moved.emit(x, y, transform.unit)
+        if self.origin is None:
+            return
+        geometry = QRect(self.origin, event.pos()).normalized()
+        self.rubber_band.setGeometry(geometry)
+        self.selection = self.widget_to_image(geometry)
+        self.__measure_selection()
 
     def mouseReleaseEvent(self, event):
-        """Handle when the mouse is released."""
-        self.rubber_band.hide()
+        """Finish the selection; it stays shown until the next press. Ends a reference line when calibrating."""
+        origin, self.origin = self.origin, None
+        if not self.__calibrating or origin is None:
+            return
+        self.__calibrating = False
+        self.clear_selection()
+
+        unit = self.calibration.unit if self.calibration is not None else 'µm'
+        text, accepted = QInputDialog.getText(self, "Set Scale", "Known length of the line:", text=f"10 {unit}")
+        if not accepted:
+            return
+        try:
+            length, unit = parse_length(text, unit)
+            self.calibrate_line(origin, event.pos(), length, unit)
+        except ValueError as error:
+            QMessageBox.information(self, "Error", f"Unable to set the scale: {error}", QMessageBox.Ok)
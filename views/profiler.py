@@ -0,0 +1,100 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QTableWidget, QTableWidgetItem, QCheckBox, QPushButton,
+                             QGridLayout, QHeaderView, QFileDialog)
+
+from controllers.profiler import Profiler
+
+COLUMNS = ('Operation', 'ms', 'MB', 'Frame', 'Thread')
+
+
+class ProfilerDock(QDockWidget):
+    """Latest profiler spans, with switches for recording and buttons to save traces and profiles."""
+
+    def __init__(self, profiler: Profiler, rows: int = 200, parent: QWidget = None):
+        super().__init__("Profiler", parent)
+        self.profiler = profiler
+        self.rows = rows
+        self.__shown_count = -1
+
+        self.record = QCheckBox("Record")
+        self.record.toggled.connect(self.__set_recording)
+        self.allocations = QCheckBox("Track allocations")
+        self.allocations.toggled.connect(self.__set_recording)
+
+        self.cprofile_button = QPushButton("Start cProfile")
+        self.cprofile_button.clicked.connect(self.toggle_cprofile)
+        trace_button = QPushButton("Save trace...")
+        trace_button.clicked.connect(self.save_trace)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        grid = QGridLayout()
+        grid.addWidget(self.record, 0, 0)
+        grid.addWidget(self.allocations, 0, 1)
+        grid.addWidget(self.cprofile_button, 1, 0)
+        grid.addWidget(trace_button, 1, 1)
+        grid.addWidget(clear_button, 1, 2)
+        grid.addWidget(self.table, 2, 0, 1, 3)
+
+        container = QWidget()
+        container.setLayout(grid)
+        self.setWidget(container)
+
+        # Polled rather than signalled, so recording a span never touches Qt
+        self.timer = QTimer(self)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(lambda visible: self.timer.start() if visible else self.timer.stop())
+
+        self.record.setChecked(profiler.enabled)
+
+    def __set_recording(self) -> None:
+        if self.record.isChecked():
+            self.profiler.enable(self.allocations.isChecked())
+        else:
+            self.profiler.disable()
+
+    def refresh(self) -> None:
+        """Show the newest spans first, when any were recorded since the last refresh."""
+        if self.profiler.count == self.__shown_count:
+            return
+        self.__shown_count = self.profiler.count
+
+        spans = list(self.profiler.spans)[-self.rows:][::-1]
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(spans))
+        for row, span in enumerate(spans):
+            frame = f"{span.frame[0]}×{span.frame[1]}" if len(span.frame) == 2 else ""
+            values = (span.name, f"{span.seconds * 1000:.2f}", f"{span.allocated / 2 ** 20:.1f}", frame, span.thread)
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column in (1, 2):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.setUpdatesEnabled(True)
+
+    def clear(self) -> None:
+        self.profiler.clear()
+        self.table.setRowCount(0)
+
+    def toggle_cprofile(self) -> None:
+        """Start a cProfile run, or stop it and save its statistics."""
+        if not self.profiler.profiling:
+            self.profiler.start_profile()
+            self.cprofile_button.setText("Stop and save cProfile...")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "measurer.prof", "Profiles (*.prof)")
+        self.profiler.stop_profile(path or None)
+        self.cprofile_button.setText("Start cProfile")
+
+    def save_trace(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "measurer-trace.json", "Traces (*.json)")
+        if path:
+            self.profiler.write_trace(path)
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+import numpy as np
+from PyQt5.QtCore import QRect, QRectF
+from PyQt5.QtGui import QPainter, QPixmap
+
+from models.pyramid import Pyramid
+
+
+class TileRenderer:
+    """
+    Paints a Pyramid into a widget one visible tile at a time.
+
+    Only tiles intersecting the exposed rectangle are converted to pixmaps,
+    taken from the pyramid level matching the zoom. Converted tiles are kept
+    in an LRU cache sized from the number of tiles on screen, so memory
+    follows the viewport rather than zoom x image size. Levels that are not
+    built yet are painted from the nearest finer level that is, so painting
+    never waits for a downsample. Any object with the Pyramid tile
+    interface can be painted; tiles it returns as None are skipped.
+    """
+
+    def __init__(self, to_qimage):
+        self.to_qimage = to_qimage
+        self.pyramid = None
+        self.capacity = 64
+        self.__pixmaps = OrderedDict()
+
+    def set_pyramid(self, pyramid: Pyramid) -> None:
+        self.pyramid = pyramid
+        self.__pixmaps.clear()
+
+    def invalidate(self, regions, margin: int = 0) -> None:
+        """
+        Drop the cached tiles, at every level, that overlap any (left, top,
+        width, height) in level 0 pixels, grown by `margin` pixels of that
+        level.
+        """
+        if not regions:
+            return
+        regions = np.asarray(regions, np.int64).reshape(-1, 4)
+        size = self.pyramid.tile_size if self.pyramid is not None else 1
+        for key in list(self.__pixmaps):
+            index, row, col = key
+            span, grow = size * 2 ** index, margin * 2 ** index
+            left, top = col * span - grow, row * span - grow
+            span += 2 * grow
+            if ((regions[:, 0] < left + span) & (regions[:, 0] + regions[:, 2] > left)
+                    & (regions[:, 1] < top + span) & (regions[:, 1] + regions[:, 3] > top)).any():
+                del self.__pixmaps[key]
+
+    def paint(self, painter: QPainter, exposed: QRect, width: int, height: int) -> None:
+        """Draw the tiles that intersect `exposed`, scaling the image to width x height widget pixels."""
+        if self.pyramid is None or not width or not height:
+            return
+
+        base_height, base_width = self.pyramid.level(0).shape[:2]
+        index = self.pyramid.ready(self.pyramid.level_for(width / base_width * self.pyramid.scale))
+        level = self.pyramid.level(index)
+
+        scale_x = width / level.shape[1]
+        scale_y = height / level.shape[0]
+        rows, cols = self.pyramid.tile_range(index,
+                                             exposed.left() / scale_x, exposed.top() / scale_y,
+                                             (exposed.right() + 1) / scale_x, (exposed.bottom() + 1) / scale_y)
+
+        self.capacity = max(self.capacity, 2 * len(rows) * len(cols))
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, index == 0 and scale_x < 1)
+
+        size = self.pyramid.tile_size
+        for row in rows:
+            for col in cols:
+                pixmap = self.__pixmap(index, row, col)
+                if pixmap is None:
+                    continue
+                target = QRectF(col * size * scale_x, row * size * scale_y,
+                                pixmap.width() * scale_x, pixmap.height() * scale_y)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def __pixmap(self, index: int, row: int, col: int):
+        key = (index, row, col)
+        if key not in self.__pixmaps:
+            tile = self.pyramid.tile(index, row, col)
+            pixmap = QPixmap.fromImage(self.to_qimage(tile)) if tile is not None else None
+            self.__pixmaps[key] = pixmap
+            while len(self.__pixmaps) > self.capacity:
+                self.__pixmaps.popitem(last=False)
+        else:
+            pixmap = self.__pixmaps[key]
+            self.__pixmaps.move_to_end(key)
+        return pixmap